@@ -11,7 +11,7 @@ def align_or_copy_fasta(fasta_file, output_file):
     if len(sequences) == 1:
         shutil.copy(fasta_file, output_file)
     else:
-        subprocess.run(["clustalo", "-i", fasta_file, "-o", output_file, "--outfmt", "fa"])
+        subprocess.run(["clustalo", "-i", fasta_file, "-o", output_file, "--outfmt", "fa"], check=True)
 
 
 def process_alignment(input_folder):
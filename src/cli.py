@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+
+r""" Command-line entry point of InstaNexus, with one subcommand per step of the pipeline.
+ _____  _______  _    _
+|  __ \|__   __|| |  | |
+| |  | |  | |   | |  | |
+| |  | |  | |   | |  | |
+| |__| |  | |   | |__| |
+|_____/   |_|   |______|
+
+__authors__ = Marco Reverenna
+__copyright__ = Copyright 2025-2026
+__research-group__ = DTU Biosustain (Multi-omics Network Analytics) and DTU Bioengineering
+__date__ = 18 Oct 2026
+__maintainer__ = Marco Reverenna
+__email__ = marcor@dtu.dk
+__status__ = Dev
+
+Run from within src/, like the scripts, e.g. `python cli.py assemble --method dbg --run bsa --reference protein.fasta`
+then `python cli.py cluster <scaffolds folder>` and `python cli.py consensus <scaffolds folder>`.
+
+Every subcommand imports the modules it needs when it runs, so `--help` and the dispatch cost nothing, and plotting,
+NetworkX and logomaker are only imported by the functions that use them. `python cli.py startup` measures the import
+time of every subcommand with `python -X importtime` and fails if one exceeds STARTUP_BUDGET_MS or imports one of
+LAZY_MODULES.
+"""
+
+# import libraries
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GRIDSEARCH_DIR = os.path.join(HERE, "opt")  # the grid search reads its grid and writes its logs relative to it
+
+STAGES = ('ingest', 'contigs', 'scaffolds', 'mapping', 'clustering', 'alignment', 'consensus')  # as pipeline.STAGES
+PROTEASES = ('Chymotrypsin', 'Legumain', 'Krakatoa', 'Elastase', 'Trypsin', 'Papain', 'Thermo', 'ProtK', 'GluC', 'LysC')
+
+STARTUP_BUDGET_MS = 1500  # import time allowed to a subcommand, mostly pandas and Biopython
+LAZY_MODULES = ('matplotlib', 'seaborn', 'plotly', 'networkx', 'logomaker')  # never imported at startup
+COMMAND_MODULES = {
+    'cli': ('cli',),
+    'assemble': ('script_dbg', 'script_greedy'),
+    'map': ('Bio.SeqIO', 'mapping', 'preprocessing', 'compute_statistics'),
+    'cluster': ('clustering',),
+    'consensus': ('alignment', 'consensus'),
+    'gridsearch': ('src.opt.gridsearch',),
+}
+COMMAND_DIRS = {'gridsearch': GRIDSEARCH_DIR}  # working directory of the commands that do not run in src/
+
+
+def reference_sequence(args):
+    """ The reference protein of a subcommand, from --protein or from the first record of --reference, or None for
+    a reference panel (--references).
+    """
+    import Bio.SeqIO
+    import preprocessing as prep
+
+    if args.references is not None:
+        return None
+    if args.protein is not None:
+        protein = args.protein
+    else:
+        protein = str(next(Bio.SeqIO.parse(args.reference, "fasta")).seq)
+
+    return prep.normalize_sequence(protein)
+
+
+def assemble(args):
+    proteases = args.proteases.split(",")
+    protein = reference_sequence(args)
+    params = dict(conf=args.conf, min_overlap=args.min_overlap, min_identity=args.min_identity,
+                  max_mismatches=args.max_mismatches, size_threshold=args.size_threshold)
+    options = dict(target=args.to_stage, resume=args.resume, from_stage=args.from_stage, references=args.references)
+    if args.method == "dbg":
+        import script_dbg
+        result = script_dbg.run_pipeline_dbg(args.run, args.chain, protein, proteases, kmer_size=args.kmer_size,
+                                             **params, **options)
+    else:
+        import script_greedy
+        result = script_greedy.run_pipeline_greedy(args.run, args.chain, protein, proteases, **params, **options)
+    print(result)
+
+
+def map_sequences(args):
+    import Bio.SeqIO
+    import mapping as map
+    import compute_statistics as comp_stat
+
+    protein = reference_sequence(args)
+    sequences = [str(record.seq) for record in Bio.SeqIO.parse(args.fasta, "fasta")]
+    os.makedirs(args.output, exist_ok=True)
+    if args.references is not None:
+        import pipeline
+
+        statistics = pipeline.panel_statistics(sequences, args.sequence_type, args.output,
+                                               pipeline.reference_panel(args.references), args.max_mismatches,
+                                               args.min_identity)
+        print(json.dumps(statistics, indent=4, default=str))
+        return
+    mapped = map.process_protein_contigs_scaffold(sequences, protein, args.max_mismatches, args.min_identity)
+    statistics = comp_stat.compute_assembly_statistics(df=map.create_dataframe_from_mapped_sequences(data=mapped),
+                                                       sequence_type=args.sequence_type, output_folder=args.output,
+                                                       reference=protein)
+    print(json.dumps(statistics, indent=4, default=str))
+
+
+def cluster(args):
+    import clustering as clus
+
+    clus.cluster_fasta_folder(args.folder)
+
+
+def consensus(args):
+    import alignment as align
+    import consensus as cons
+
+    align.process_alignment(args.folder)
+    cons.process_alignment_files(os.path.join(args.folder, "align"), os.path.join(args.folder, "consensus"))
+
+
+def package_env():
+    """ Environment in which the grid search can import the package as `src`. """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(HERE), env.get("PYTHONPATH")]))
+
+    return env
+
+
+def gridsearch(args):
+    completed = subprocess.run([sys.executable, "-m", "src.opt.gridsearch", *args.arguments], cwd=GRIDSEARCH_DIR,
+                               env=package_env())
+    sys.exit(completed.returncode)
+
+
+def import_time(modules, cwd=HERE):
+    """ Import `modules` in a fresh interpreter with `-X importtime`, from the working directory `cwd`.
+
+    Returns:
+        tuple: (cumulative import time in ms, {imported module: cumulative ms}).
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+                               cwd=cwd, env=package_env(), capture_output=True, text=True, check=True)
+    total, imported = 0, {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        imported[name.strip()] = int(cumulative) / 1000
+        if not name[2:].startswith(" "):  # nested imports are indented
+            total += int(cumulative) / 1000
+
+    return total, imported
+
+
+def startup(args):
+    failed = False
+    for command, modules in COMMAND_MODULES.items():
+        total, imported = import_time(modules, COMMAND_DIRS.get(command, HERE))
+        slowest = sorted([(name, ms) for name, ms in imported.items() if name not in modules and "." not in name],
+                         key=lambda item: item[1], reverse=True)[:3]
+        eager = sorted({name.split(".")[0] for name in imported} & set(LAZY_MODULES))
+        over = total > args.budget
+        failed |= over or bool(eager)
+        print(f"{command:<10} {total:8.1f} ms {'OVER BUDGET' if over else ''}")
+        print("           slowest: " + ", ".join(f"{name} {ms:.1f} ms" for name, ms in slowest))
+        if eager:
+            print(f"           imported at startup: {', '.join(eager)}")
+    sys.exit(1 if failed else 0)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="instanexus", description="De novo protein assembly from peptide sequences.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    reference = argparse.ArgumentParser(add_help=False)
+    group = reference.add_mutually_exclusive_group(required=True)
+    group.add_argument("--protein", help="Reference protein sequence.")
+    group.add_argument("--reference", help="FASTA file whose first record is the reference protein.")
+    group.add_argument("--references", help="FASTA file of a reference panel: map against all its records at once "
+                                            "and write the statistics of every reference.")
+    reference.add_argument("--max-mismatches", type=int, default=20)
+    reference.add_argument("--min-identity", type=float, default=0.8)
+
+    parser_assemble = subparsers.add_parser("assemble", parents=[reference],
+                                            help="Assemble the PSMs of a run into contigs and scaffolds, and "
+                                                 "optionally run the rest of the pipeline.")
+    parser_assemble.add_argument("--method", choices=["dbg", "greedy"], default="dbg")
+    parser_assemble.add_argument("--run", required=True, help="Name of the run, read from ../inputs/<run>.csv.")
+    parser_assemble.add_argument("--chain", default="")
+    parser_assemble.add_argument("--proteases", default=",".join(PROTEASES), help="Comma-separated proteases.")
+    parser_assemble.add_argument("--conf", type=float, default=0.8, help="Minimum confidence of the PSMs.")
+    parser_assemble.add_argument("--kmer-size", type=int, default=7, help="k-mer size of the 'dbg' method.")
+    parser_assemble.add_argument("--min-overlap", type=int, default=3)
+    parser_assemble.add_argument("--size-threshold", type=int, default=20)
+    parser_assemble.add_argument("--to-stage", choices=STAGES, default="mapping",
+                                 help="Last stage to run; 'consensus' runs the whole pipeline.")
+    parser_assemble.add_argument("--resume", action="store_true",
+                                 help="Skip the stages whose cached result is still valid.")
+    parser_assemble.add_argument("--from-stage", choices=STAGES,
+                                 help="Resume, but run this stage and the ones after it again.")
+    parser_assemble.set_defaults(handler=assemble)
+
+    parser_map = subparsers.add_parser("map", parents=[reference],
+                                       help="Map the sequences of a FASTA file to the reference and compute their "
+                                            "statistics.")
+    parser_map.add_argument("fasta")
+    parser_map.add_argument("--output", default="statistics", help="Folder of the statistics.")
+    parser_map.add_argument("--sequence-type", default="scaffolds")
+    parser_map.set_defaults(handler=map_sequences)
+
+    parser_cluster = subparsers.add_parser("cluster", help="Cluster the FASTA files of a folder with mmseqs.")
+    parser_cluster.add_argument("folder", help="e.g. the scaffolds folder written by 'assemble'.")
+    parser_cluster.set_defaults(handler=cluster)
+
+    parser_consensus = subparsers.add_parser("consensus", help="Align the clusters of a folder and write their "
+                                                               "consensus sequences, heatmaps and logos.")
+    parser_consensus.add_argument("folder", help="A folder processed by 'cluster'.")
+    parser_consensus.set_defaults(handler=consensus)
+
+    parser_gridsearch = subparsers.add_parser("gridsearch", add_help=False,
+                                              help="Grid search over the pipeline parameters (opt/gridsearch.py).")
+    parser_gridsearch.add_argument("arguments", nargs=argparse.REMAINDER)
+    parser_gridsearch.set_defaults(handler=gridsearch)
+
+    parser_startup = subparsers.add_parser("startup", help="Measure the import time of every subcommand.")
+    parser_startup.add_argument("--budget", type=float, default=STARTUP_BUDGET_MS, help="Budget in ms.")
+    parser_startup.set_defaults(handler=startup)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, unknown = parser.parse_known_args(argv)
+    if args.command == "gridsearch":  # its options, --help included, are parsed by the grid search itself
+        args.arguments = unknown + args.arguments
+    elif unknown:
+        parser.error(f"unrecognized arguments: {' '.join(unknown)}")
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -46,7 +46,7 @@ def cluster_fasta_files(input_folder):
                 prefix = os.path.join(cluster_folder, base_filename) # define the prefix for mmseqs easy-cluster
                 
                 print(f"Clustering {fasta_file}...") # run mmseqs easy-cluster
-                subprocess.run(["mmseqs", "easy-cluster", fasta_path, prefix, temp_dir, "--min-seq-id", "0.85", "-c", "0.8", "--cov-mode", "1", "-v", "1"])
+                subprocess.run(["mmseqs", "easy-cluster", fasta_path, prefix, temp_dir, "--min-seq-id", "0.85", "-c", "0.8", "--cov-mode", "1", "-v", "1"], check=True)
                 print(f"Clustering completed for {fasta_file}, results stored with prefix {prefix}")
 
     shutil.rmtree(temp_dir) 
@@ -76,4 +76,17 @@ def process_fasta_and_clusters(fasta_file, cluster_tsv_folder, output_base_folde
     for cluster in tqdm(clusters, desc=f"Processing clusters for {base_filename}"):
         contigs = cluster_df[cluster_df['cluster'] == cluster]['contig'].values
         contig_records = [record for record in records if record.id in contigs]
-        Bio.SeqIO.write(contig_records, os.path.join(output_folder, f'{cluster}.fasta'), 'fasta')
\ No newline at end of file
+        Bio.SeqIO.write(contig_records, os.path.join(output_folder, f'{cluster}.fasta'), 'fasta')
+
+def cluster_fasta_folder(input_folder):
+    """ Cluster every FASTA file of `input_folder` with mmseqs and write the sequences of each cluster to its own
+    FASTA file, under `input_folder`/cluster_fasta.
+    """
+    cluster_fasta_files(input_folder)
+
+    cluster_tsv_folder = os.path.join(input_folder, "cluster")
+    output_base_folder = os.path.join(input_folder, "cluster_fasta")
+
+    for fasta_file in os.listdir(input_folder):
+        if fasta_file.endswith('.fasta'):
+            process_fasta_and_clusters(os.path.join(input_folder, fasta_file), cluster_tsv_folder, output_base_folder)
@@ -19,9 +19,6 @@ __status__ = Dev
 
 import os
 import json
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 
 
 def compute_assembly_statistics(df, sequence_type, output_folder, reference, **params):
@@ -90,4 +87,32 @@ def compute_assembly_statistics(df, sequence_type, output_folder, reference, **p
     with open(output_path, "w") as file:
         json.dump(statistics, file, indent=4)
 
-    return statistics
\ No newline at end of file
+    return statistics
+
+
+def compute_assembly_statistics_per_reference(mapped_by_reference, sequence_type, output_folder, references, **params):
+    """ Statistics for contigs and scaffolds mapped against a reference panel, one JSON file per reference
+
+    Args:
+        mapped_by_reference: {reference name: DataFrame with mapped values}, e.g. built from
+            `mapping.split_mapped_by_reference` and `mapping.create_dataframe_from_mapped_sequences`
+        sequence_type: either 'contigs' or 'scaffold'
+        output_folder: folder to save output
+        references: {reference name: reference protein normalized}
+
+    Returns:
+        {reference name: statistics}; references without any mapped sequence are skipped
+    """
+
+    all_statistics = {}
+    for reference_name, df in mapped_by_reference.items():
+        if df.empty:
+            continue
+        all_statistics[reference_name] = compute_assembly_statistics(df=df,
+                                                                     sequence_type=f"{sequence_type}_{reference_name}",
+                                                                     output_folder=output_folder,
+                                                                     reference=references[reference_name],
+                                                                     reference_name=reference_name,
+                                                                     **params)
+
+    return all_statistics
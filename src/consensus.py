@@ -24,13 +24,8 @@ import statistics
 import pandas as pd
 import Bio.SeqIO
 from collections import Counter
-import matplotlib.pyplot as plt
-import seaborn as sns
-import logomaker
 from tqdm import tqdm
 from Bio import SeqIO
-import plotly.express as px
-import plotly.io as pio
 
 
 
@@ -83,6 +78,9 @@ def generate_consensus(pssm_df, threshold=0.6):
 def plot_heatmap(pssm_df, output_file):
     """ Plots a heatmap of the given PSSM DataFrame and saves it to the specified output file.
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     # Set a maximum width for the figure to prevent excessively large images
     max_fig_width = 50  # Maximum width in inches
     fig_width = min(len(pssm_df) / 1.5, max_fig_width)
@@ -104,6 +102,9 @@ def plot_heatmap2(pssm_df, output_file):
     Plots a heatmap of the given PSSM DataFrame using Plotly, styled in red tones,
     with Arial font, labeled axes and colorbar, and saves as high-resolution SVG.
     """
+    import plotly.express as px
+    import plotly.io as pio
+
     df_t = pssm_df.T  # Transpose to have amino acids on Y and positions on X
 
     fig = px.imshow(
@@ -136,6 +137,9 @@ def plot_heatmap2(pssm_df, output_file):
 
 def plot_logo(pssm_df, title, output_file):
 
+    import matplotlib.pyplot as plt
+    import logomaker
+
     max_fig_width = 50  # Maximum width in inches
     fig_width = min(len(pssm_df) / 1.5, max_fig_width)
 
@@ -172,6 +176,9 @@ def plot_logo2(pssm_df, output_file):
     """
     Plots a sequence logo from a PSSM DataFrame using Logomaker and saves it as a high-resolution SVG.
     """
+    import matplotlib.pyplot as plt
+    import logomaker
+
     max_fig_width = 50  # Limit for very long sequences
     fig_width = min(len(pssm_df) / 1.5, max_fig_width)
 
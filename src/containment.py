@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+r""" Multi-pattern containment filter (Aho-Corasick) for contigs and scaffolds.
+ _____  _______  _    _
+|  __ \|__   __|| |  | |
+| |  | |  | |   | |  | |
+| |  | |  | |   | |  | |
+| |__| |  | |   | |__| |
+|_____/   |_|   |______|
+
+__authors__ = Marco Reverenna
+__copyright__ = Copyright 2025-2026
+__research-group__ = DTU Biosustain (Multi-omics Network Analytics) and DTU Bioengineering
+__date__ = 18 Oct 2026
+__maintainer__ = Marco Reverenna
+__email__ = marcor@dtu.dk
+__status__ = Dev
+"""
+
+# import libraries
+from collections import deque
+from tqdm import tqdm
+
+
+class Automaton:
+    """ Aho-Corasick automaton over a list of patterns.
+
+    Attributes:
+        patterns (list of str): The indexed patterns.
+        goto (list of dict): Trie transitions of every state.
+        fail (list of int): Failure link of every state.
+        pattern_id (list of int): Index of the pattern ending in each state, or -1.
+        report (list of int): Nearest state on the failure chain (the state itself included) where a pattern ends,
+            or -1; following `report[fail[state]]` enumerates all patterns ending at a position, longest first.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.goto = [{}]
+        self.fail = [0]
+        self.pattern_id = [-1]
+
+        for pid, pattern in enumerate(self.patterns):
+            state = 0
+            for residue in pattern:
+                next_state = self.goto[state].get(residue)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][residue] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.pattern_id.append(-1)
+                state = next_state
+            self.pattern_id[state] = pid
+
+        self.report = [-1] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self.report[state] = state if self.pattern_id[state] != -1 else self.report[self.fail[state]]
+
+            for residue, child in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and residue not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(residue, 0) if state else 0
+                queue.append(child)
+
+    def contained_ids(self, texts, disable_tqdm=True):
+        """ Return the indices of the patterns that occur in at least one of `texts` and are not equal to that text.
+
+        Only the longest pattern ending at each text position is looked up; the patterns further down its failure
+        chain are its own suffixes and are flagged by walking the chain until an already flagged state is reached.
+        Every state is therefore flagged at most once and the cost is linear in the total text length, regardless
+        of the number of matches or of the size of the automaton.
+        """
+        marked = set()
+
+        for text in tqdm(texts, desc="Scanning sequences", disable=disable_tqdm):
+            state = 0
+            for residue in text:
+                while state and residue not in self.goto[state]:
+                    state = self.fail[state]
+                state = self.goto[state].get(residue, 0)
+
+                hit = self.report[state]
+                if hit != -1 and self.patterns[self.pattern_id[hit]] == text:  # the text itself is not a containment
+                    hit = self.report[self.fail[hit]]
+                while hit != -1 and hit not in marked:
+                    marked.add(hit)
+                    hit = self.report[self.fail[hit]]
+
+        return {self.pattern_id[state] for state in marked}
+
+
+class ContainmentIndex:
+    """ Containment queries against a set of sequences that changes between calls.
+
+    The live sequences are split between a base automaton and a small delta of sequences added since the base was
+    built; the delta automaton is rebuilt on every query and the base only when the delta (or the removed part of the
+    base) outgrows it, so a round that adds a handful of sequences does not pay for re-indexing the whole set.
+    Automata are only built when a query needs them.
+    """
+
+    def __init__(self, sequences=()):
+        self._live = set()
+        self._live_size = 0
+        self._base = None
+        self._base_size = 0
+        self._delta = set()
+        self._delta_size = 0
+        self.add(sequences)
+
+    def __len__(self):
+        return len(self._live)
+
+    def __contains__(self, seq):
+        return seq in self._live
+
+    def add(self, sequences):
+        """ Add sequences to the live set. """
+        for seq in sequences:
+            if seq not in self._live:
+                self._live.add(seq)
+                self._live_size += len(seq)
+                self._delta.add(seq)
+                self._delta_size += len(seq)
+
+    def remove(self, sequences):
+        """ Remove sequences from the live set; they are kept in the base automaton but no longer reported. """
+        for seq in sequences:
+            if seq in self._live:
+                self._live.discard(seq)
+                self._live_size -= len(seq)
+                if seq in self._delta:
+                    self._delta.discard(seq)
+                    self._delta_size -= len(seq)
+
+    def _rebuild(self):
+        live = sorted(self._live)
+        self._base = Automaton(live) if live else None
+        self._base_size = self._live_size
+        self._delta = set()
+        self._delta_size = 0
+
+    def contained_in(self, texts):
+        """ Return the live sequences that are contained in one of `texts` (and differ from it). """
+        if self._delta_size > self._base_size or 2 * self._live_size < self._base_size:
+            self._rebuild()
+
+        texts = list(texts)
+        hits = set()
+        for automaton in (self._base, Automaton(sorted(self._delta)) if self._delta else None):
+            if automaton is not None:
+                hits.update(automaton.patterns[pid] for pid in automaton.contained_ids(texts))
+
+        return hits & self._live
+
+
+def find_contained(sequences, disable_tqdm=True):
+    """ Return the set of sequences that are substrings of another, different sequence of the list.
+
+    This is the result of the nested `c2 in c` loops used by the merge functions, computed with a single
+    Aho-Corasick automaton in time roughly linear in the total sequence length.
+    """
+    unique_seqs = list(dict.fromkeys(sequences))
+    automaton = Automaton(unique_seqs)
+    contained_seqs = {unique_seqs[pid] for pid in automaton.contained_ids(unique_seqs, disable_tqdm=disable_tqdm)}
+    if '' in unique_seqs and len(unique_seqs) > 1:  # the empty string ends in the root state, which is never reported
+        contained_seqs.add('')
+
+    return contained_seqs
+
+
+def remove_contained(sequences, disable_tqdm=True):
+    """ Deduplicate `sequences` and drop every sequence contained in another one, keeping first-occurrence order.
+    """
+    contained = find_contained(sequences, disable_tqdm=disable_tqdm)
+
+    return [seq for seq in dict.fromkeys(sequences) if seq not in contained]
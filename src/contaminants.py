@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+
+r""" Persistent suffix-array index of the contaminant proteins, used to filter PSMs.
+ _____  _______  _    _
+|  __ \|__   __|| |  | |
+| |  | |  | |   | |  | |
+| |  | |  | |   | |  | |
+| |__| |  | |   | |__| |
+|_____/   |_|   |______|
+
+__authors__ = Marco Reverenna
+__copyright__ = Copyright 2025-2026
+__research-group__ = DTU Biosustain (Multi-omics Network Analytics) and DTU Bioengineering
+__date__ = 18 Oct 2026
+__maintainer__ = Marco Reverenna
+__email__ = marcor@dtu.dk
+__status__ = Dev
+"""
+
+# import libraries
+import os
+import hashlib
+import tempfile
+import numpy as np
+from functools import lru_cache
+from Bio import SeqIO
+
+
+BSA_DESCRIPTION = "Bovine serum albumin precursor"
+SEPARATOR = "\n"  # cannot occur in a FASTA sequence, so no match can span two records
+
+
+def _file_mode():
+    umask = os.umask(0o022)  # the umask can only be read by setting it
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# mode of a new file under the umask, for the files created by mkstemp (always 0600); read once at import, since
+# setting the umask is not thread-safe
+FILE_MODE = _file_mode()
+
+
+def build_suffix_array(text):
+    """ Return the suffix array of `text` (start positions of its suffixes in sorted order), by prefix doubling.
+    """
+    n = len(text)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    rank = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    step = 1
+    while True:
+        second = np.full(n, -1, dtype=np.int64)  # suffixes shorter than `step` sort first, as in str comparison
+        second[:n - step] = rank[step:]
+        suffix_array = np.lexsort((second, rank))
+
+        first_sorted, second_sorted = rank[suffix_array], second[suffix_array]
+        new_group = (first_sorted[1:] != first_sorted[:-1]) | (second_sorted[1:] != second_sorted[:-1])
+        rank = np.empty(n, dtype=np.int64)
+        rank[suffix_array] = np.concatenate(([0], np.cumsum(new_group)))
+
+        if rank[suffix_array[-1]] == n - 1 or step >= n:
+            return suffix_array
+        step *= 2
+
+
+class ContaminantIndex:
+    """ Generalized suffix array over the contaminant proteins.
+
+    The proteins are concatenated with a separator and all the suffixes of the result are sorted once; whether a
+    PSM occurs in any contaminant is then a binary search over the suffixes, instead of a substring scan of every
+    contaminant. Indices are built by `load_contaminant_index`, which persists them next to the FASTA file.
+
+    Args:
+        text (str): Contaminant sequences joined by `SEPARATOR`.
+        suffix_array (np.ndarray): Suffix array of `text`.
+        n_records (int): Number of indexed contaminant sequences.
+    """
+
+    def __init__(self, text, suffix_array, n_records):
+        self.text = text
+        self.suffix_array = suffix_array
+        self.n_records = n_records
+
+    @classmethod
+    def from_fasta(cls, contaminants_fasta, exclude_descriptions=()):
+        """ Index the records of `contaminants_fasta`, skipping those whose description contains one of
+        `exclude_descriptions`.
+        """
+        records = [str(record.seq) for record in SeqIO.parse(contaminants_fasta, "fasta")
+                   if not any(term in record.description for term in exclude_descriptions)]
+        text = SEPARATOR.join(records)
+
+        return cls(text, build_suffix_array(text), len(records))
+
+    def save(self, path, fasta_digest):
+        """ Write the index to `path` (atomically, so concurrent workers never read a partial file). """
+        folder = os.path.dirname(os.path.abspath(path))
+        handle, tmp_path = tempfile.mkstemp(dir=folder, suffix='.npz')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                np.savez(file, text=np.array(self.text), suffix_array=self.suffix_array,
+                         n_records=self.n_records, fasta_digest=fasta_digest)
+            os.chmod(tmp_path, FILE_MODE)  # mkstemp creates it 0600: follow the umask, like the FASTA
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path, fasta_digest):
+        """ Read an index written by `save`, or return None if it is missing or was built from another FASTA. """
+        try:
+            with np.load(path) as data:
+                if str(data['fasta_digest']) != fasta_digest:
+                    return None
+                return cls(str(data['text']), data['suffix_array'], int(data['n_records']))
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def __contains__(self, seq):
+        """ Whether `seq` is a substring of one of the indexed contaminants. """
+        if not seq:
+            return self.n_records > 0
+        if SEPARATOR in seq:
+            return any(seq in record for record in self.text.split(SEPARATOR))
+
+        text, suffix_array, length = self.text, self.suffix_array, len(seq)
+        low, high = 0, len(suffix_array)
+        while low < high:  # first suffix whose prefix is >= seq
+            middle = (low + high) // 2
+            start = suffix_array[middle]
+            if text[start:start + length] < seq:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(suffix_array):
+            return False
+        start = suffix_array[low]
+
+        return text[start:start + length] == seq
+
+    def filter(self, seqs):
+        """ Return `seqs` without the sequences found in a contaminant, keeping order and duplicates. """
+        contaminated = {seq for seq in set(seqs) if seq in self}
+
+        return [seq for seq in seqs if seq not in contaminated]
+
+
+def index_path(contaminants_fasta, exclude_descriptions=()):
+    """ Path of the persisted index of `contaminants_fasta` for a given set of excluded descriptions. """
+    if not exclude_descriptions:
+        return f"{contaminants_fasta}.sa.npz"
+    tag = hashlib.sha1("\0".join(sorted(exclude_descriptions)).encode()).hexdigest()[:10]
+
+    return f"{contaminants_fasta}.{tag}.sa.npz"
+
+
+def load_contaminant_index(contaminants_fasta, exclude_descriptions=()):
+    """ Return the index of `contaminants_fasta`, loading it from disk when an up-to-date copy exists and
+    building and persisting it otherwise. Within a process the index is also kept in memory, so the scripts and
+    every grid-search worker only pay for it once.
+    """
+    stat = os.stat(contaminants_fasta)
+
+    return _load_contaminant_index(os.path.abspath(contaminants_fasta), tuple(exclude_descriptions),
+                                   stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=8)
+def _load_contaminant_index(contaminants_fasta, exclude_descriptions, mtime_ns, size):
+    with open(contaminants_fasta, 'rb') as file:
+        fasta_digest = hashlib.sha1(file.read()).hexdigest()
+
+    path = index_path(contaminants_fasta, exclude_descriptions)
+    index = ContaminantIndex.load(path, fasta_digest)
+    if index is None:
+        index = ContaminantIndex.from_fasta(contaminants_fasta, exclude_descriptions)
+        try:
+            index.save(path, fasta_digest)
+        except OSError:
+            pass  # read-only location: keep the in-memory index only
+
+    return index
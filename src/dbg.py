@@ -21,8 +21,28 @@ __status__ = Dev
 from collections import defaultdict
 from itertools import combinations
 from tqdm import tqdm
+import numpy as np
 import pandas as pd
 
+try:
+    from . import containment, overlap_index, scaffold_engine
+except ImportError:  # running the scripts from within src/
+    import containment
+    import overlap_index
+    import scaffold_engine
+
+
+# Integer k-mer encoding: every residue is packed into 5 bits, so a k-mer of up to
+# 12 residues fits in a single uint64 and k-mer sets can be handled as NumPy arrays.
+RESIDUE_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+BITS_PER_RESIDUE = 5
+MAX_ENCODED_KMER_SIZE = 64 // BITS_PER_RESIDUE
+
+_RESIDUE_MASK = np.uint64((1 << BITS_PER_RESIDUE) - 1)
+_ALPHABET_BYTES = np.frombuffer(RESIDUE_ALPHABET.encode('ascii'), dtype=np.uint8)
+_RESIDUE_CODES = np.full(256, 255, dtype=np.uint8)
+_RESIDUE_CODES[_ALPHABET_BYTES] = np.arange(len(RESIDUE_ALPHABET), dtype=np.uint8)
+
 
 def get_kmers(seqs, kmer_size):
     """ Generate k-mers of specified length from a list of sequences; a k-mer is a substring of length `kmer_size` extracted from each input sequence.
@@ -53,6 +73,77 @@ def get_kmer_counts(kmers):
     return kmer_counts
 
 
+def get_kmers_encoded(seqs, kmer_size):
+    """ Integer-encoded counterpart of `get_kmers`; all k-mers of all sequences are extracted at once and packed into a
+    uint64 array (5 bits per residue, first residue in the most significant bits), in the same order as `get_kmers`.
+    """
+
+    if not 1 <= kmer_size <= MAX_ENCODED_KMER_SIZE:
+        raise ValueError(f"kmer_size must be between 1 and {MAX_ENCODED_KMER_SIZE} for the encoded k-mer engine, got {kmer_size}.")
+
+    seqs = list(seqs)
+    lengths = np.fromiter((len(seq) for seq in seqs), dtype=np.int64, count=len(seqs))
+    kmers_per_seq = np.clip(lengths - kmer_size + 1, 0, None)
+    total_kmers = int(kmers_per_seq.sum())
+
+    if total_kmers == 0:
+        return np.empty(0, dtype=np.uint64)
+
+    joined = ''.join(seqs)
+    try:
+        residues = _RESIDUE_CODES[np.frombuffer(joined.encode('ascii'), dtype=np.uint8)]
+    except UnicodeEncodeError:
+        raise ValueError("Sequences contain non-ASCII characters and cannot be k-mer encoded.")
+
+    if (residues == 255).any():
+        invalid = sorted(set(joined) - set(RESIDUE_ALPHABET))
+        raise ValueError(f"Sequences contain residues that cannot be k-mer encoded: {invalid}")
+
+    # pack the window starting at every position of the concatenated sequences (Horner scheme, one pass per residue)
+    n_windows = len(residues) - kmer_size + 1
+    packed = np.zeros(n_windows, dtype=np.uint64)
+    for offset in range(kmer_size):
+        packed <<= np.uint64(BITS_PER_RESIDUE)
+        packed |= residues[offset:offset + n_windows].astype(np.uint64)
+
+    # keep only the windows that lie entirely inside one sequence
+    seq_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    kmer_starts = np.concatenate(([0], np.cumsum(kmers_per_seq)[:-1]))
+    positions = np.arange(total_kmers, dtype=np.int64) + np.repeat(seq_starts - kmer_starts, kmers_per_seq)
+
+    return packed[positions]
+
+
+def get_kmer_counts_encoded(encoded_kmers):
+    """ Count occurrences of each integer-encoded k-mer with a vectorized sort; returns the sorted unique codes and
+    their counts as two aligned arrays.
+    """
+
+    return np.unique(np.asarray(encoded_kmers, dtype=np.uint64), return_counts=True)
+
+
+def decode_kmers(encoded_kmers, kmer_size):
+    """ Decode integer-encoded k-mers back to amino acid strings.
+    """
+
+    encoded_kmers = np.asarray(encoded_kmers, dtype=np.uint64)
+    if kmer_size == 0:
+        return [''] * len(encoded_kmers)
+
+    shifts = np.arange(kmer_size - 1, -1, -1, dtype=np.uint64) * np.uint64(BITS_PER_RESIDUE)
+    residues = ((encoded_kmers[:, None] >> shifts) & _RESIDUE_MASK).astype(np.uint8)
+    joined = _ALPHABET_BYTES[residues].tobytes().decode('ascii')
+
+    return [joined[i:i + kmer_size] for i in range(0, len(joined), kmer_size)]
+
+
+def kmer_counts_to_dict(unique_kmers, counts, kmer_size):
+    """ Convert the output of `get_kmer_counts_encoded` to the dictionary returned by `get_kmer_counts`.
+    """
+
+    return dict(zip(decode_kmers(unique_kmers, kmer_size), counts.tolist()))
+
+
 def get_debruijn_edges_from_kmers(kmers):
     """ Generate edges of a De Bruijn graph from a list of k-mers.
     
@@ -74,6 +165,22 @@ def get_debruijn_edges_from_kmers(kmers):
     return edges
 
 
+def get_debruijn_edges_from_encoded(encoded_kmers, kmer_size):
+    """ Generate the De Bruijn graph edges of `get_debruijn_edges_from_kmers` from integer-encoded k-mers.
+
+    Each unique k-mer is one edge; its (k-1)-mer prefix and suffix are obtained by bit shifting and masking the
+    packed code, so only the unique k-mers are ever decoded to strings.
+    """
+
+    unique_kmers = np.unique(np.asarray(encoded_kmers, dtype=np.uint64))
+    suffix_mask = np.uint64((1 << (BITS_PER_RESIDUE * (kmer_size - 1))) - 1)
+
+    prefixes = decode_kmers(unique_kmers >> np.uint64(BITS_PER_RESIDUE), kmer_size - 1)
+    suffixes = decode_kmers(unique_kmers & suffix_mask, kmer_size - 1)
+
+    return set(zip(prefixes, suffixes))
+
+
 def assemble_contigs(edges):
     """ Assemble contigs from De Bruijn graph edges by traversing the graph; it takes a set of directed edges representing
     a De Bruijn graph and assembles contigs by performing a depth-first traversal. Each contig is a path in the graph where 
@@ -114,6 +221,88 @@ def assemble_contigs(edges):
     return contigs
 
 
+def build_unitig_graph(edges):
+    """ Compact a De Bruijn graph by collapsing every non-branching chain of (k-1)-mers into a single unitig.
+
+    The compaction is one linear pass over the nodes: a node starts a unitig when it does not have exactly one
+    incoming edge or when its only predecessor branches; the unitig is then extended while the path does not branch.
+    Isolated cycles without any entry point are dropped, as `assemble_contigs` never reaches them either.
+
+    Returns:
+        tuple: (unitigs, successors, start_ids, node_length) where `unitigs` is the list of unitig sequences,
+               `successors` maps each unitig ID to the IDs of the unitigs that follow it, `start_ids` are the unitigs
+               whose first node has no incoming edges and `node_length` is the length of the (k-1)-mer nodes.
+    """
+
+    graph = defaultdict(list)
+    in_degree = defaultdict(int)
+    predecessor = {}
+    for start, end in edges:
+        graph[start].append(end)
+        in_degree[end] += 1
+        predecessor[end] = start
+
+    nodes = list(graph.keys()) + [node for node in in_degree if node not in graph]
+    heads = {node for node in nodes if in_degree[node] != 1 or len(graph[predecessor[node]]) != 1}
+
+    unitigs = []
+    tails = []
+    unitig_id = {}
+    for head in heads:
+        residues = [head]
+        node = head
+        while len(graph[node]) == 1 and graph[node][0] not in heads:
+            node = graph[node][0]
+            residues.append(node[-1])
+        unitig_id[head] = len(unitigs)
+        unitigs.append(''.join(residues))
+        tails.append(node)
+
+    successors = [[unitig_id[next_node] for next_node in graph[tail]] for tail in tails]
+    start_ids = [unitig_id[head] for head in heads if in_degree[head] == 0]
+    node_length = len(next(iter(heads))) if heads else 0
+
+    return unitigs, successors, start_ids, node_length
+
+
+def assemble_contigs_compacted(edges):
+    """ Assemble contigs like `assemble_contigs`, but traversing the unitig graph built by `build_unitig_graph`.
+
+    The depth-first search visits unitigs instead of single (k-1)-mers and keeps the current path as a list of unitig
+    pieces indexed by depth, so a contig is joined only once, when the traversal reaches a unitig without successors.
+    """
+
+    unitigs, successors, start_ids, node_length = build_unitig_graph(edges)
+
+    # consecutive unitigs share the k-2 residues between a tail node and the next head node
+    extensions = [unitig[node_length - 1:] for unitig in unitigs]
+
+    contigs = []
+    for start_id in tqdm(start_ids, desc="Traversing unitigs"):
+        stack = [(start_id, 0)]
+        visited = set()
+        path = []  # sequence pieces of the unitigs on the current path, indexed by depth
+
+        while stack:
+            unitig, depth = stack.pop()
+            if unitig in visited:
+                continue
+            visited.add(unitig)
+
+            del path[depth:]
+            path.append(extensions[unitig] if depth else unitigs[unitig])
+
+            if successors[unitig]:
+                stack.extend((next_unitig, depth + 1) for next_unitig in successors[unitig])
+            else:  # end of a path
+                contigs.append(''.join(path))
+
+    contigs = sorted(contigs, key=len, reverse=True)
+    contigs = list(set(contigs))
+
+    return contigs
+
+
 def get_kmers_from_df(df, kmer_size):
     """ Generate k-mers of specified length from a DataFrame, preserving metadata.
     """
@@ -131,24 +320,17 @@ def get_kmers_from_df(df, kmer_size):
 def find_overlaps(contigs, min_overlap, disable_tqdm=False):
     """Find overlaps between pairs of contigs based on specified minimum overlap.
     """
-    overlaps = []
-    total_pairs = sum(1 for _ in combinations(contigs, 2))  # Calculate total number of pairs
-
-    with tqdm(total=total_pairs, desc="Finding overlaps", disable=disable_tqdm) as pbar:
-        for a, b in combinations(contigs, 2): # combinations() generates all pairs of contigs
-            for i in range(min_overlap, min(len(a), len(b)) + 1): # Check overlaps of different lengths
-                if a[-i:] == b[:i]:
-                    overlaps.append((a, b, i))
-                if b[-i:] == a[:i]:
-                    overlaps.append((b, a, i))
-            pbar.update(1) 
-    
-    return overlaps
+    return overlap_index.find_overlaps(contigs, min_overlap, disable_tqdm=disable_tqdm)
 
 
-def create_scaffolds(contigs, min_overlap, disable_tqdm=False):
+def create_scaffolds(contigs, min_overlap, disable_tqdm=False, budget=None):
     """ Create scaffolds from a list of contigs by merging overlapping sequences.
+
+    With a `scaffold_engine.ScaffoldBudget`, only the best `budget.max_candidates` sequences are returned and no
+    merges are attempted once its time budget is spent (see `scaffold_engine.bounded_combine`).
     """
+    if budget is not None:
+        return scaffold_engine.bounded_combine(contigs, min_overlap, budget, disable_tqdm=disable_tqdm)
 
     overlaps = find_overlaps(contigs, min_overlap=min_overlap, disable_tqdm=disable_tqdm)
     combined_contigs = []
@@ -162,12 +344,8 @@ def create_scaffolds(contigs, min_overlap, disable_tqdm=False):
 
 def merge_sequences(contigs, disable_tqdm=False):
    """ Merges overlapping sequences. """
-   contigs = sorted(contigs, key=len, reverse=True)
    merged = set(contigs)
-   for c in tqdm(contigs, desc="Merging contigs", disable=disable_tqdm):
-       for c2 in contigs:
-           if c != c2 and c2 in c:  # if c2 is a substring of c
-               merged.discard(c2)
+   merged -= containment.find_contained(contigs, disable_tqdm=disable_tqdm)  # drop sequences that are substrings of others
    return list(merged)
 
 
@@ -252,14 +430,12 @@ def calculate_overlap(s1, s2, min_overlap):
 
 def remove_contained_sequences(sequences):
     unique_seqs = list(set(sequences))
-    to_remove = set()
-    for i, s1 in enumerate(unique_seqs):
-        for j, s2 in enumerate(unique_seqs):
-            if i != j and s1 in s2:
-                to_remove.add(s1)
+    to_remove = containment.find_contained(unique_seqs)
     return [s for s in unique_seqs if s not in to_remove]
 
 def build_overlap_graph(sequences, min_overlap):
+    import networkx as nx
+
     G = nx.DiGraph()
     for seq in sequences:
         G.add_node(seq)
@@ -279,6 +455,8 @@ def merge_path_sequences(path, min_overlap):
     return scaffold
 
 def find_all_paths_networkx_include_isolated(graph):
+    import networkx as nx
+
     all_paths = []
     nodes = list(graph.nodes())
     included_nodes = set()
@@ -345,12 +523,22 @@ def assemble_scaffolds_dfs(sequences, min_overlap):
     return scaffolds_dfs
 
 
-def scaffold_iterative(contigs, min_overlap, size_threshold, disable_tqdm=False):
+def scaffold_iterative(contigs, min_overlap, size_threshold, disable_tqdm=False, incremental=False, budget=None):
+    """ Repeat scaffold creation, containment removal and size filtering until the scaffolds stop changing.
+
+    With `incremental=True` the overlaps are kept between rounds and only recomputed for the scaffolds that changed
+    (see `scaffold_engine.scaffold_fixed_point`); the resulting scaffolds are the same.
+    With a `scaffold_engine.ScaffoldBudget`, every round is bounded by it and the loop stops with the best scaffolds
+    so far once the budget is spent; `incremental` is ignored in that case.
+    """
+    if incremental and budget is None:
+        return scaffold_engine.scaffold_fixed_point(contigs, min_overlap, size_threshold, combine_passes=1, disable_tqdm=disable_tqdm)
+
     prev = None
     current = contigs
-    while prev != current:
+    while prev != current and not (budget is not None and budget.expired()):
         prev = current
-        current = create_scaffolds(current, min_overlap, disable_tqdm)
+        current = create_scaffolds(current, min_overlap, disable_tqdm, budget=budget)
         current = merge_sequences(current, disable_tqdm)
 
         current = list(set(current))
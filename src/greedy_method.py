@@ -18,6 +18,7 @@ __status__ = Dev
 """
 
 import Bio
+import heapq
 from itertools import combinations
 from collections import defaultdict
 import numpy as np
@@ -25,6 +26,13 @@ from tqdm import tqdm
 import Bio.Seq
 import Bio.SeqRecord
 
+try:
+    from . import containment, overlap_index, scaffold_engine
+except ImportError:  # running the scripts from within src/
+    import containment
+    import overlap_index
+    import scaffold_engine
+
 
 
 # def find_overlaps_greedy(peptides, min_overlap):
@@ -135,6 +143,101 @@ def assemble_contigs(peptides, min_overlap):
 
 
 
+def assemble_contigs_incremental(peptides, min_overlap):
+    """ Incremental version of `assemble_contigs` that produces the same contigs in the same order.
+
+    Instead of rescanning all pairs in every round, the candidate overlaps of each contig are kept in a priority queue
+    keyed by (overlap length, list position) and a prefix/suffix index is used to find the partners of the contigs
+    created by a merge. Queue entries pointing to merged (dead) contigs are discarded lazily, so only the merged
+    contigs' edges are invalidated between rounds.
+
+    Args:
+        peptides (list of str): A list of peptide sequences.
+        min_overlap (int): The minimum length required for an overlap.
+
+    Returns:
+        list of str: The assembled contigs, as returned by `assemble_contigs`.
+    """
+    sequences = {}  # contig ID -> sequence
+    # position key of each contig; sorting by it reproduces the list order of `assemble_contigs` in every round:
+    # contigs merged in later rounds come first, ties are broken by the order in which they were merged
+    order_key = {}
+    candidates = defaultdict(list)  # contig ID -> heap of (-overlap length, position key of partner, partner ID)
+    index = overlap_index.AffixIndex(min_overlap)
+
+    def push_successors(source):
+        seq = sequences[source]
+        seen = set()
+        for target, overlap_len in index.successors(seq, max_overlap=len(seq) - 1):
+            if target != source and target not in seen and overlap_len < len(sequences[target]):
+                seen.add(target)
+                heapq.heappush(candidates[source], (-overlap_len, order_key[target], target))
+
+    def push_predecessors(target, skip):
+        seq = sequences[target]
+        seen = set()
+        for source, overlap_len in index.predecessors(seq, max_overlap=len(seq) - 1):
+            if source not in skip and source not in seen and overlap_len < len(sequences[source]):
+                seen.add(source)
+                heapq.heappush(candidates[source], (-overlap_len, order_key[target], target))
+
+    order = list(range(len(peptides)))
+    for position, peptide in enumerate(peptides):
+        sequences[position] = peptide
+        order_key[position] = (0, position)
+        index.add(position, peptide)
+
+    for position in tqdm(order, desc="Finding overlaps"):
+        push_successors(position)
+
+    next_id = len(peptides)
+    iteration = 0
+
+    while True:
+        iteration += 1
+        merges = []
+        used = set()
+
+        for i in order:
+            heap = candidates.get(i)
+            while heap and heap[0][2] not in sequences:  # partner was merged in a previous round
+                heapq.heappop(heap)
+            if not heap or i in used:
+                continue
+
+            neg_overlap_len, _, j = heap[0]
+            if j not in used:
+                merges.append((i, j, -neg_overlap_len))
+                used.update([i, j])
+
+        if not merges:
+            break
+
+        new_ids = []
+        for rank, (i, j, overlap_len) in enumerate(merges):
+            new_contig = sequences[i] + sequences[j][overlap_len:]
+            for merged in (i, j):
+                index.remove(merged)
+                candidates.pop(merged, None)
+                del sequences[merged]
+
+            sequences[next_id] = new_contig
+            order_key[next_id] = (-iteration, rank)
+            index.add(next_id, new_contig)
+            new_ids.append(next_id)
+            next_id += 1
+
+        new_set = set(new_ids)
+        for new_id in new_ids:
+            push_successors(new_id)
+            push_predecessors(new_id, skip=new_set)
+
+        order = new_ids + [idx for idx in order if idx not in used]
+
+    return [sequences[idx] for idx in order]
+
+
+
 def find_contig_overlap(seq1, seq2, min_overlap):
     """ 
     Finds the maximum overlap between two sequences with a minimum overlap length.
@@ -238,13 +341,8 @@ def merge_contigs(contigs):
    substring of another. If a contig is found to be a substring of another,
    it is discarded, and the larger contig is kept.
    """
-   contigs = sorted(contigs, key=len, reverse=True)
    merged = set(contigs)
-   for c in tqdm(contigs, desc="Merging contigs"):
-       #print(c)
-       for c2 in contigs:
-           if c != c2 and c2 in c: # if c is a substring of c2
-               merged.discard(c2)
+   merged -= containment.find_contained(contigs, disable_tqdm=False) # drop contigs that are substrings of others
 
    return list(merged)
 
@@ -256,25 +354,20 @@ def find_overlaps(contigs, min_overlap):
     returns a list of tuples representing the overlaps between pairs of contigs. 
     Each tuple contains two contigs and the length of their overlap.
     """
-    overlaps = []
-
-    for a, b in combinations(contigs, 2):
-        for i in range(min_overlap, min(len(a), len(b)) + 1):
-            if a[-i:] == b[:i]:
-                overlaps.append((a, b, i))
-            if b[-i:] == a[:i]:
-                overlaps.append((b, a, i))
-
-    return overlaps
+    return overlap_index.find_overlaps(contigs, min_overlap, disable_tqdm=True)
 
 
 
-def combine_seqs_into_scaffolds(contigs, min_overlap):
+def combine_seqs_into_scaffolds(contigs, min_overlap, budget=None):
     """ Combine contigs based on a minimum overlap length.
     This function takes a list of contigs and a minimum overlap length, finds
     the overlaps between the contigs, and combines them. The combined
     contigs are then returned along with the original contigs.
+    With a `scaffold_engine.ScaffoldBudget`, only the best `budget.max_candidates`
+    sequences are returned (see `scaffold_engine.bounded_combine`).
     """
+    if budget is not None:
+        return scaffold_engine.bounded_combine(contigs, min_overlap, budget)
     overlaps = find_overlaps(contigs, min_overlap=min_overlap)
     combined_contigs = []
 
@@ -285,19 +378,29 @@ def combine_seqs_into_scaffolds(contigs, min_overlap):
     return combined_contigs + contigs
 
 
-def scaffold_iterative_greedy(contigs, min_overlap, size_threshold, disable_tqdm=False):
+def scaffold_iterative_greedy(contigs, min_overlap, size_threshold, disable_tqdm=False, incremental=False, budget=None):
+    """ Repeat two combine steps and a containment merge, with size filtering, until the scaffolds stop changing.
+
+    With `incremental=True` the overlaps are kept between rounds and only recomputed for the scaffolds that changed
+    (see `scaffold_engine.scaffold_fixed_point`); the resulting scaffolds are the same.
+    With a `scaffold_engine.ScaffoldBudget`, every combine step is bounded by it and the loop stops with the best
+    scaffolds so far once the budget is spent; `incremental` is ignored in that case.
+    """
+    if incremental and budget is None:
+        return scaffold_engine.scaffold_fixed_point(contigs, min_overlap, size_threshold, combine_passes=2, disable_tqdm=disable_tqdm)
+
     prev = None
     current = contigs
 
-    while prev != current:
+    while prev != current and not (budget is not None and budget.expired()):
         prev = current
         
-        current = combine_seqs_into_scaffolds(current, min_overlap)
+        current = combine_seqs_into_scaffolds(current, min_overlap, budget=budget)
         current = list(set(current))
         current = [s for s in current if len(s) > size_threshold]
         current = sorted(current, key=len, reverse=True)
 
-        current = combine_seqs_into_scaffolds(current, min_overlap)
+        current = combine_seqs_into_scaffolds(current, min_overlap, budget=budget)
         current = list(set(current))
         current = [s for s in current if len(s) > size_threshold]
         current = sorted(current, key=len, reverse=True)
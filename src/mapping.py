@@ -19,13 +19,13 @@ __status__ = Dev
 
 import os
 import Bio.SeqIO
-import matplotlib.pyplot as plt
-import seaborn as sns
 from tqdm import tqdm
-import matplotlib.patches as patches
-import plotly.graph_objects as go
 import logging
+import numpy as np
 import pandas as pd
+from collections import defaultdict
+from functools import lru_cache
+from numpy.lib.stride_tricks import sliding_window_view
 
 def map_to_protein(seq, protein, max_mismatches, min_identity):
     """ Maps a sequence (`seq`) to a target protein sequence, allowing for mismatches, 
@@ -67,23 +67,328 @@ def map_to_protein(seq, protein, max_mismatches, min_identity):
     return best_match
 
 
+def map_to_protein_batch(seqs, protein, max_mismatches, min_identity, max_cells=2**24):
+    """ Vectorized `map_to_protein` for many sequences against the same protein.
+
+    The protein and the sequences are encoded as uint8 arrays and the sequences are grouped by length; for each
+    group the mismatch counts at every offset are accumulated one column at a time over a sliding-window view of
+    the protein, so the cost is a handful of numpy operations per residue instead of a Python loop per offset.
+    The result for each sequence is the same tuple (start, end, mismatch_positions, identity) that
+    `map_to_protein` returns, i.e. the first offset with the fewest mismatches, or None.
+
+    Args:
+        seqs (list of str): Sequences to map.
+        protein (str): Target protein sequence.
+        max_mismatches (int): Maximum number of mismatches allowed.
+        min_identity (float): Minimum identity required.
+        max_cells (int): Upper bound on the size of the mismatch matrix of a batch (sequences x offsets).
+
+    Returns:
+        list: One mapping tuple or None per input sequence, in input order.
+    """
+    results = {}
+    by_length = defaultdict(list)
+    ascii_protein = protein.isascii()
+    for seq in dict.fromkeys(seqs):
+        if not seq or not ascii_protein or not seq.isascii() or len(seq) > len(protein):
+            results[seq] = map_to_protein(seq, protein, max_mismatches, min_identity)
+        else:
+            by_length[len(seq)].append(seq)
+
+    if not by_length:  # nothing to vectorize, and a non-ASCII protein cannot be encoded
+        return [results[seq] for seq in seqs]
+
+    reference = np.frombuffer(protein.encode('ascii'), dtype=np.uint8)
+    for length, group in by_length.items():
+        windows = sliding_window_view(reference, length)
+        n_offsets = len(windows)
+        batch_size = max(1, max_cells // n_offsets)
+
+        for batch_start in range(0, len(group), batch_size):
+            batch = group[batch_start:batch_start + batch_size]
+            encoded = np.frombuffer(''.join(batch).encode('ascii'), dtype=np.uint8).reshape(len(batch), length)
+
+            mismatches = np.zeros((len(batch), n_offsets), dtype=np.int32)
+            for j in range(length):
+                mismatches += encoded[:, j, None] != windows[None, :, j]
+
+            best_offsets = mismatches.argmin(axis=1)  # first offset with the fewest mismatches
+            best_counts = mismatches[np.arange(len(batch)), best_offsets]
+
+            for seq, row, offset, count in zip(batch, encoded, best_offsets.tolist(), best_counts.tolist()):
+                identity = 1 - count / length
+                if count <= max_mismatches and identity >= min_identity and identity > 0:
+                    mismatch_positions = np.flatnonzero(row != windows[offset]).tolist()
+                    results[seq] = (offset, offset + length, mismatch_positions, identity)
+                else:
+                    results[seq] = None
+
+    return [results[seq] for seq in seqs]
+
+
+class ReferenceIndex:
+    """ Exact-seed index of a target protein for mismatch-tolerant mapping.
+
+    A sequence of length L that maps with at most m mismatches, split into m + 1 non-overlapping pieces, has at
+    least one piece matching the reference exactly (pigeonhole principle). Looking the pieces up in a table of the
+    reference substrings therefore yields every offset that can satisfy the thresholds, and only those offsets are
+    verified. The table of each seed length is built on first use and kept, so one index serves all the mappings
+    against the same protein; use `get_reference_index` to share it across calls.
+    """
+
+    def __init__(self, protein):
+        self.protein = protein
+        self._seeds = {}
+
+    def seed_positions(self, seed_len):
+        """ Return the table {substring: [positions]} of all reference substrings of length `seed_len`. """
+        if seed_len not in self._seeds:
+            table = defaultdict(list)
+            for position in range(len(self.protein) - seed_len + 1):
+                table[self.protein[position:position + seed_len]].append(position)
+            self._seeds[seed_len] = table
+        return self._seeds[seed_len]
+
+    def candidate_offsets(self, seq, max_errors):
+        """ Return the sorted offsets where `seq` can align with at most `max_errors` mismatches. """
+        seed_len = len(seq) // (max_errors + 1)
+        table = self.seed_positions(seed_len)
+        last_offset = len(self.protein) - len(seq)
+
+        offsets = set()
+        for piece_start in range(0, (max_errors + 1) * seed_len, seed_len):
+            for position in table.get(seq[piece_start:piece_start + seed_len], ()):
+                offset = position - piece_start
+                if 0 <= offset <= last_offset:
+                    offsets.add(offset)
+        return sorted(offsets)
+
+    def map(self, seq, max_mismatches, min_identity):
+        """ Same result as `map_to_protein(seq, self.protein, max_mismatches, min_identity)`. """
+        return self.map_batch([seq], max_mismatches, min_identity)[0]
+
+    def map_batch(self, seqs, max_mismatches, min_identity, max_candidate_fraction=0.25):
+        """ Same result as `map_to_protein_batch(seqs, self.protein, max_mismatches, min_identity)`.
+
+        Sequences whose seeds are so short that they hit more than `max_candidate_fraction` of the offsets are
+        mapped by the vectorized full scan instead.
+        """
+        results = {}
+        full_scan = []
+        for seq in dict.fromkeys(seqs):
+            max_errors = mismatch_budget(len(seq), max_mismatches, min_identity)
+            if not seq or len(seq) > len(self.protein):
+                results[seq] = map_to_protein(seq, self.protein, max_mismatches, min_identity)
+                continue
+            if max_errors < 0:
+                results[seq] = None
+                continue
+
+            offsets = self.candidate_offsets(seq, max_errors)
+            if len(offsets) > max_candidate_fraction * (len(self.protein) - len(seq) + 1):
+                full_scan.append(seq)
+                continue
+
+            results[seq] = best_alignment(seq, self.protein, offsets, max_errors)
+
+        results.update(zip(full_scan, map_to_protein_batch(full_scan, self.protein, max_mismatches, min_identity)))
+
+        return [results[seq] for seq in seqs]
+
+
+class MultiReferenceIndex:
+    """ Exact-seed index of all the records of a reference panel (e.g. the chains of a FASTA file), mapped together.
+
+    Works like `ReferenceIndex`, with a single seed table over every record, so each sequence is looked up once
+    against the whole panel instead of once per reference. The best hit of a sequence is the reference where it
+    aligns with the fewest mismatches (the first record in panel order on ties), and the alignment on that
+    reference is the one `map_to_protein` returns for it.
+
+    Args:
+        references (dict): Reference sequences by name, in panel order.
+    """
+
+    def __init__(self, references):
+        self.names = list(references)
+        self.sequences = [references[name] for name in self.names]
+        self._seeds = {}
+
+    def seed_positions(self, seed_len):
+        """ Return the table {substring: [(reference id, position)]} of all substrings of length `seed_len`. """
+        if seed_len not in self._seeds:
+            table = defaultdict(list)
+            for ref_id, reference in enumerate(self.sequences):
+                for position in range(len(reference) - seed_len + 1):
+                    table[reference[position:position + seed_len]].append((ref_id, position))
+            self._seeds[seed_len] = table
+        return self._seeds[seed_len]
+
+    def candidate_offsets(self, seq, max_errors):
+        """ Return {reference id: sorted offsets} where `seq` can align with at most `max_errors` mismatches. """
+        seed_len = len(seq) // (max_errors + 1)
+        table = self.seed_positions(seed_len)
+
+        offsets = defaultdict(set)
+        for piece_start in range(0, (max_errors + 1) * seed_len, seed_len):
+            for ref_id, position in table.get(seq[piece_start:piece_start + seed_len], ()):
+                offset = position - piece_start
+                if 0 <= offset <= len(self.sequences[ref_id]) - len(seq):
+                    offsets[ref_id].add(offset)
+        return {ref_id: sorted(offsets[ref_id]) for ref_id in sorted(offsets)}
+
+    def map_batch(self, seqs, max_mismatches, min_identity, max_candidate_fraction=0.25):
+        """ Map every sequence against the whole panel.
+
+        Returns:
+            list: One (reference name, (start, end, mismatch_positions, identity)) pair or None per input sequence.
+        """
+        results = {}
+        full_scan = []
+        for seq in dict.fromkeys(seqs):
+            max_errors = mismatch_budget(len(seq), max_mismatches, min_identity)
+            if max_errors < 0:
+                results[seq] = None
+                continue
+
+            offsets = self.candidate_offsets(seq, max_errors)
+            total_offsets = sum(max(0, len(reference) - len(seq) + 1) for reference in self.sequences)
+            if sum(map(len, offsets.values())) > max_candidate_fraction * total_offsets:
+                full_scan.append(seq)
+                continue
+
+            hits = ((ref_id, best_alignment(seq, self.sequences[ref_id], ref_offsets, max_errors))
+                    for ref_id, ref_offsets in offsets.items())
+            results[seq] = self._best_hit(hits)
+
+        if full_scan:
+            per_reference = [map_to_protein_batch(full_scan, reference, max_mismatches, min_identity)
+                             for reference in self.sequences]
+            for position, seq in enumerate(full_scan):
+                results[seq] = self._best_hit((ref_id, mappings[position]) for ref_id, mappings in enumerate(per_reference))
+
+        return [results[seq] for seq in seqs]
+
+    def _best_hit(self, hits):
+        best = None
+        for ref_id, mapping in hits:
+            if mapping is not None and (best is None or len(mapping[2]) < len(best[1][2])):
+                best = (self.names[ref_id], mapping)
+        return best
+
+
+def best_alignment(seq, reference, offsets, max_errors):
+    """ Return the `map_to_protein` tuple of the first of `offsets` with the fewest (at most `max_errors`) mismatches.
+    """
+    best_match = None
+    for offset in offsets:
+        window = reference[offset:offset + len(seq)]
+        mismatch_positions = [j for j, (a, b) in enumerate(zip(seq, window)) if a != b]
+        if len(mismatch_positions) <= max_errors and (best_match is None or len(mismatch_positions) < len(best_match[2])):
+            best_match = (offset, offset + len(seq), mismatch_positions, 1 - len(mismatch_positions) / len(seq))
+    return best_match
+
+
+def mismatch_budget(length, max_mismatches, min_identity):
+    """ Largest number of mismatches for which `map_to_protein` accepts an alignment of `length` residues, or -1.
+    """
+    max_errors = min(max_mismatches, length - 1)  # identity must also stay strictly positive
+    while max_errors >= 0 and 1 - max_errors / length < min_identity:
+        max_errors -= 1
+    return max_errors
+
+
+@lru_cache(maxsize=8)
+def get_reference_index(protein):
+    """ Return the `ReferenceIndex` of `protein`, shared by all the calls of the process (and so by all the
+    combinations a grid-search worker runs).
+    """
+    return ReferenceIndex(protein)
+
+
 def process_protein_contigs_scaffold(assembled_contigs, target_protein, max_mismatches, min_identity):
     """ Maps each contig in `assembled_contigs` to a target protein sequence (`target_protein`)
     and identifies which contigs match based on specified mismatch and identity thresholds.
     """
     mapped_sequences = []
 
-    # Map each contig to the target protein
-    for contig in assembled_contigs:
-        # Attempt to map the contig to the target protein
-        target_mapping = map_to_protein(contig, target_protein, max_mismatches=max_mismatches, min_identity=min_identity)
-        
+    # Map all contigs to the target protein at once, verifying only the offsets hit by exact seeds
+    reference_index = get_reference_index(target_protein)
+    target_mappings = reference_index.map_batch(assembled_contigs, max_mismatches=max_mismatches, min_identity=min_identity)
+
+    for contig, target_mapping in zip(assembled_contigs, target_mappings):
         if target_mapping:
             mapped_sequences.append((contig, target_mapping))
     
     return mapped_sequences
 
 
+def process_protein_contigs_thresholds(assembled_contigs, target_protein, thresholds):
+    """ `process_protein_contigs_scaffold` for several (max_mismatches, min_identity) pairs at once.
+
+    The alignment `map_to_protein` reports for a contig is always its best one (the first offset with the fewest
+    mismatches), whatever the thresholds; the thresholds only decide whether it is accepted. The contigs are
+    therefore mapped once under the loosest pair, and the mappings of every pair are selected from the resulting
+    mismatch counts and identities with one vectorized comparison per pair.
+
+    Returns:
+        dict: (max_mismatches, min_identity) -> list of (contig, mapping), as returned by
+        `process_protein_contigs_scaffold` for that pair.
+    """
+    thresholds = list(dict.fromkeys(thresholds))
+    if not thresholds:
+        return {}
+
+    loosest_mismatches = max(max_mismatches for max_mismatches, _ in thresholds)
+    loosest_identity = min(min_identity for _, min_identity in thresholds)
+    mapped_sequences = process_protein_contigs_scaffold(assembled_contigs, target_protein,
+                                                        loosest_mismatches, loosest_identity)
+
+    mismatches = np.array([len(mapping[2]) for _, mapping in mapped_sequences], dtype=np.int64)
+    identities = np.array([mapping[3] for _, mapping in mapped_sequences], dtype=np.float64)
+
+    mapped_by_threshold = {}
+    for max_mismatches, min_identity in thresholds:
+        accepted = np.flatnonzero((mismatches <= max_mismatches) & (identities >= min_identity))
+        mapped_by_threshold[(max_mismatches, min_identity)] = [mapped_sequences[i] for i in accepted]
+
+    return mapped_by_threshold
+
+
+def load_references(fasta_path):
+    """ Read a reference panel from a FASTA file as {record id: sequence}, in file order. """
+    return {record.id: str(record.seq) for record in Bio.SeqIO.parse(fasta_path, "fasta")}
+
+
+def process_protein_contigs_multi(assembled_contigs, references, max_mismatches, min_identity):
+    """ Maps each contig in `assembled_contigs` once against all the `references` ({name: sequence}) and keeps
+    the contigs that match one of them, with their best-hit reference.
+
+    Returns:
+        list of tuples: (contig, reference name, (start, end, mismatch_positions, identity)).
+    """
+    mapped_sequences = []
+
+    reference_index = MultiReferenceIndex(references)
+    hits = reference_index.map_batch(assembled_contigs, max_mismatches=max_mismatches, min_identity=min_identity)
+
+    for contig, hit in zip(assembled_contigs, hits):
+        if hit:
+            mapped_sequences.append((contig, hit[0], hit[1]))
+
+    return mapped_sequences
+
+
+def split_mapped_by_reference(mapped_sequences):
+    """ Group the output of `process_protein_contigs_multi` by reference, as {name: [(contig, mapping)]}, so that
+    every group can go through the single-reference helpers (e.g. `create_dataframe_from_mapped_sequences`).
+    """
+    by_reference = defaultdict(list)
+    for contig, reference_name, mapping in mapped_sequences:
+        by_reference[reference_name].append((contig, mapping))
+
+    return dict(by_reference)
+
+
 
 def write_mapped_contigs(mapped_contigs, folder, filename_prefix):
     """
@@ -131,6 +436,10 @@ def write_mapped_contigs(mapped_contigs, folder, filename_prefix):
 
 
 def plot_contigs(mapped_contigs, prot_seq, title, output_file):
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+    import seaborn as sns
+
     sns.set('paper', 'ticks', 'colorblind', font_scale=1.5)
     _, ax = plt.subplots(figsize=(12, 4))
 
@@ -194,6 +503,8 @@ def mapping_sequences(mapped_sequences, prot_seq, title, output_folder, output_f
     title (str): Title of the plot.
     output_file (str): Path to save the output plot.
     """
+    import plotly.graph_objects as go
+
     fig = go.Figure()
 
     # Add background rectangle for the protein sequence
@@ -266,6 +577,8 @@ def mapping_substitutions(mapped_sequences, prot_seq, title,
                           bar_colors=None, output_file=None, output_folder=".", 
                           contig_colors="#6baed6", match_color="#6baed6"):
 
+    import plotly.graph_objects as go
+
     default_colors = {
         "match": match_color,
         "mismatch": "#b30000",
@@ -374,6 +687,8 @@ def mapping_substitutions(mapped_sequences, prot_seq, title,
 
 def mapping_psms_protease_associated(mapped_sequences, prot_seq, labels, palette, title, output_folder, output_file):
 
+    import plotly.graph_objects as go
+
     fig = go.Figure()
 
     fig.add_shape(
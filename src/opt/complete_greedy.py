@@ -17,207 +17,96 @@ __email__ = marcor@dtu.dk
 __status__ = Dev
 """
 
-# !pip install kaleido # to export plotly figures as png
-# !pip install --upgrade nbformat # to avoid plotly error
-
-
 # my modules
 from src import greedy_method as greedy
+from src import scaffold_engine
 from src import mapping as map
-from src import consensus as cons
-from src import alignment as align
-from src import clustering as clus
 from src import preprocessing as prep
+from src import psm_cache
+from src import stages
+from src import results
 from src import compute_statistics as comp_stat
 
 # import libraries
-from tqdm import tqdm
-from tempfile import mkdtemp
-from itertools import combinations
-from collections import defaultdict, Counter
-from Bio import SeqIO
-
-import sys
 import os
-import json
-import re
-import Bio
-import shutil
-import logging
-import importlib
-import statistics
-import subprocess
-import numpy as np
-import pandas as pd
-import seaborn as sns
-import networkx as nx
-import plotly.express as px
-import matplotlib.pyplot as plt
-import plotly.graph_objects as go
+import time
+import Bio.Seq
+import Bio.SeqIO
+import Bio.SeqRecord
 
-def run_pipeline_greedy(conf,
-                        min_overlap,
-                        max_mismatches,
-                        min_identity,
-                        size_threshold):
 
-    ass_method = 'greedy'
+def stage_config(conf, min_overlap, max_mismatches, min_identity, size_threshold, run, chain, protein, proteases,
+                 max_candidates=None, time_budget=None, thresholds=None, psm_fraction=1.0):
+    """ Configuration of one combination for `build_stage_graph`: the grid parameters and the dataset (the sample
+    `run` and its `chain`, reference `protein` and `proteases`, see `gridsearch.sample_metadata`). `thresholds`
+    lists the (max_mismatches, min_identity) pairs of all the combinations that only differ from this one by that
+    pair, which are then reported together; by default only this combination's pair. `psm_fraction` below 1 runs
+    the combination on a random subsample of the PSMs, as a cheaper, lower-fidelity evaluation.
+    """
+
+    return {"run": run,
+            "chain": chain,
+            "protein_norm": prep.normalize_sequence(protein),
+            "proteases": tuple(proteases),
+            "conf": conf,
+            "size_threshold": size_threshold,
+            "min_overlap": min_overlap,
+            "max_mismatches": max_mismatches,
+            "min_identity": min_identity,
+            "max_candidates": max_candidates,
+            "time_budget": time_budget,
+            "thresholds": tuple(thresholds) if thresholds is not None else ((max_mismatches, min_identity),),
+            "psm_fraction": psm_fraction
+            }
+
+
+def psm_store(run, protein_norm, proteases):
+    """ Cleaned PSMs of `run`, loaded once per process (see `psm_cache.get_psm_store`). """
+
+    return psm_cache.get_psm_store(psm_cache.psms_csv(run), proteases, run, "../fasta/contaminants.fasta", protein_norm)
+
+
+def preload(config):
+    """ Load the data every stage of a grid search shares (the cleaned PSMs and the reference index) into the
+    caches of the current process: in the parent before the workers are forked, so that they inherit it, or in
+    each worker as the pool initializer where processes are not forked.
+    """
+
+    psm_store(config["run"], config["protein_norm"], config["proteases"])
+    map.get_reference_index(config["protein_norm"])
+
+
+def contigs_stage(run, protein_norm, proteases, conf, min_overlap, psm_fraction=1.0):
+    """ Ingest, confidence filter and greedy contigs, longest first and before the size threshold.
+    The cleaned PSMs are loaded once per process (see `psm_store`), and subsampled when `psm_fraction` is below 1.
+    """
+
+    store = psm_store(run, protein_norm, proteases)
+    if psm_fraction < 1:
+        store = store.subsample(psm_fraction)
+    final_psms = store.psms(conf).tolist()
+
+    assembled_contigs = greedy.assemble_contigs_incremental(final_psms, min_overlap)
+
+    return sorted(set(assembled_contigs), key=len, reverse=True)
+
+
+def scaffolds_stage(assembled_contigs, min_overlap, size_threshold, max_candidates, time_budget):
+    """ Scaffolds of the contigs longer than `size_threshold`, with the counters of the scaffold budget if any. """
 
-    #run = "bsa"
-    #protein = 'MKWVTFISLLLLFSSAYSRGVFRRDTHKSEIAHRFKDLGEEHFKGLVLIAFSQYLQQCPFDEHVKLVNELTEFAKTCVADESHAGCEKSLHTLFGDELCKVASLRETYGDMADCCEKQEPERNECFLSHKDDSPDLPKLKPDPNTLCDEFKADEKKFWGKYLYEIARRHPYFYAPELLYYANKYNGVFQECCQAEDKGACLLPKIETMREKVLASSARQRLRCASIQKFGERALKAWSVARLSQKFPKAEFVEVTKLVTDLTKVHKECCHGDLLECADDRADLAKYICDNQDTISSKLKECCDKPLLEKSHCIAEVEKDAIPENLPPLTADFAEDKDVCKNYQEAKDAFLGSFLYEYSRRHPEYAVSVLLRLAKEYEATLEECCAKDDPHACYSTVFDKLKHLVDEPQNLIKQNCDQFEKLGEYGFQNALIVRYTRKVPQVSTPTLVEVSRSLGKVGTRCCTKPESERMPCTEDYLSLILNRLCVLHEKTPVSEKVTKCCTESLVNRRPCFSALTPDETYVPKAFDEKLFTFHADICTLPDTEKQIKKQTALVELLKHKPKATEEQLKTVMENFVAFVDKCCAADDKEACFAVEGPKLVVSTQTALA'
-    #chain = ''
-    #proteases = ['Chymotrypsin', 'Legumain', 'Krakatoa', 'Elastase', 'Trypsin', 'Papain', 'Thermo', 'ProtK', 'GluC', 'LysC']
-
-    #run = "ma1"
-    #protein = "EVQLVQSGAEVKKPGASVKVSCKASGYTFTSYGLSWVRQAPGQGLEWMGWLSAYNGNTNYAQKLQGRVTMTTDTSTSTAYMELRSLRSDDTAVYYCAREEYCSSTSCYVGNYYGMDVWGQGTLVTVSSASTKGPSVFPLAPSSKSTSGGTAALGCLVKDYFPEPVTVSWNSGALTSGVHTFPAVLQSSGLYSLSSVVTVPSSSLGTQTYLCNVNHKPSNTKVDKKVEPKSCDKTHTCPPCPAPEAAGGPSVFLFPPKPKDTLYLTREPEVTCVVVDVSHEDPEVKFNWYVDGVEVHNAKTKPREEQYNSTYRVVSVLTVLHQDWLNGKEYKCKVSNKALPAPLEKTLSKAKGQPREPQVYTLPPSRDELTKNQVSLTCLVKGFYPSDLAVEWESNGQPENNYKTTPPVLDSDGSFFLYSKLTVDKSRWQQGNVFSCSVMHEALHNHYTQKSLSLSPGK"
-    #chain = "heavy"
-    #proteases = ["Thermo", "Papain", "Chemo", "Trypsin", "Elastase", "ProtK", "GluC"]
-
-    #run = "ma2"
-    #protein = "EVQLVQSGAEVKKPGSSVKVSCKASGGTFSSYALSWVRQAPGQGLEWMGGLLPLFGTANYAQKFQGRVTLTADESTSTAYMELRSLRSDDTAVYYCARDNLGYCSGGSCYSDYYYYYMDVWGQGTLVTVSSASTKGPSVFPLAPSSKSTSGGTAALGCLVKDYFPEPVTVSWNSGALTSGVHTFPAVLQSSGLYSLSSVVTVPSSSLGTQTYLCNVNHKPSNTKVDKKVEPKSCDKTHTCPPCPAPELLGGPSVFLFPPKPKDTLMLSRTPEVTCVVVDVSHEDPEVKFNWYVDGVEVHNAKTKPREEQYNSTYRVVSVLTVLHQDWLNGKEYKCKVSNKALPAPLEKTLSKAKGQPREPQVYTLPPSRDELTKNQVSLTCLVKGFYPSDLAVEWESNGQPENNYKTTPPVLDSDGSFFLYSKLTVDKSRWQQGNVFSCSVMHEALHNHYTQKSLSLSPGK"
-    #chain = "heavy"
-    #proteases = ["Thermo", "Papain", "Chemo", "Trypsin", "Elastase", "ProtK", "GluC"]
-
-    #run = "ma3"
-    #protein = "EVQLVQSGAEVKKPGSSVKVSCKASGGTFSSYALSWVRQAPGQGLEWMGGLLPLFGTANYAQKFQGRVTLTADESTSTAYMELRSLRSDDTAVYYCARDNLGYCSGGSCYSDYYYYYMDVWGQGTLVTVSSASTKGPSVFPLAPSSKSTSGGTAALGCLVKDYFPEPVTVSWNSGALTSGVHTFPAVLQSSGLYSLSSVVTVPSSSLGTQTYLCNVNHKPSNTKVDKKVEPKSCDKTHTCPPCPAPEAAGGPSVFLFPPKPKDTLMLSRTPEVTCVVVDVSHEDPEVKFNWYVDGVEVHNAKTKPREEQYNSTYRVVSVLTVLHQDWLNGKEYKCKVSNKALPAPLEKTLSKAKGQPREPQVYTLPPSRDELTKNQVSLTCLVKGFYPSDLAVEWESNGQPENNYKTTPPVLDSDGSFFLYSKLTVDKSRWQQGNVFSCSVMHEALHNHYTQKSLSLSPGK"
-    #chain = "heavy"
-    #proteases = ["Thermo", "Papain", "Chemo", "Trypsin", "Elastase", "ProtK", "GluC"]
-
-    #run = "ma1"
-    #protein = "DLVMTQSPSSLSASVGDRVTLTCQASQDLSNYLNWYQQKPGKAPKLLLYAASSLESGVPSRFSGSGSGTEFTLTLTNLQVDDFATYYCQRYDSNFAFGQGTKVELKRTVAAPSVFLFPPSDEQLKSGTASVVCLLNNFYPREAKVQWKVDNALQSGNSQESVTEQDSKDSTYSLSSTLTLSKADYEKHKVYACEVTHQGLSSPVTKSFNRGEC"
-    #chain = "light"
-    #proteases = ["Thermo", "Papain", "Chemo", "Trypsin", "Elastase", "ProtK", "GluC"]
-
-    #run = "ma2"
-    #protein = "NFMLTQPRSVSESPGKTVTLSCTRSSGSLGSDYVHWYQQRPGSSPTTVLYEDNQRPSGVPDRFSGSLDSSSNSASLTLSGLKTEDEADYYCQSYDRSNHEVVFGGGTKLTVLGQPKAAPSVTLFPPSSEELQANKATLVCLLSDFYPGAVTVAWKADSSPVKAGVETTTPSKQSNNKYAASSYLSLTPEQWKSHRSYSCQVTHEGSTVEKTVAPTECS"
-    #chain = "light"
-    #proteases = ["Thermo", "Papain", "Chemo", "Trypsin", "Elastase", "ProtK", "GluC"]
-
-    #run = "ma3"
-    #protein = "NFMLTQPPSVSVAPGRTATLTCEGDNLGQQLVHWYQQKPGQAPVAVLSSDSDRPSGLPERFSGSNSGNTATLTLSRVEAGDEADYYCQVWDSGSDHVVFGGGTKLTVLGQPKAAPSVTLFPPSSEELQANKATLVCLLSDFYPGAVTVAWKADSSPVKAGVETTTPSKQSNNKYAASSYLSLTPEQWKSHRSYSCQVTHEGSTVEKTVAPTECS"
-    #chain = "light"
-    #proteases = ["Thermo", "Papain", "Chemo", "Trypsin", "Elastase", "ProtK", "GluC"]
-
-    #run = "NB1"
-    #protein = 'QVQLQESGGGLVQPGGSLRLSCAASGSIVNINYMRWYRQAPGKQRELVAVITSAGNTNYAESVKGRFTISIDNAKKMVFLQMNSLKPDDTAVYYCHADLRVRDGVRGDYWGQGTQVTVSSAAADYKDHDGDYKDHDIDYKDDDDKGAAHHHHHH'
-    #proteases = ["Vesuvius", "Krakatoa", "Elastase", "Trypsin", "GluC", "Chymotrypsin", "Papain", "ProteinaseK", "Thermolysin"]
-    #chain = ""
-
-    #run = "NB2"
-    #protein = 'QVQLQESGGGLVQPGGSLRLSCAASGFTVSSVTLSWLRQAPGKGLEWVSDITSNGQTYYADSVKGRFTISRDNAKNTIYLQMNSLKADDSAVYFCAEDRWRSSNHPRGQGTQVTVSSAAADYKDHDGDYKDHDIDYKDDDDKGAAHHHHHH'
-    #proteases = ["Vesuvius", "Krakatoa", "Elastase", "Trypsin", "GluC", "Chymotrypsin", "Papain", "ProteinaseK", "Thermolysin"]
-    #chain = ""
-
-    #run = "NB3"
-    #protein = 'QVQLQESGGGLVQAGGSLRLSCLASGRTFSDYRIGWFRQAPGKEREFVSTIRNDDANTYYADSVKGRFTISRDNAKNTVYLQMNSLKPEDTAVYYCAAGARHTAQTMAAGKGIDYWGQGTQVTVSSAAADYKDHDGDYKDHDIDYKDDDDKGAAHHHHHH'
-    #proteases = ["Vesuvius", "Krakatoa", "Elastase", "Trypsin", "GluC", "Chymotrypsin", "Papain", "ProteinaseK", "Thermolysin"]
-    #chain = ""
-
-    #run = "NB4"
-    #protein = 'QVQLQESGGGLVEPGGSLRLSCAASGFTFINYRMSWVRQAPGKGLEWVSGINPDGGTSYSDSVKGRFTISRDNAKNTLYLQMNSLKVEDTAVYYCIQSGTSRRGQGTQVTVSSAAADYKDHDGDYKDHDIDYKDDDDKGAAHHHHHH'
-    #proteases = ["Vesuvius", "Krakatoa", "Elastase", "Trypsin", "GluC", "Chymotrypsin", "Papain", "ProteinaseK", "Thermolysin"]
-    #chain = ""
-
-    #run = "NB5"
-    #protein = 'QVQLQESGGGLVQPGGSLRLSCAASGNIFSINYMKWYRQAPGKQRELVAVITDGGRTNYADSVKGRFAISRDNAKNTTYLQMSDLQPEDTAVYYCYADLRVVDGRHLPRGDYWGQGTQVTVSSAAADYKDHDGDYKDHDIDYKDDDDKGAAHHHHHH'
-    #proteases = ["Vesuvius", "Krakatoa", "Elastase", "Trypsin", "GluC", "Chymotrypsin", "Papain", "ProteinaseK", "Thermolysin"]
-    #chain = ""
-
-    #run = "NB6"
-    #protein = 'QVQLQESGGGLVQPGGSLRLSCTASLNIFSINAMGWYRQAPGKQRELVAAITSGGSTNYADSVKGRFTISRDNAKSTVYLQMNSLKPEDTAVYYCHAEGPFNIATKEQYDYWGQGTQVTVSSAAADYKDHDGDYKDHDIDYKDDDDKGAAHHHHHH'
-    #proteases = ["Vesuvius", "Krakatoa", "Elastase", "Trypsin", "GluC", "Chymotrypsin", "Papain", "ProteinaseK", "Thermolysin"]
-    #chain = ""
-
-    #run = "NB8"
-    #protein = 'QVQLQESGGGLVEPGGSLRLSCAVSGGSLNHYAMAWFRQAPGQEREGVACINRSGISTTYADSVKGRFTISRDNTKNTVWLQMNSLKPEDTGVYYCSAGKYYTVGHCDQDDYRGQGTQVTVSSAAADYKDHDGDYKDHDIDYKDDDDKGAAHHHHHH'
-    #proteases = ["Vesuvius", "Krakatoa", "Elastase", "Trypsin", "GluC", "Chymotrypsin", "Papain", "ProteinaseK", "Thermolysin"]
-    #chain = ""
-
-    #run = "NB10"
-    #rotein = 'QVQLQESGGGLVQAGGSLRLSCAASGRTFDDYSMGWFRQAPGKEYEFVASINWSGSYTYYTDSVKGRFTISRDNAKNTVYLQMNSLKPDDTAVYYCAARDSIGVAVRRIDYDYWGQGTQVTVSSAAADYKDHDGDYKDHDIDYKDDDDKGAAHHHHHH'
-    #proteases = ["Vesuvius", "Krakatoa", "Elastase", "Trypsin", "GluC", "Chymotrypsin", "Papain", "ProteinaseK", "Thermolysin"]
-    #chain = ""
-
-    #run = "NB12"
-    #protein = 'QVQLQESGGGLVQAGGSLRLSCAASGRTFSSYAMAWFRQAPGKEREFVASISWSGDSTYYADSVKGRFTISRDNAKNTWYLQMNSLKPEDTAVYYCNTEEESTGTYYEWGQGTQVTVSSAAADYKDHDGDYKDHDIDYKDDDDKGAAHHHHHH'
-    #proteases = ["Vesuvius", "Krakatoa", "Elastase", "Trypsin", "GluC", "Chymotrypsin", "Papain", "ProteinaseK", "Thermolysin"]
-    #chain = ""
-
-    #run = "NB13"
-    #protein = 'QVQLQESGGGLVQPGGSLRLSCAASGSASSMYTLAWYRQAPGKQRELVALITSGHMTHYEDSVKGRFTISRDNAKEVLYLQMNSLKPEDTAVYFCNLHRLTSSDDDGRTWGQGTQVTVSSAAADYKDHDGDYKDHDIDYKDDDDKGAAHHHHHH'
-    #proteases = ["Vesuvius", "Krakatoa", "Elastase", "Trypsin", "GluC", "Chymotrypsin", "Papain", "ProteinaseK", "Thermolysin"]
-    #chain = ""
-
-    #run = "BIND15"
-    #protein = 'TEEELQKEIDEFKEKLLEKTRELVARAIEAQRAGEELWEQALNLAAGIYMQSISLLDMLELGKLAEAEEILKSIEELRKLLKEQAEKLKAKDPSKAPEMEELLKEVEETLKELEELVEKVKKFGGGGSEAAAKGGGGSGLNDIFEAQKIEWHEHHHHHH'
-    #proteases = ["Vesuvius","Chymo","GluC","Papain","Krakatoa","ProtK","Thermo","Trypsin","Elastase"]
-    #chain = ""
-
-    #run = "BIND16"
-    #protein = "SLSEEEKAELEELEKKALEKAAELVRRAIEAERAGRDLLAEALNLAAGILMLLVSAAEQAKRGDLAALKEQLEAAEKLLEILKEVAEQIKAGTPEERKAAEEALKLAEEAVKEIKRVLKLAEKAGGGGSEAAAKGGGGSGLNDIFEAQKIEWHEHHHHHHHH"
-    #proteases = ["Vesuvius","Chymo","GluC","Papain","Krakatoa","ProtK","Thermo","Trypsin","Elastase"]
-    #chain = ""
-
-    #run = "BIND17"
-    #protein = "KEELRAAAAELLAAAEALAEELRRLGLEEAAAHVLAAARHVAAALELIAATPASELNPELKREVAAHLREAAAHFEAAAEIVAAEDPLAGAMLREAALAARSMAAYVLHSSPEEALQQAAVFATGLAGAMLTMTGLVRERLAARGLNDIFEAQKIEWHEHHHHHH"
-    #proteases = ["Vesuvius","Chymo","GluC","Papain","Krakatoa","ProtK","Thermo","Trypsin","Elastase"]
-    #chain = ""
-
-
-    params = {
-        "ass_method": 'greedy',
-        "conf": conf,
-        "size_threshold": size_threshold,
-        "min_overlap": min_overlap,
-        "max_mismatches": max_mismatches,
-        "min_identity": min_identity
-    }
-
-    folder_outputs = f"../outputs/{run}{chain}"
-    prep.create_directory(folder_outputs)
-    combination_folder_out = os.path.join(folder_outputs, f"comb_{ass_method}_c{conf}_ts{size_threshold}_mo{min_overlap}_mi{min_identity}_mm{max_mismatches}")
-
-    prep.create_subdirectories_outputs(combination_folder_out)
-
-    # Data cleaning
-    protein_norm = prep.normalize_sequence(protein)
-    df = pd.read_csv(f"../input/{run}.csv")
-    df['protease'] = df['experiment_name'].apply(lambda name: prep.extract_protease(name, proteases))
-    df = prep.clean_dataframe(df)
-    df['cleaned_preds'] = df['preds'].apply(prep.remove_modifications)
-    cleaned_psms = df['cleaned_preds'].tolist()
-    filtered_psms = prep.filter_contaminants(cleaned_psms, run, "../fasta/contaminants.fasta")
-    df = df[df['cleaned_preds'].isin(filtered_psms)]
-    df["mapped"] = df["cleaned_preds"].apply(lambda x: "True" if x in protein_norm else "False")
-    df = df[df['conf'] > conf]
-    df.reset_index(drop=True, inplace=True)
-    final_psms = df['cleaned_preds'].tolist()
-
-    # Assembly
-    assembled_contigs = greedy.assemble_contigs(final_psms, min_overlap)
-    assembled_contigs = list(set(assembled_contigs))
     assembled_contigs = [contig for contig in assembled_contigs if len(contig) > size_threshold]
-    assembled_contigs = sorted(assembled_contigs, key=len, reverse=True)
-
-    records = [Bio.SeqRecord.SeqRecord(Bio.Seq.Seq(contig), id=f"contig_{idx+1}",
-                                    description=f"length: {len(contig)}") for idx,
-                                    contig in enumerate(assembled_contigs)
-                                    ]
-    Bio.SeqIO.write(records, f"{combination_folder_out}/contigs/{ass_method}_contig_{conf}_{run}.fasta", "fasta")
-
-    mapped_contigs = map.process_protein_contigs_scaffold(assembled_contigs, protein_norm, max_mismatches, min_identity)
-    df_contigs = map.create_dataframe_from_mapped_sequences(data = mapped_contigs)
-    comp_stat.compute_assembly_statistics(df = df_contigs, sequence_type='contigs',
-             output_folder = f'{combination_folder_out}/statistics', reference = protein_norm, **params)
-    
 
-    assembled_scaffolds = greedy.combine_seqs_into_scaffolds(assembled_contigs, min_overlap)
+    budget = None
+    if max_candidates is not None or time_budget is not None:
+        budget = scaffold_engine.ScaffoldBudget(max_candidates=max_candidates, time_budget=time_budget)
+
+    assembled_scaffolds = greedy.combine_seqs_into_scaffolds(assembled_contigs, min_overlap, budget=budget)
     
     assembled_scaffolds = list(set(assembled_scaffolds))
     assembled_scaffolds = sorted(assembled_scaffolds, key=len, reverse=True)
     assembled_scaffolds = [scaffold for scaffold in assembled_scaffolds if len(scaffold) > size_threshold]
 
-    assembled_scaffolds = greedy.combine_seqs_into_scaffolds(assembled_scaffolds, min_overlap)
+    assembled_scaffolds = greedy.combine_seqs_into_scaffolds(assembled_scaffolds, min_overlap, budget=budget)
     
     assembled_scaffolds = list(set(assembled_scaffolds))
     assembled_scaffolds = sorted(assembled_scaffolds, key=len, reverse=True)
@@ -229,13 +118,123 @@ def run_pipeline_greedy(conf,
     assembled_scaffolds = sorted(assembled_scaffolds, key=len, reverse=True)
     assembled_scaffolds = [scaffold for scaffold in assembled_scaffolds if len(scaffold) > size_threshold]
 
-    records = []
-    for i, seq in enumerate(assembled_scaffolds):
-        record = Bio.SeqRecord.SeqRecord(Bio.Seq.Seq(seq), id=f"scaffold_{i+1}", description=f"length: {len(seq)}")
-        records.append(record)
+    return assembled_scaffolds, (budget.summary() if budget is not None else {})
 
-    Bio.SeqIO.write(records, f"{combination_folder_out}/scaffolds/{ass_method}_scaffold_{conf}_{run}.fasta", "fasta")
 
-    mapped_scaffolds = map.process_protein_contigs_scaffold(assembled_contigs = assembled_scaffolds, target_protein = protein_norm, max_mismatches = max_mismatches, min_identity = min_identity)
-    df_scaffolds_mapped = map.create_dataframe_from_mapped_sequences(data = mapped_scaffolds)
-    comp_stat.compute_assembly_statistics(df = df_scaffolds_mapped, sequence_type='scaffolds', output_folder = f"{combination_folder_out}/statistics", reference = protein_norm, **params)
\ No newline at end of file
+def report_stage(assembled_contigs, scaffolds, run, chain, protein_norm, conf, min_overlap, size_threshold, thresholds,
+                 psm_fraction=1.0, upstream_seconds=0.0):
+    """ Write the contigs and scaffolds of the combinations that only differ by their (max_mismatches, min_identity)
+    pair in `thresholds`, map them to the reference once for all the pairs and compute the statistics of each pair.
+
+    Returns:
+        dict: (max_mismatches, min_identity) -> outcome of that combination: its output folder ('output'), its
+        end-to-end duration in seconds ('seconds'), i.e. `upstream_seconds` spent on its contigs and scaffolds, the
+        shared mapping and its own writing and statistics, and the exception that made it fail or None ('error').
+    """
+
+    mapping_started = time.monotonic()
+
+    ass_method = 'greedy'
+
+    assembled_scaffolds, budget_summary = scaffolds
+
+    assembled_contigs = [contig for contig in assembled_contigs if len(contig) > size_threshold]
+
+    mapped_contigs = map.process_protein_contigs_thresholds(assembled_contigs, protein_norm, thresholds)
+
+    mapped_scaffolds = map.process_protein_contigs_thresholds(assembled_scaffolds, protein_norm, thresholds)
+
+    mapping_seconds = time.monotonic() - mapping_started
+
+    outcomes = {}
+    for max_mismatches, min_identity in thresholds:
+        params = {"ass_method": 'greedy',
+                  "conf": conf,
+                  "size_threshold": size_threshold,
+                  "min_overlap": min_overlap,
+                  "max_mismatches": max_mismatches,
+                  "min_identity": min_identity
+                  }
+
+        started = time.monotonic() - upstream_seconds - mapping_seconds  # as if the combination ran on its own
+        folder_outputs = f"../outputs/{run}{chain}"
+        combination_folder_out = os.path.join(folder_outputs, f"comb_{ass_method}_c{conf}_ts{size_threshold}_mo{min_overlap}_mi{min_identity}_mm{max_mismatches}")
+        if psm_fraction < 1:  # low-fidelity evaluations must not overwrite the full ones
+            params["psm_fraction"] = psm_fraction
+            combination_folder_out += f"_f{psm_fraction:.3g}"
+        outcome = {'output': combination_folder_out, 'error': None}
+        try:
+            prep.create_directory(folder_outputs)
+            prep.create_subdirectories_outputs(combination_folder_out)
+
+            records = [Bio.SeqRecord.SeqRecord(Bio.Seq.Seq(contig), id=f"contig_{idx+1}",
+                                               description=f"length: {len(contig)}") for idx,
+                                               contig in enumerate(assembled_contigs)]
+            Bio.SeqIO.write(records, f"{combination_folder_out}/contigs/{ass_method}_contig_{conf}_{run}.fasta", "fasta")
+
+            df_contigs = map.create_dataframe_from_mapped_sequences(data = mapped_contigs[(max_mismatches, min_identity)])
+            contigs_statistics = comp_stat.compute_assembly_statistics(df = df_contigs, sequence_type='contigs',
+                                                                       output_folder = f'{combination_folder_out}/statistics',
+                                                                       reference = protein_norm, **params)
+
+            records = [Bio.SeqRecord.SeqRecord(Bio.Seq.Seq(seq), id=f"scaffold_{i+1}",
+                                               description=f"length: {len(seq)}") for i,
+                                               seq in enumerate(assembled_scaffolds)]
+            Bio.SeqIO.write(records, f"{combination_folder_out}/scaffolds/{ass_method}_scaffold_{conf}_{run}.fasta", "fasta")
+
+            df_scaffolds_mapped = map.create_dataframe_from_mapped_sequences(data = mapped_scaffolds[(max_mismatches, min_identity)])
+            scaffolds_statistics = comp_stat.compute_assembly_statistics(df = df_scaffolds_mapped, sequence_type='scaffolds',
+                                                                         output_folder = f"{combination_folder_out}/statistics",
+                                                                         reference = protein_norm, **params, **budget_summary)
+
+            if psm_fraction == 1:  # subsampled evaluations are not comparable with the other results
+                with results.ResultsStore() as store:
+                    store.record(run, chain, combination_folder_out, {'contigs': contigs_statistics,
+                                                                      'scaffolds': scaffolds_statistics},
+                                 seconds=time.monotonic() - started)
+        except Exception as error:
+            outcome['error'] = error
+        outcome['seconds'] = time.monotonic() - started
+        outcomes[(max_mismatches, min_identity)] = outcome
+
+    return outcomes
+
+
+def build_stage_graph():
+    """ Stages of the greedy pipeline, each memoized on the parameters it depends on: contigs (conf, min_overlap),
+    scaffolds (+ size_threshold) and report, i.e. mapping and statistics, which maps once for all the
+    (max_mismatches, min_identity) pairs in `thresholds`.
+    """
+
+    graph = stages.StageGraph()
+    graph.add('contigs', contigs_stage, params=('run', 'protein_norm', 'proteases', 'conf', 'min_overlap',
+                                                'psm_fraction'))
+    graph.add('scaffolds', scaffolds_stage, params=('min_overlap', 'size_threshold', 'max_candidates', 'time_budget'),
+              deps=('contigs',))
+    graph.add('report', report_stage, params=('run', 'chain', 'protein_norm', 'conf', 'min_overlap', 'size_threshold',
+                                              'thresholds', 'psm_fraction'),
+              deps=('contigs', 'scaffolds'), elapsed='upstream_seconds')
+
+    return graph
+
+
+def run_pipeline_greedy(conf,
+                        min_overlap,
+                        max_mismatches,
+                        min_identity,
+                        size_threshold,
+                        run,
+                        chain,
+                        protein,
+                        proteases,
+                        max_candidates=None,
+                        time_budget=None):
+
+    config = stage_config(conf, min_overlap, max_mismatches, min_identity, size_threshold, run, chain, protein,
+                          proteases, max_candidates=max_candidates, time_budget=time_budget)
+
+    (outcomes,), (error,) = build_stage_graph().run([config], 'report', disable_tqdm=True)
+    if error is None:
+        error = outcomes[(max_mismatches, min_identity)]['error']
+    if error is not None:
+        raise error
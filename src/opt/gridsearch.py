@@ -18,15 +18,25 @@ __status__ = Dev
 """
 
 # import libraries
+import gc
 import os
+import sys
 import json
+import time
+import socket
+import sqlite3
 import logging
+import argparse
 import itertools
+import threading
+import multiprocessing
 
-from tqdm import tqdm
-from src.opt.complete_dbg import run_pipeline_dbg
-from src.opt.complete_greedy import run_pipeline_greedy
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from collections import defaultdict
+from src.opt import complete_dbg, complete_greedy, search
+from src.opt.manifest import Manifest
+from src.supervisor import SupervisedExecutor, ResourceLimitExceeded
+from concurrent.futures import ProcessPoolExecutor
 
 # Define the parameter grid and set values to test
 
@@ -55,35 +65,340 @@ logging.basicConfig(
     handlers=handlers
 )
 
-logging.info(f"Starting hyperparameter optimization with {total_combinations} combinations.")
-print(f"Total combinations: {total_combinations}")
 
-def run_analysis(params, iteration):
-    """Wrapper function to run the main analysis with error handling."""
+WORKER_MEMORY = 2 * 1024 ** 3  # expected peak memory of one worker, in bytes
+MAX_ATTEMPTS = 3  # a failed combination is retried on restart until it failed this many times
+MANIFEST = "logs/manifest_{run}{chain}.sqlite"  # one per dataset, so that its 'done' combinations are its own
+LEASE_SECONDS = 300  # a distributed worker that has not renewed its lease for this long is presumed dead
+TASKS_PER_CLAIM = 4  # tasks a distributed worker claims at once, and runs through one stage graph run
+SAMPLE_METADATA = "../../json/sample_metadata.json"
+
+
+def sample_metadata(run, chain="", json_path=SAMPLE_METADATA):
+    """Dataset of a grid search, from the sample metadata: the sample `run`, its `chain`, the reference protein and
+    the proteases, as the keyword arguments of `stage_config`."""
+    with open(json_path) as f:
+        all_meta = json.load(f)
+
+    if run not in all_meta:
+        raise ValueError(f"Run '{run}' not found in metadata.")
+
+    for entry in all_meta[run]:
+        if entry["chain"] == chain:
+            return {"run": run, "chain": chain, "protein": entry["protein"], "proteases": tuple(entry["proteases"])}
+
+    raise ValueError(f"No metadata found for run '{run}' with chain '{chain}'.")
+
+
+def available_memory():
+    """Memory available to new processes in bytes, or None if it cannot be determined."""
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
     try:
-        logging.info(f"[ITER {iteration}] Starting with parameters: {params}")
-        logging.info(f"Grid search started using method '{method}'.")
-        if method == "dbg":
-            run_pipeline_dbg(**params)
-        elif method == "greedy":
-            run_pipeline_greedy(**params)
-        logging.info(f"[ITER {iteration}] Completed successfully.")
-    except Exception as e:
-        logging.error(f"[ITER {iteration}] Failed with parameters {params}: {str(e)}")
-
-
-def grid_search_parallel():
-    """Perform hyperparameter optimization in parallel."""
-    with ProcessPoolExecutor(max_workers=64) as executor:
-        futures = {
-            executor.submit(run_analysis, params, idx + 1): idx + 1
-            for idx, params in enumerate(combinations)
-        }
-
-        for _ in tqdm(as_completed(futures), total=len(futures), desc="Processing"):
-            pass
-
-    logging.info("Hyperparameter optimization completed.")
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def default_workers(worker_memory=WORKER_MEMORY):
+    """Number of workers: one per usable CPU, as long as each can get `worker_memory` bytes."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    memory = available_memory()
+    if memory is None:
+        return cpus
+    return max(1, min(cpus, memory // worker_memory))
+
+
+def create_executor(pipeline, config, max_workers=None, timeout=None, max_memory=None):
+    """Process pool whose workers share the data loaded by `pipeline.preload`.
+
+    On Linux the data is loaded once in the parent and the workers are forked from it, so they inherit it
+    copy-on-write instead of rereading the inputs; objects loaded so far are frozen out of the garbage collector so
+    that collections in the workers do not touch (and copy) their pages. Elsewhere every worker loads it once in the
+    pool initializer.
+
+    With a wall-clock `timeout` (seconds) or an RSS limit `max_memory` (bytes) per stage run, every stage runs in
+    its own supervised process instead (see `SupervisedExecutor`), which is killed when it exceeds a limit, and the
+    number of workers defaults to what fits in memory at `max_memory` each.
+    """
+    limited = timeout is not None or max_memory is not None
+    max_workers = max_workers or default_workers(max_memory or WORKER_MEMORY)
+    if sys.platform.startswith("linux"):
+        pipeline.preload(config)
+        gc.freeze()
+        context = multiprocessing.get_context("fork")
+        if limited:
+            return SupervisedExecutor(max_workers, timeout=timeout, max_memory=max_memory, mp_context=context)
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+    if limited:
+        return SupervisedExecutor(max_workers, timeout=timeout, max_memory=max_memory, initializer=pipeline.preload,
+                                  initargs=(config,))
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=pipeline.preload, initargs=(config,))
+
+
+def mapping_group(params):
+    """Parameters of a combination other than its mapping thresholds (max_mismatches and min_identity)."""
+    return tuple((key, value) for key, value in params.items() if key not in ("max_mismatches", "min_identity"))
+
+
+def run_combinations(pipeline, graph, selected, on_outcome, executor=None, disable_tqdm=False, **options):
+    """Run the combinations `selected` over the stage graph and call `on_outcome(params, outcome)` for each of them
+    as soon as it completes, with the outcome returned by the report stage: 'output', 'error' and 'seconds', its
+    end-to-end duration from the ingest on; a combination that failed before its report stage only has an 'error'.
+    Combinations that only differ by their mapping thresholds are mapped and reported together. `options` are
+    passed on to `pipeline.stage_config` (the dataset, psm_fraction, ...)."""
+    thresholds = defaultdict(list)
+    for params in selected:
+        thresholds[mapping_group(params)].append((params["max_mismatches"], params["min_identity"]))
+    configs = [pipeline.stage_config(**params, **options, thresholds=thresholds[mapping_group(params)])
+               for params in selected]
+
+    tasks = graph.plan(configs, 'report')
+    runs = {name: sum(key[0] == name for key in tasks) for name in graph.stages}
+    logging.info(f"Grid search started using method '{method}': {len(tasks)} stage runs {runs} "
+                 f"for {len(selected)} combinations.")
+
+    combinations_of = defaultdict(list)
+    for params, config in zip(selected, configs):
+        combinations_of[graph.key('report', config)].append(params)
+
+    def record(key, outcomes, error):
+        for params in combinations_of[key]:
+            outcome = {'error': error} if error is not None else outcomes[(params["max_mismatches"], params["min_identity"])]
+            on_outcome(params, outcome)
+            if outcome['error'] is not None:
+                logging.error(f"Failed with parameters {params}: {str(outcome['error'])}")
+
+    graph.run(configs, 'report', executor=executor, disable_tqdm=disable_tqdm, on_target=record)
+
+
+def manifest_recorder(manifest):
+    """Callback for `run_combinations` that records every outcome in `manifest` with its end-to-end duration, and
+    with the 'timeout' or 'memory' status and the running stage for the combinations killed at a resource limit."""
+    def record(params, outcome):
+        error = outcome['error']
+        limit = error if isinstance(error, ResourceLimitExceeded) else None
+        manifest.record(params, error=error, seconds=outcome.get('seconds'), output=outcome.get('output'),
+                        status=limit.status if limit else None, stage=limit.stage if limit else None)
+
+    return record
+
+
+def grid_search_stages(dataset, manifest_path=None, max_attempts=MAX_ATTEMPTS, timeout=None, max_memory=None,
+                       max_candidates=None, time_budget=None):
+    """Perform hyperparameter optimization on `dataset` (see `sample_metadata`) in parallel over the stage graph of
+    the pipeline, so that every stage (contigs, scaffolds, mapping and statistics) runs once per distinct value of
+    the parameters it depends on instead of once per combination; mapping runs once for all the mapping thresholds
+    of the grid.
+
+    Every finished combination is recorded in the manifest as soon as it completes, so a restarted grid search skips
+    the combinations that are done and retries the failed ones up to `max_attempts` times. Do not run it on a
+    manifest that workers are consuming (see `grid_search_worker`). `timeout` and `max_memory` limit every stage
+    run (see `create_executor`); `max_candidates` and `time_budget` bound the scaffolding of every combination
+    (see `scaffold_engine.ScaffoldBudget`). The manifest defaults to the one of the dataset."""
+    pipeline = complete_dbg if method == "dbg" else complete_greedy
+    graph = pipeline.build_stage_graph()
+
+    with Manifest(manifest_path or MANIFEST.format(**dataset), method) as manifest:
+        manifest.register(combinations, task_of=mapping_group)
+        selected = manifest.to_run(combinations, max_attempts)
+        logging.info(f"{total_combinations - len(selected)} combinations already done or out of attempts, "
+                     f"{len(selected)} to run.")
+        if not selected:
+            return
+
+        manifest.start(selected, worker=worker_name())
+        config = pipeline.stage_config(**selected[0], **dataset)
+        with create_executor(pipeline, config, timeout=timeout, max_memory=max_memory) as executor:
+            run_combinations(pipeline, graph, selected, manifest_recorder(manifest), executor=executor,
+                             max_candidates=max_candidates, time_budget=time_budget, **dataset)
+
+        logging.info(f"Hyperparameter optimization completed: {manifest.summary()}.")
+
+
+def grid_search_halving(dataset, fidelities=search.FIDELITIES, eta=search.ETA, timeout=None, max_memory=None,
+                        max_candidates=None, time_budget=None):
+    """Search the grid on `dataset` with successive halving (see `search.successive_halving`) instead of running it all:
+    every combination runs on a subsample of the PSMs and only the best ones are run again on larger subsamples,
+    up to all the PSMs. Combinations are scored from their scaffold statistics (see `search.score`).
+
+    The candidates are the groups of combinations that only differ by their mapping thresholds, since all the
+    thresholds of a group are mapped at once: a group is scored by its best combination, and every threshold of a
+    promoted group runs again. The scores of every evaluation are written to logs/search_<method>.json."""
+    pipeline = complete_dbg if method == "dbg" else complete_greedy
+    graph = pipeline.build_stage_graph()
+
+    groups = defaultdict(list)
+    for params in combinations:
+        groups[mapping_group(params)].append(params)
+    candidates = [dict(group) for group in groups]
+    best_of = {}  # (fidelity, group) -> best combination of the group
+
+    config = pipeline.stage_config(**combinations[0], **dataset)
+    with create_executor(pipeline, config, timeout=timeout, max_memory=max_memory) as executor:
+        def evaluate(candidates, fidelity):
+            selected = [params for candidate in candidates for params in groups[tuple(candidate.items())]]
+            logging.info(f"Evaluating {len(selected)} combinations on {fidelity:.3g} of the PSMs.")
+            scores = {}
+
+            def collect(params, outcome):
+                scores[Manifest.key(params)] = search.score_outcome(outcome)
+
+            run_combinations(pipeline, graph, selected, collect, executor=executor, psm_fraction=fidelity,
+                             max_candidates=max_candidates, time_budget=time_budget, **dataset)
+
+            group_scores = []
+            for candidate in candidates:
+                group = tuple(candidate.items())
+                scored = [(scores[Manifest.key(params)], params) for params in groups[group]
+                          if scores.get(Manifest.key(params)) is not None]
+                best = max(scored, key=lambda item: item[0], default=(None, None))
+                best_of[(fidelity, group)] = best[1]
+                group_scores.append(best[0])
+            return group_scores
+
+        best, history = search.successive_halving(candidates, evaluate, fidelities=fidelities, eta=eta)
+
+    best = best_of[(fidelities[-1], tuple(best.items()))] if best is not None else None
+    with open(f"logs/search_{method}.json", "w") as file:
+        json.dump([{"fidelity": fidelity, "params": best_of[(fidelity, tuple(params.items()))], "score": score}
+                   for fidelity, params, score in history], file, indent=4)
+    runs = sum(len(groups[tuple(params.items())]) for _, params, _ in history)
+    logging.info(f"Successive halving ran {runs} evaluations for {total_combinations} combinations; "
+                 f"best combination: {best}.")
+
+    return best
+
+
+def grid_search_enqueue(dataset, manifest_path=None):
+    """Add the combinations of the grid to the work queue of the distributed mode, by default the manifest of
+    `dataset`. Combinations that only differ by their mapping thresholds form one task, so a worker maps them
+    together."""
+    manifest_path = manifest_path or MANIFEST.format(**dataset)
+    with Manifest(manifest_path, method) as manifest:
+        manifest.register(combinations, task_of=mapping_group)
+        logging.info(f"Enqueued {total_combinations} combinations in {manifest_path}: {manifest.summary()}.")
+
+
+def worker_name():
+    """Identifier of this process, unique across the hosts sharing a manifest."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Heartbeat(threading.Thread):
+    """Background thread that renews the leases of `worker` every third of `lease_seconds`, on its own connection
+    to the manifest, until stopped."""
+
+    def __init__(self, manifest_path, worker, lease_seconds):
+        super().__init__(daemon=True)
+        self.manifest_path = manifest_path
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+
+    def run(self):
+        with Manifest(self.manifest_path, method) as manifest:
+            while not self.stopped.wait(self.lease_seconds / 3):
+                try:
+                    manifest.heartbeat(self.worker, self.lease_seconds)
+                except sqlite3.OperationalError as e:  # busy database: the next beat will retry
+                    logging.warning(f"Heartbeat of {self.worker} failed: {str(e)}")
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def grid_search_worker(dataset, manifest_path=None, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS,
+                       tasks_per_claim=TASKS_PER_CLAIM, timeout=None, max_memory=None, max_candidates=None,
+                       time_budget=None):
+    """Claim, run on `dataset` and record tasks from the work queue until none is left.
+
+    Any number of workers, on any host that sees `manifest_path` (e.g. on shared storage with working file locks),
+    can consume the same queue filled by `grid_search_enqueue`. A worker claims `tasks_per_claim` tasks at a time
+    and runs them through one run of the stage graph, so that they share the stages they have in common (e.g. the
+    contigs of tasks that only differ by their scaffolding parameters). It holds a lease on the tasks it runs and
+    renews it from a heartbeat thread; if it dies, the lease expires after `lease_seconds` and another worker
+    claims its tasks again, up to `max_attempts` attempts. While other workers still hold tasks, an idle worker
+    keeps polling, so that it can take over the tasks of a worker that dies. With `timeout` or `max_memory`, the
+    stages run one at a time in a supervised process (see `create_executor`); `max_candidates` and `time_budget`
+    bound the scaffolding as in `grid_search_stages`."""
+    pipeline = complete_dbg if method == "dbg" else complete_greedy
+    graph = pipeline.build_stage_graph()
+    worker = worker_name()
+
+    manifest_path = manifest_path or MANIFEST.format(**dataset)
+    limited = timeout is not None or max_memory is not None
+    config = pipeline.stage_config(**combinations[0], **dataset)
+    with Manifest(manifest_path, method) as manifest, \
+            (create_executor(pipeline, config, 1, timeout, max_memory) if limited else nullcontext()) as executor:
+        completed = 0
+        while True:
+            claimed = manifest.claim(worker, lease_seconds, max_attempts, tasks=tasks_per_claim)
+            if not claimed:
+                if not manifest.leased():
+                    break
+                time.sleep(lease_seconds / 3)
+                continue
+
+            logging.info(f"Worker {worker} claimed {len(claimed)} combinations.")
+            heartbeat = Heartbeat(manifest_path, worker, lease_seconds)
+            heartbeat.start()
+            try:
+                run_combinations(pipeline, graph, claimed, manifest_recorder(manifest), executor=executor,
+                                 disable_tqdm=True, max_candidates=max_candidates, time_budget=time_budget,
+                                 **dataset)
+            finally:
+                heartbeat.stop()
+            completed += len(claimed)
+
+        logging.info(f"Worker {worker} finished after {completed} combinations: {manifest.summary()}.")
+
 
 if __name__ == "__main__":
-    grid_search_parallel()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Grid search over the parameters of the assembly pipeline.")
+    parser.add_argument("mode", nargs="?", choices=["local", "enqueue", "worker", "halving"], default="local",
+                        help="'local' runs the grid on this machine's process pool; 'enqueue' fills the work queue "
+                             "and 'worker' consumes it, from any number of processes and hosts; 'halving' searches "
+                             "the grid with successive halving on PSM subsamples instead of running all of it.")
+    parser.add_argument("--run", required=True, help="Sample to run the grid on: its PSMs and its entry in --metadata.")
+    parser.add_argument("--chain", default="", help="Chain of the sample, e.g. 'heavy' or 'light'.")
+    parser.add_argument("--metadata", default=SAMPLE_METADATA,
+                        help="JSON file with the reference protein and proteases of every sample and chain.")
+    parser.add_argument("--manifest", help="SQLite manifest, also the work queue; by default "
+                                           "logs/manifest_<run><chain>.sqlite.")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                        help="Seconds after which the task of a silent worker is handed to another one.")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+    parser.add_argument("--tasks-per-claim", type=int, default=TASKS_PER_CLAIM,
+                        help="Tasks a worker claims at once and runs together, sharing their common stages.")
+    parser.add_argument("--timeout", type=float, help="Wall-clock limit of every stage run, in seconds.")
+    parser.add_argument("--max-memory", type=float, help="Memory (RSS) limit of every stage run, in GiB.")
+    parser.add_argument("--eta", type=int, default=search.ETA, help="Reduction factor of successive halving.")
+    parser.add_argument("--max-candidates", type=int,
+                        help="Sequences kept by every scaffolding step of a combination (bounded scaffolding).")
+    parser.add_argument("--time-budget", type=float,
+                        help="Wall-clock seconds after which the scaffolding of a combination stops merging.")
+    args = parser.parse_args()
+    limits = {"timeout": args.timeout,
+              "max_memory": int(args.max_memory * 1024 ** 3) if args.max_memory is not None else None,
+              "max_candidates": args.max_candidates,
+              "time_budget": args.time_budget}
+    dataset = sample_metadata(args.run, args.chain, args.metadata)
+    logging.info(f"Starting hyperparameter optimization with {total_combinations} combinations.")
+    print(f"Total combinations: {total_combinations}")
+
+    if args.mode == "enqueue":
+        grid_search_enqueue(dataset, args.manifest)
+    elif args.mode == "halving":
+        grid_search_halving(dataset, eta=args.eta, **limits)
+    elif args.mode == "worker":
+        grid_search_worker(dataset, args.manifest, lease_seconds=args.lease, max_attempts=args.max_attempts,
+                           tasks_per_claim=args.tasks_per_claim, **limits)
+    else:
+        grid_search_stages(dataset, args.manifest, max_attempts=args.max_attempts, **limits)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+
+r""" Manifest of the grid-search combinations, used to resume interrupted sweeps and as a work queue.
+ _____  _______  _    _
+|  __ \|__   __|| |  | |
+| |  | |  | |   | |  | |
+| |  | |  | |   | |  | |
+| |__| |  | |   | |__| |
+|_____/   |_|   |______|
+
+__authors__ = Marco Reverenna
+__copyright__ = Copyright 2025-2026
+__research-group__ = DTU Biosustain (Multi-omics Network Analytics) and DTU Bioengineering
+__date__ = 18 Oct 2026
+__maintainer__ = Marco Reverenna
+__email__ = marcor@dtu.dk
+__status__ = Dev
+"""
+
+# import libraries
+import os
+import json
+import time
+import sqlite3
+
+
+class Manifest:
+    """ SQLite record of the combinations of a grid search: parameters, status ('pending', 'running', 'done',
+    'failed', or 'timeout' and 'memory' for a combination killed at a resource limit, with the stage that was
+    running), number of attempts, duration, output folder and last error.
+
+    Every combination is recorded as soon as it completes, so a sweep that dies halfway can be restarted and skip
+    what already finished. The same table is the work queue of the distributed mode: workers on any host that sees
+    the database `claim` a task (the combinations that are reported together) under a lease, renew it with
+    `heartbeat` while they work, and `record` the outcomes; the combinations of a worker that stops renewing its
+    lease are handed to the next worker that asks. SQLite serializes the claims with its file lock, so the database
+    must live on a filesystem with working POSIX locks.
+
+    Args:
+        path (str): Path of the SQLite database, created if missing.
+        method (str): Assembly method of the grid search ('dbg' or 'greedy').
+    """
+
+    # columns added after the first version
+    COLUMNS = {'task': 'TEXT', 'worker': 'TEXT', 'lease_until': 'REAL', 'stage': 'TEXT'}
+    FINAL = ('done', 'timeout', 'memory')  # not run again: a killed combination would hit its limit again
+
+    def __init__(self, path, method):
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.method = method
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)  # transactions are explicit
+        with self._transaction():  # workers opening the same database at once must not both add the columns
+            self._create()
+
+    def _create(self):
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS combinations (
+                method TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                seconds REAL,
+                finished_at REAL,
+                output TEXT,
+                error TEXT,
+                PRIMARY KEY (method, params)
+            )""")
+        existing = {row[1] for row in self.connection.execute("PRAGMA table_info(combinations)")}
+        for column, column_type in self.COLUMNS.items():
+            if column not in existing:
+                self.connection.execute(f"ALTER TABLE combinations ADD COLUMN {column} {column_type}")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def key(params):
+        """ Canonical form of the parameters of a combination. """
+        return json.dumps(params, sort_keys=True)
+
+    def _transaction(self):
+        self.connection.execute("BEGIN IMMEDIATE")  # take the write lock up front, so claims cannot interleave
+        return self.connection
+
+    def register(self, combinations, task_of=None):
+        """ Add the combinations that are not in the manifest yet, as pending. Combinations with the same
+        `task_of(params)` are claimed together by the workers (by default every combination is its own task).
+        """
+        rows = [(self.method, self.key(params), self.key(task_of(params) if task_of is not None else params))
+                for params in combinations]
+        with self._transaction():
+            self.connection.executemany("INSERT OR IGNORE INTO combinations (method, params, task) VALUES (?, ?, ?)",
+                                        rows)
+
+    def get(self, params):
+        """ Return the manifest row of a combination as a dictionary, or None. """
+        cursor = self.connection.execute("""
+            SELECT status, attempts, seconds, finished_at, output, error FROM combinations
+            WHERE method = ? AND params = ?""", (self.method, self.key(params)))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+
+        return dict(zip(('status', 'attempts', 'seconds', 'finished_at', 'output', 'error'), row))
+
+    def to_run(self, combinations, max_attempts):
+        """ Return the combinations that still have to run: neither done, killed at a resource limit nor started
+        `max_attempts` times. A combination left 'running' by a previous run that died counts as not done.
+        """
+        selected = []
+        for params in combinations:
+            row = self.get(params)
+            if row is None or (row['status'] not in self.FINAL and row['attempts'] < max_attempts):
+                selected.append(params)
+
+        return selected
+
+    def start(self, combinations, worker, lease_seconds=None):
+        """ Mark combinations as running on `worker`, counting one more attempt for each of them. """
+        lease_until = time.time() + lease_seconds if lease_seconds is not None else None
+        with self._transaction():
+            self.connection.executemany("""
+                UPDATE combinations SET status = 'running', attempts = attempts + 1, worker = ?, lease_until = ?
+                WHERE method = ? AND params = ?""",
+                [(worker, lease_until, self.method, self.key(params)) for params in combinations])
+
+    def claim(self, worker, lease_seconds, max_attempts, tasks=1):
+        """ Claim the next `tasks` tasks for `worker` and return their combinations, task after task (an empty list if
+        none is available).
+
+        A combination can be claimed if it is pending, failed, or running under an expired lease, and was started
+        fewer than `max_attempts` times; running combinations whose lease expired on their last attempt are marked
+        as failed instead.
+        """
+        now = time.time()
+        claimable = """method = ? AND attempts < ? AND (status IN ('pending', 'failed')
+                       OR (status = 'running' AND lease_until < ?))"""
+        with self._transaction():
+            self.connection.execute("""
+                UPDATE combinations SET status = 'failed', error = 'lease expired', worker = NULL, lease_until = NULL
+                WHERE method = ? AND status = 'running' AND lease_until < ? AND attempts >= ?""",
+                (self.method, now, max_attempts))
+            claimed = [task for task, in self.connection.execute(
+                f"SELECT task FROM combinations WHERE {claimable} GROUP BY task ORDER BY MIN(rowid) LIMIT ?",
+                (self.method, max_attempts, now, tasks))]
+            keys = [key for task in claimed for key, in self.connection.execute(
+                f"SELECT params FROM combinations WHERE {claimable} AND task = ? ORDER BY rowid",
+                (self.method, max_attempts, now, task))]
+            self.connection.executemany("""
+                UPDATE combinations SET status = 'running', attempts = attempts + 1, worker = ?, lease_until = ?
+                WHERE method = ? AND params = ?""", [(worker, now + lease_seconds, self.method, key) for key in keys])
+
+        return [json.loads(key) for key in keys]
+
+    def heartbeat(self, worker, lease_seconds):
+        """ Renew the lease of the combinations `worker` is running. """
+        with self._transaction():
+            self.connection.execute("""
+                UPDATE combinations SET lease_until = ? WHERE method = ? AND status = 'running' AND worker = ?""",
+                (time.time() + lease_seconds, self.method, worker))
+
+    def record(self, params, error=None, seconds=None, output=None, status=None, stage=None):
+        """ Record the outcome of the current attempt at a combination, with its end-to-end duration in `seconds`
+        (all its stages, shared ones included) if known. The status defaults to 'done', or 'failed' if there is an
+        `error`; `stage` is the stage that was running when a resource limit was hit.
+        """
+        if status is None:
+            status = 'done' if error is None else 'failed'
+        with self._transaction():
+            self.connection.execute("""
+                UPDATE combinations SET status = ?, seconds = ?, finished_at = ?, output = ?, error = ?, stage = ?,
+                    worker = NULL, lease_until = NULL
+                WHERE method = ? AND params = ?""",
+                (status, seconds, time.time(), output, None if error is None else str(error), stage, self.method,
+                 self.key(params)))
+
+    def leased(self):
+        """ Number of combinations running under a lease, i.e. claimed by a worker of the distributed mode. """
+        cursor = self.connection.execute("""
+            SELECT COUNT(*) FROM combinations WHERE method = ? AND status = 'running' AND lease_until IS NOT NULL""",
+            (self.method,))
+
+        return cursor.fetchone()[0]
+
+    def summary(self):
+        """ Number of combinations per status. """
+        cursor = self.connection.execute("SELECT status, COUNT(*) FROM combinations WHERE method = ? GROUP BY status",
+                                         (self.method,))
+
+        return dict(cursor.fetchall())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+r""" Suffix-prefix overlap index shared by the assembly and scaffolding modules.
+ _____  _______  _    _
+|  __ \|__   __|| |  | |
+| |  | |  | |   | |  | |
+| |  | |  | |   | |  | |
+| |__| |  | |   | |__| |
+|_____/   |_|   |______|
+
+__authors__ = Marco Reverenna
+__copyright__ = Copyright 2025-2026
+__research-group__ = DTU Biosustain (Multi-omics Network Analytics) and DTU Bioengineering
+__date__ = 18 Oct 2026
+__maintainer__ = Marco Reverenna
+__email__ = marcor@dtu.dk
+__status__ = Dev
+"""
+
+# import libraries
+from collections import defaultdict
+from tqdm import tqdm
+
+
+class AffixIndex:
+    """ Hash index over the prefixes (and optionally the suffixes) of a set of sequences.
+
+    Every prefix/suffix of length >= `min_overlap` is stored under the hash of its string, so the sequences whose
+    prefix equals a given suffix are found with one dictionary lookup per overlap length instead of comparing all
+    pairs. Hash hits are always verified on the actual strings. Sequences are stored under a caller-defined key and
+    can be added and removed, so the index can be kept alive while a set of contigs evolves.
+    """
+
+    def __init__(self, min_overlap, suffixes=True):
+        self.min_overlap = min_overlap
+        self.sequences = {}
+        self._prefixes = defaultdict(set)
+        self._suffixes = defaultdict(set) if suffixes else None
+
+    def __len__(self):
+        return len(self.sequences)
+
+    def __contains__(self, key):
+        return key in self.sequences
+
+    def add(self, key, seq):
+        """ Index `seq` under `key`. """
+        self.sequences[key] = seq
+        for length in range(self.min_overlap, len(seq) + 1):
+            self._prefixes[hash(seq[:length])].add(key)
+            if self._suffixes is not None:
+                self._suffixes[hash(seq[-length:])].add(key)
+
+    def remove(self, key):
+        """ Drop the sequence stored under `key` from the index. """
+        seq = self.sequences.pop(key)
+        for length in range(self.min_overlap, len(seq) + 1):
+            self._discard(self._prefixes, hash(seq[:length]), key)
+            if self._suffixes is not None:
+                self._discard(self._suffixes, hash(seq[-length:]), key)
+
+    @staticmethod
+    def _discard(table, bucket, key):
+        keys = table[bucket]
+        keys.discard(key)
+        if not keys:
+            del table[bucket]
+
+    def successors(self, seq, max_overlap=None):
+        """ Yield (key, overlap_len) for every indexed sequence whose prefix equals a suffix of `seq`.
+
+        Overlap lengths range from `min_overlap` to `max_overlap` (default: len(seq)) and are yielded longest first.
+        """
+        longest = len(seq) if max_overlap is None else min(max_overlap, len(seq))
+        for length in range(longest, self.min_overlap - 1, -1):
+            suffix = seq[-length:]
+            for key in self._prefixes.get(hash(suffix), ()):
+                if self.sequences[key].startswith(suffix):
+                    yield key, length
+
+    def predecessors(self, seq, max_overlap=None):
+        """ Yield (key, overlap_len) for every indexed sequence whose suffix equals a prefix of `seq`.
+
+        Overlap lengths range from `min_overlap` to `max_overlap` (default: len(seq)) and are yielded longest first.
+        Requires the index to be built with `suffixes=True`.
+        """
+        longest = len(seq) if max_overlap is None else min(max_overlap, len(seq))
+        for length in range(longest, self.min_overlap - 1, -1):
+            prefix = seq[:length]
+            for key in self._suffixes.get(hash(prefix), ()):
+                if self.sequences[key].endswith(prefix):
+                    yield key, length
+
+
+def find_overlaps(contigs, min_overlap, disable_tqdm=False):
+    """ Find all suffix-prefix overlaps of at least `min_overlap` residues between pairs of contigs.
+
+    Returns exactly the records of the all-pairs implementation: a tuple (a, b, overlap_len) for every ordered pair
+    of distinct list entries where the last `overlap_len` residues of `a` equal the first `overlap_len` residues of
+    `b`, for every overlap length from `min_overlap` up to min(len(a), len(b)). Records are also returned in the same
+    order: pairs in `itertools.combinations` order, then by increasing overlap length, (a, b) before (b, a).
+
+    Instead of slicing every pair, the prefixes of all contigs are hashed once and each contig only looks up its own
+    suffixes, so the cost is driven by the total contig length and the number of actual overlaps.
+    """
+
+    index = AffixIndex(min_overlap, suffixes=False)
+    for position, contig in enumerate(contigs):
+        index.add(position, contig)
+
+    records = []
+    for position_a, contig_a in enumerate(tqdm(contigs, desc="Finding overlaps", disable=disable_tqdm)):
+        for position_b, overlap_len in index.successors(contig_a):
+            if position_b != position_a:
+                records.append((position_a, position_b, overlap_len))
+
+    records.sort(key=lambda record: (min(record[0], record[1]), max(record[0], record[1]), record[2], record[0] > record[1]))
+
+    return [(contigs[position_a], contigs[position_b], overlap_len) for position_a, position_b, overlap_len in records]
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+r""" Named, checkpointed stages of the assembly scripts, resumable from an on-disk cache.
+ _____  _______  _    _
+|  __ \|__   __|| |  | |
+| |  | |  | |   | |  | |
+| |  | |  | |   | |  | |
+| |__| |  | |   | |__| |
+|_____/   |_|   |______|
+
+__authors__ = Marco Reverenna
+__copyright__ = Copyright 2025-2026
+__research-group__ = DTU Biosustain (Multi-omics Network Analytics) and DTU Bioengineering
+__date__ = 18 Oct 2026
+__maintainer__ = Marco Reverenna
+__email__ = marcor@dtu.dk
+__status__ = Dev
+"""
+
+# import libraries
+import os
+import time
+import logging
+import Bio.Seq
+import Bio.SeqIO
+import Bio.SeqRecord
+
+try:
+    from . import mapping as map
+    from . import alignment as align
+    from . import clustering as clus
+    from . import consensus as cons
+    from . import preprocessing as prep
+    from . import compute_statistics as comp_stat
+    from . import psm_cache, results, stages
+except ImportError:  # running the scripts from within src/
+    import mapping as map
+    import alignment as align
+    import clustering as clus
+    import consensus as cons
+    import preprocessing as prep
+    import compute_statistics as comp_stat
+    import psm_cache
+    import results
+    import stages
+
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('ingest', 'contigs', 'scaffolds', 'mapping', 'clustering', 'alignment', 'consensus')
+CACHE = "../outputs/.stage_cache"  # shared by all the runs, as the entries are keyed on their inputs
+
+
+def reference_panel(references):
+    """ Normalized sequences of the records of the reference panel FASTA file `references`, by record id. """
+
+    return {name: prep.normalize_sequence(seq) for name, seq in map.load_references(references).items()}
+
+
+def pipeline_config(ass_method, run, chain, protein, proteases, conf, min_overlap, min_identity, max_mismatches,
+                    size_threshold, kmer_size=None, references=None):
+    """ Configuration of one run of the pipeline for `build_stage_graph`; `kmer_size` is only used by 'dbg'.
+
+    With `references`, a FASTA file of several reference proteins, `protein` is ignored: the sequences are mapped
+    against every record of the panel at once and their statistics are written per reference.
+    """
+
+    if references is not None:
+        protein = "|".join(reference_panel(references).values())  # only used to flag the peptides found in one
+
+    return {"ass_method": ass_method,
+            "run": run,
+            "chain": chain,
+            "psms_csv": psm_cache.psms_csv(run),
+            "contaminants_fasta": "../fasta/contaminants.fasta",
+            "references": references,
+            "protein_norm": prep.normalize_sequence(protein),
+            "proteases": tuple(proteases),
+            "conf": conf,
+            "kmer_size": kmer_size,
+            "min_overlap": min_overlap,
+            "min_identity": min_identity,
+            "max_mismatches": max_mismatches,
+            "size_threshold": size_threshold
+            }
+
+
+def ingest_stage(psms_csv, contaminants_fasta, run, proteases, protein_norm, conf):
+    """ Cleaned, contaminant-filtered PSMs of the run above the confidence threshold. """
+
+    logger.info("Starting data cleaning...")
+    df = psm_cache.load_clean_psms(psms_csv, proteases, run, contaminants_fasta, protein_norm)
+    df = df[df['conf'] > conf]
+    logger.info("Data cleaning completed.")
+
+    return df['cleaned_preds'].tolist()
+
+
+def write_sequences(sequences, prefix, path):
+    records = [Bio.SeqRecord.SeqRecord(Bio.Seq.Seq(seq), id=f"{prefix}_{idx+1}", description=f"length: {len(seq)}")
+               for idx, seq in enumerate(sequences)]
+    Bio.SeqIO.write(records, path, "fasta")
+
+
+def panel_statistics(sequences, sequence_type, output_folder, panel, max_mismatches, min_identity):
+    """ Map `sequences` once against every reference of `panel` ({name: normalized sequence}) and write the
+    statistics of each reference with mapped sequences to `output_folder`.
+
+    Returns:
+        dict: {'<sequence_type>_<reference name>': statistics}, labelled like their JSON files.
+    """
+
+    mapped = map.process_protein_contigs_multi(sequences, panel, max_mismatches, min_identity)
+    mapped_by_reference = {name: map.create_dataframe_from_mapped_sequences(data=mapped_sequences)
+                           for name, mapped_sequences in map.split_mapped_by_reference(mapped).items()}
+    statistics = comp_stat.compute_assembly_statistics_per_reference(mapped_by_reference, sequence_type,
+                                                                     output_folder, panel)
+
+    return {f"{sequence_type}_{name}": stats for name, stats in statistics.items()}
+
+
+def mapping_stage(assembled_contigs, assembled_scaffolds, ass_method, run, chain, protein_norm, conf, kmer_size,
+                  min_overlap, size_threshold, max_mismatches, min_identity, references=None, upstream_seconds=0.0):
+    """ Write the contigs and scaffolds of the combination, map them to the reference, or to every reference of the
+    panel `references`, compute and record their statistics with the duration of the run, from the ingest on
+    (`upstream_seconds` spent on the upstream stages). Returns the scaffolds folder of the combination.
+    """
+
+    started = time.monotonic() - upstream_seconds
+
+    params = {"ass_method": ass_method, "conf": conf, "kmer_size": kmer_size, "min_overlap": min_overlap,
+              "size_threshold": size_threshold, "max_mismatches": max_mismatches, "min_identity": min_identity}
+    if kmer_size is None:
+        del params["kmer_size"]
+
+    folder_outputs = f"../outputs/{run}{chain}"
+    prep.create_directory(folder_outputs)
+    kmer_label = f"_ks{kmer_size}" if kmer_size is not None else ""
+    combination_folder_out = os.path.join(folder_outputs, f"comb_{ass_method}_c{conf}{kmer_label}_ts{size_threshold}_mo{min_overlap}_mi{min_identity}_mm{max_mismatches}")
+    prep.create_subdirectories_outputs(combination_folder_out)
+    logger.info(f"Output folders created at: {combination_folder_out}")
+
+    panel = reference_panel(references) if references is not None else None
+    statistics = {}
+    for sequence_type, sequences in (('contigs', assembled_contigs), ('scaffolds', assembled_scaffolds)):
+        prefix = sequence_type[:-1]
+        fasta_path = f"{combination_folder_out}/{sequence_type}/{ass_method}_{prefix}_{conf}_{run}.fasta"
+        write_sequences(sequences, prefix, fasta_path)
+        if panel is not None:
+            statistics.update(panel_statistics(sequences, sequence_type, f"{combination_folder_out}/statistics",
+                                               panel, max_mismatches, min_identity))
+            continue
+        mapped = map.process_protein_contigs_scaffold(sequences, protein_norm, max_mismatches, min_identity)
+        df_mapped = map.create_dataframe_from_mapped_sequences(data=mapped)
+        statistics[sequence_type] = comp_stat.compute_assembly_statistics(df=df_mapped, sequence_type=sequence_type,
+                                                                          output_folder=f"{combination_folder_out}/statistics",
+                                                                          reference=protein_norm)
+
+    with results.ResultsStore() as store:
+        store.record(run, chain, combination_folder_out, statistics, seconds=time.monotonic() - started, **params)
+
+    return f"{combination_folder_out}/scaffolds"
+
+
+def clustering_stage(scaffolds_folder):
+    """ Cluster the scaffolds with mmseqs; returns the folder of the per-cluster FASTA files. """
+
+    clus.cluster_fasta_folder(scaffolds_folder)
+
+    return os.path.join(scaffolds_folder, "cluster_fasta")
+
+
+def alignment_stage(cluster_fasta_folder):
+    """ Align the sequences of every cluster with Clustal Omega; returns the folder of the alignments. """
+
+    scaffolds_folder = os.path.dirname(cluster_fasta_folder)
+    align.process_alignment(scaffolds_folder)
+
+    return os.path.join(scaffolds_folder, "align")
+
+
+def consensus_stage(align_folder):
+    """ Consensus sequence, heatmap and logo of every alignment; returns the folder they are written to. """
+
+    consensus_folder = os.path.join(os.path.dirname(align_folder), "consensus")
+    cons.process_alignment_files(align_folder, consensus_folder)
+
+    return consensus_folder
+
+
+def build_stage_graph(contigs_stage, contigs_params, scaffolds_stage, scaffolds_params):
+    """ Stages of an assembly script, from the raw PSMs to the consensus sequences, with the method-specific
+    `contigs_stage(final_psms, **contigs_params)` and `scaffolds_stage(assembled_contigs, **scaffolds_params)`.
+    The stages that write files return the folder they wrote, and their cached result is only reused while that
+    folder exists.
+    """
+
+    graph = stages.StageGraph()
+    graph.add('ingest', ingest_stage, params=('run', 'proteases', 'protein_norm', 'conf'),
+              inputs=('psms_csv', 'contaminants_fasta'))
+    graph.add('contigs', contigs_stage, params=contigs_params, deps=('ingest',))
+    graph.add('scaffolds', scaffolds_stage, params=scaffolds_params, deps=('contigs',))
+    graph.add('mapping', mapping_stage, params=('ass_method', 'run', 'chain', 'protein_norm', 'conf', 'kmer_size',
+                                                'min_overlap', 'size_threshold', 'max_mismatches', 'min_identity'),
+              deps=('contigs', 'scaffolds'), inputs=('references',), check=os.path.isdir, elapsed='upstream_seconds')
+    graph.add('clustering', clustering_stage, deps=('mapping',), check=os.path.isdir)
+    graph.add('alignment', alignment_stage, deps=('clustering',), check=os.path.isdir)
+    graph.add('consensus', consensus_stage, deps=('alignment',), check=os.path.isdir)
+
+    return graph
+
+
+def run_stages(graph, config, target='consensus', resume=False, from_stage=None, cache_dir=CACHE):
+    """ Run the stages of `graph` up to `target`, storing every result in the cache at `cache_dir`.
+
+    By default every stage runs. With `resume`, stages whose cached result is valid (same parameters, same input
+    files, same upstream results) are skipped; `from_stage` resumes as well but runs that stage and the ones after it
+    again, e.g. after changing an external tool. Raises the error of the first stage that failed.
+    """
+
+    if from_stage is not None:
+        rerun = graph.downstream(from_stage)
+    elif resume:
+        rerun = ()
+    else:
+        rerun = set(graph.stages)
+
+    (result,), (error,) = graph.run([config], target, cache=stages.StageCache(cache_dir), rerun=rerun)
+    if error is not None:
+        raise error
+
+    return result
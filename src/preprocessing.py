@@ -22,9 +22,11 @@ import os
 import re
 import numpy as np
 import pandas as pd
-from Bio import SeqIO
-import plotly.express as px
-import plotly.graph_objects as go
+
+try:
+    from . import contaminants
+except ImportError:  # running the scripts from within src/
+    import contaminants
 
 
 # Define and create the necessary directories only if they don't exist
@@ -128,28 +130,21 @@ def filter_contaminants(seqs, run, contaminants_fasta):
     Filters out sequences from the input list `seqs` that are substrings of sequences
     in the contaminants file. If run == 'bsa', the Bovine serum albumin precursor is ignored.
 
+    The contaminants are looked up in a suffix-array index that is built once per FASTA file
+    (and per excluded record) and persisted next to it, see `contaminants.load_contaminant_index`.
+
     Parameters:
     - seqs (list of str): List of sequences to be filtered.
     - contaminants_fasta (str): Path to the FASTA file containing contaminant sequences.
     - run (str): Run identifier, used to control special filtering logic.
     """
 
-    contam_records = []
-    for record in SeqIO.parse(contaminants_fasta, "fasta"):
-        if run == 'bsa' and "Bovine serum albumin precursor" in record.description:
-            continue  # Skip BSA if run is 'bsa'
-        contam_records.append(str(record.seq))
-
-    filtered_seqs = []
-    removed_count = 0
+    exclude_descriptions = (contaminants.BSA_DESCRIPTION,) if run == 'bsa' else ()
+    index = contaminants.load_contaminant_index(contaminants_fasta, exclude_descriptions)
 
-    for seq in seqs:
-        if any(seq in contam_seq for contam_seq in contam_records):
-            removed_count += 1
-        else:
-            filtered_seqs.append(seq)
+    filtered_seqs = index.filter(seqs)
 
-    #print(f"Removed {removed_count} contaminant sequences, {len(filtered_seqs)} sequences remaining.")
+    #print(f"Removed {len(seqs) - len(filtered_seqs)} contaminant sequences, {len(filtered_seqs)} sequences remaining.")
     return filtered_seqs
 
 
@@ -162,6 +157,8 @@ def plot_confidence_distribution(df, folder_figures, min_conf=0, max_conf=1):
     min_conf (float, optional): Minimum value of confidence range (default is 0).
     max_conf (float, optional): Maximum value of confidence range (default is 1).
     """
+    import plotly.graph_objects as go
+
     # Filter the data based on the specified range
     filtered_df = df[(df['conf'] >= min_conf) & (df['conf'] <= max_conf)]
 
@@ -208,6 +205,121 @@ def extract_protease(experiment_name, proteases):
 
 
 
+def clean_psm_dataframe(df, proteases, normalize_il=False, sort=True):
+    """ Vectorized ingest of a raw InstaNovo export, equivalent to the row-by-row steps
+
+        df['protease'] = df['experiment_name'].apply(lambda name: extract_protease(name, proteases))
+        df = clean_dataframe(df)
+        df['cleaned_preds'] = df['preds'].apply(remove_modifications)
+
+    Experiment names and predictions repeat a lot, so the protease lookup and the modification stripping
+    (a pandas string-accessor regex) run once per unique value and are mapped back to the rows; the frame is
+    filtered and assigned in one pass instead of being copied first.
+
+    Parameters:
+    - df (DataFrame): The raw input DataFrame.
+    - proteases (list or set): Known protease names.
+    - normalize_il (bool): Also replace 'I' with 'L' in the cleaned sequences, as `normalize_sequence` does for
+      the reference.
+    - sort (bool): Sort by decreasing confidence, as `clean_dataframe` does.
+
+    Returns:
+    - DataFrame: The cleaned DataFrame sorted by decreasing confidence, with 'protease', 'conf' and 'cleaned_preds'.
+    """
+    name_codes, names = pd.factorize(df['experiment_name'])
+    name_proteases = np.array([extract_protease(name, proteases) for name in names] + [None], dtype=object)
+    protease = name_proteases[name_codes]  # code -1 (missing name) picks the trailing None
+
+    keep = df['preds'].notna().to_numpy()
+    df = df[keep]
+
+    pred_codes, preds = pd.factorize(df['preds'])
+    cleaned = pd.Series(preds, dtype=object).str.replace(r'\(.*?\)', '', regex=True)
+    if normalize_il:
+        cleaned = cleaned.str.replace('I', 'L', regex=False)
+
+    log_probs = df['log_probs'].replace(-1, -10)
+    df = df.assign(log_probs=log_probs,
+                   protease=protease[keep],
+                   conf=np.exp(log_probs),
+                   cleaned_preds=cleaned.to_numpy()[pred_codes],
+                   )
+
+    return df.sort_values('conf', ascending=False) if sort else df
+
+
+def read_psms_chunked(csv_path, proteases, run, contaminants_fasta, min_conf=0.0, chunksize=200_000, normalize_il=False,
+                      keep_conf=False):
+    """ Stream an InstaNovo CSV in chunks and keep only the PSMs that pass the cleaning filters, deduplicated.
+
+    Only 'experiment_name' (categorical), 'preds' and 'log_probs' (float32) are read. Every chunk goes through
+    `clean_psm_dataframe`, the confidence threshold and `filter_contaminants`, and the surviving PSMs are folded
+    into one row per (cleaned sequence, protease) with their count and best confidence, so peak memory follows the
+    number of distinct retained PSMs rather than the size of the file. Confidences are computed in float32, so
+    values right at `min_conf` may be classified differently than by the float64 in-memory path, unless
+    `keep_conf` is set.
+
+    Parameters:
+    - csv_path (str): Path to the InstaNovo export.
+    - proteases (list or set): Known protease names.
+    - run (str): Run identifier, passed to `filter_contaminants`.
+    - contaminants_fasta (str): Path to the FASTA file containing contaminant sequences.
+    - min_conf (float): Keep PSMs with a confidence strictly above this value.
+    - chunksize (int): Number of CSV rows per chunk.
+    - normalize_il (bool): Replace 'I' with 'L' in the cleaned sequences.
+    - keep_conf (bool): Keep the confidence of every PSM: read 'log_probs' in float64 like the in-memory path, and
+      fold only the PSMs of a (cleaned sequence, protease) that share a confidence.
+
+    Returns:
+    - DataFrame: Columns 'cleaned_preds', 'protease', 'psm_count' and 'conf' (maximum over the PSMs), sorted by
+      decreasing confidence.
+    """
+    dtypes = {'experiment_name': 'category', 'preds': object, 'log_probs': np.float64 if keep_conf else np.float32}
+    keys = ['cleaned_preds', 'protease', 'conf'] if keep_conf else ['cleaned_preds', 'protease']
+    folds = {'psm_count': 'sum'} if keep_conf else {'psm_count': 'sum', 'conf': 'max'}
+    aggregated = None
+
+    for chunk in pd.read_csv(csv_path, usecols=list(dtypes), dtype=dtypes, chunksize=chunksize):
+        chunk = clean_psm_dataframe(chunk, proteases, normalize_il=normalize_il, sort=False)
+        chunk = chunk[chunk['conf'] > min_conf]
+
+        clean_seqs = filter_contaminants(chunk['cleaned_preds'].unique().tolist(), run, contaminants_fasta)
+        chunk = chunk[chunk['cleaned_preds'].isin(clean_seqs)]
+
+        counts = chunk.assign(psm_count=1).groupby(keys, dropna=False).agg(folds)
+        if aggregated is not None:
+            counts = pd.concat([aggregated, counts]).groupby(level=keys, dropna=False).agg(folds)
+        aggregated = counts
+
+    if aggregated is None:
+        return pd.DataFrame(columns=['cleaned_preds', 'protease', 'psm_count', 'conf'])
+
+    psms = aggregated.reset_index()[['cleaned_preds', 'protease', 'psm_count', 'conf']]
+    psms = psms.sort_values('conf', ascending=False, kind='stable')
+
+    return psms.reset_index(drop=True)
+
+
+def expand_psms(psms, columns=None):
+    """ Turn the output of `read_psms_chunked` back into a flat list of PSM sequences, one per original PSM,
+    in decreasing order of confidence. With `columns`, return those columns of the repeated rows as a DataFrame.
+    """
+    if columns is not None:
+        return psms.loc[psms.index.repeat(psms['psm_count']), list(columns)].reset_index(drop=True)
+
+    return np.repeat(psms['cleaned_preds'].to_numpy(), psms['psm_count'].to_numpy()).tolist()
+
+
+def flag_mapped(seqs, protein_norm):
+    """ Return "True"/"False" for each sequence of `seqs` (a Series) depending on whether it occurs in
+    `protein_norm`, testing every distinct sequence only once.
+    """
+    codes, uniques = pd.factorize(seqs)
+    flags = np.array(["True" if seq in protein_norm else "False" for seq in uniques] + ["False"], dtype=object)
+
+    return pd.Series(flags[codes], index=seqs.index)
+
+
 def plot_protease_distribution(protease_counts, folder_figures):
     """Creates an interactive bar plot of protease distribution using Plotly.
     
@@ -215,6 +327,8 @@ def plot_protease_distribution(protease_counts, folder_figures):
         protease_counts (pandas.Series): A Pandas Series with protease names as the index
                                          and their counts as the values.
     """
+    import plotly.express as px
+
     # Convert the Series to a DataFrame for compatibility with Plotly
     protease_df = protease_counts.reset_index()
     protease_df.columns = ['Protease', 'Count']
@@ -264,6 +378,8 @@ def plot_protease_distribution(protease_counts, folder_figures):
 
 def missing_values_barplot(run, dataframe, folder):
 
+    import plotly.graph_objects as go
+
     dataframe["missing_preds"] = dataframe["preds"].isna()
 
     missing_counts_df = dataframe["missing_preds"].value_counts().reset_index()
@@ -341,6 +457,9 @@ def missing_values_barplot(run, dataframe, folder):
 
 def plot_map_unmap_distribution(df, reference, run, folder, conf_lim, title=False):
 
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     df = df[df['conf'] >= conf_lim]    
 
     df["mapped"] = df["cleaned_preds"].apply(lambda x: "mapped" if x in reference else "unmapped")
@@ -410,6 +529,8 @@ def plot_map_unmap_distribution(df, reference, run, folder, conf_lim, title=Fals
 
 def fdr_ratio_mapped_unmapped(run, df, folder):
 
+    import plotly.graph_objects as go
+
     bin_centers = []
     ratios = []
 
@@ -523,6 +644,8 @@ def fdr_ratio_mapped_unmapped(run, df, folder):
 
 def plot_relative_map_distribution(run, df, reference, folder, title=False):
 
+    import plotly.express as px
+
     df = df[df['conf'] >= 0].copy()
     df["mapped"] = df["cleaned_preds"].apply(lambda x: "mapped" if x in reference else "unmapped")
 
@@ -652,6 +775,8 @@ def plot_relative_map_distribution(run, df, reference, folder, title=False):
 
 def plot_map_distribution(run, df, reference, folder, threshold, title=False):
 
+    import plotly.express as px
+
     df = df[df['conf'] >= threshold].copy()
     
     df["mapped"] = df["cleaned_preds"].apply(lambda x: "mapped" if x in reference else "unmapped")
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+
+r""" On-disk Parquet cache of the cleaned, contaminant-filtered PSM tables.
+ _____  _______  _    _
+|  __ \|__   __|| |  | |
+| |  | |  | |   | |  | |
+| |  | |  | |   | |  | |
+| |__| |  | |   | |__| |
+|_____/   |_|   |______|
+
+__authors__ = Marco Reverenna
+__copyright__ = Copyright 2025-2026
+__research-group__ = DTU Biosustain (Multi-omics Network Analytics) and DTU Bioengineering
+__date__ = 18 Oct 2026
+__maintainer__ = Marco Reverenna
+__email__ = marcor@dtu.dk
+__status__ = Dev
+"""
+
+# import libraries
+import os
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional: without it the tables are recomputed on every run
+    pq = None
+
+try:
+    from . import dbg
+    from . import contaminants
+    from . import preprocessing as prep
+except ImportError:  # running the scripts from within src/
+    import dbg
+    import contaminants
+    import preprocessing as prep
+
+
+CACHE_VERSION = 2  # bump when the cleaning steps change, so older cache files are not reused
+COLUMNS = ['cleaned_preds', 'conf', 'protease', 'mapped']
+INPUTS = "../inputs"  # PSM tables of the runs, relative to the working directory like the other data folders
+
+
+def psms_csv(run):
+    """ Path of the PSM table of `run`, read by the assembly scripts and the grid search alike. """
+
+    return os.path.join(INPUTS, f"{run}.csv")
+
+
+@lru_cache(maxsize=32)
+def _file_digest(path, mtime_ns, size):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            sha.update(block)
+
+    return sha.hexdigest()
+
+
+def file_digest(path):
+    """ SHA-1 of the content of `path`, computed once per process for each (path, mtime, size). """
+    stat = os.stat(path)
+
+    return _file_digest(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def cache_key(csv_path, proteases, run, contaminants_fasta, protein_norm):
+    """ Key of the cleaned table of one input: a hash of the CSV and contaminant FASTA contents, the protease list,
+    the run (which decides the contaminant exclusions) and the reference used for the 'mapped' flag.
+    """
+    parts = [str(CACHE_VERSION), file_digest(csv_path), file_digest(contaminants_fasta),
+             "\t".join(sorted(proteases)), run, protein_norm]
+
+    return hashlib.sha1("\0".join(parts).encode()).hexdigest()[:16]
+
+
+def cache_path(csv_path, key, cache_dir=None):
+    """ Path of the cache file of `csv_path` for `key`, next to the CSV unless `cache_dir` is given. """
+    folder = cache_dir if cache_dir is not None else os.path.dirname(os.path.abspath(csv_path))
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+
+    return os.path.join(folder, f"{name}.{key}.psms.parquet")
+
+
+def build_clean_psms(csv_path, proteases, run, contaminants_fasta, protein_norm):
+    """ Clean a raw InstaNovo CSV as the pipeline scripts do, before the confidence threshold.
+
+    The CSV is streamed by `prep.read_psms_chunked`, keeping the confidence of every PSM, and expanded back to one
+    row per PSM. PSMs without a confidence, which no threshold keeps, are dropped.
+
+    Returns:
+    - DataFrame: Columns 'cleaned_preds', 'conf', 'protease' and 'mapped', sorted by decreasing confidence.
+    """
+    psms = prep.read_psms_chunked(csv_path, proteases, run, contaminants_fasta, min_conf=-np.inf, keep_conf=True)
+    df = prep.expand_psms(psms, columns=COLUMNS[:-1])
+
+    return df.assign(mapped=prep.flag_mapped(df['cleaned_preds'], protein_norm))
+
+
+def _write(df, path):
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    handle, tmp_path = tempfile.mkstemp(dir=folder, suffix='.parquet')
+    os.close(handle)
+    try:
+        df.to_parquet(tmp_path, engine='pyarrow', index=False)
+        os.chmod(tmp_path, contaminants.FILE_MODE)  # mkstemp creates it 0600: follow the umask, like the CSV
+        os.replace(tmp_path, path)  # atomic, so concurrent workers never read a partial file
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _read(path):
+    try:
+        table = pq.read_table(path, memory_map=True)
+    except (OSError, ValueError):  # missing or truncated file
+        return None
+    if table.column_names != COLUMNS:
+        return None
+
+    return table.to_pandas()
+
+
+def load_clean_psms(csv_path, proteases, run, contaminants_fasta, protein_norm, cache_dir=None):
+    """ Return the cleaned, contaminant-filtered PSM table of `csv_path`, from the cache when possible.
+
+    The table is stored as Parquet under a key that hashes every input of the cleaning (see `cache_key`), so a
+    changed CSV, contaminant FASTA, protease list or reference is never served a stale table: it simply maps to a
+    new file. The confidence threshold is not applied, so one cache entry serves every grid-search combination of
+    a run.
+
+    Parameters:
+    - csv_path (str): Path to the raw InstaNovo CSV.
+    - proteases (list): Known protease names.
+    - run (str): Run identifier, used to choose the contaminant exclusions.
+    - contaminants_fasta (str): Path to the contaminant FASTA file.
+    - protein_norm (str): Normalized reference sequence, used for the 'mapped' flag.
+    - cache_dir (str): Folder of the cache files; defaults to the folder of the CSV.
+
+    Returns:
+    - DataFrame: Columns 'cleaned_preds', 'conf', 'protease' and 'mapped', sorted by decreasing confidence.
+    """
+    if pq is None:
+        return build_clean_psms(csv_path, proteases, run, contaminants_fasta, protein_norm)
+
+    path = cache_path(csv_path, cache_key(csv_path, proteases, run, contaminants_fasta, protein_norm), cache_dir)
+    df = _read(path) if os.path.exists(path) else None
+    if df is None:
+        df = build_clean_psms(csv_path, proteases, run, contaminants_fasta, protein_norm)
+        try:
+            _write(df, path)
+        except OSError:
+            pass  # read-only location: keep working without the cache
+
+    return df
+
+
+class PSMStore:
+    """ A cleaned PSM table sorted by decreasing confidence, queried by confidence threshold.
+
+    The PSMs above a threshold are always a prefix of the table, so they are found with a binary search and returned
+    as a slice instead of re-filtering the table for every threshold of a grid search. The first occurrence of every
+    distinct sequence is recorded as well, and the k-mers of the distinct sequences are kept in the order in which
+    they first appear: the k-mers above a threshold are then also a prefix, so the k-mer sets of nested thresholds
+    are nested slices of one array. K-mers are only extracted for the sequences that a query needs beyond those
+    already covered.
+
+    Args:
+        df (DataFrame): A table returned by `load_clean_psms`.
+    """
+
+    def __init__(self, df):
+        df = df.sort_values('conf', ascending=False, kind='stable').reset_index(drop=True)  # no-op on cached tables
+        self.df = df
+        self.conf = df['conf'].to_numpy()
+        self.sequences = df['cleaned_preds'].to_numpy()
+        self._descending = -self.conf  # ascending, for searchsorted
+
+        codes, self.uniques = pd.factorize(self.sequences)
+        _, self._first_rows = np.unique(codes, return_index=True)  # increasing, as codes follow first appearance
+        self._kmers = {}
+        self._subsamples = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def count(self, threshold):
+        """ Number of PSMs with a confidence strictly above `threshold`. """
+        return int(np.searchsorted(self._descending, -threshold, side='left'))
+
+    def frame(self, threshold):
+        """ The rows of the table above `threshold`, as `df[df['conf'] > threshold]` would return them. """
+        return self.df.iloc[:self.count(threshold)]
+
+    def psms(self, threshold):
+        """ The sequences of the PSMs above `threshold`, in decreasing order of confidence (a view, not a copy). """
+        return self.sequences[:self.count(threshold)]
+
+    def unique_count(self, threshold):
+        """ Number of distinct sequences among the PSMs above `threshold`. """
+        return int(np.searchsorted(self._first_rows, self.count(threshold), side='left'))
+
+    def unique_psms(self, threshold):
+        """ The distinct sequences above `threshold`, in order of first appearance. """
+        return self.uniques[:self.unique_count(threshold)]
+
+    def kmers(self, threshold, kmer_size):
+        """ The distinct integer-encoded k-mers (see `dbg.get_kmers_encoded`) of the PSMs above `threshold`. """
+        n_unique = self.unique_count(threshold)
+        if kmer_size not in self._kmers or self._kmers[kmer_size][2] < n_unique:
+            self._extend_kmers(kmer_size, n_unique)
+        codes, owners, _ = self._kmers[kmer_size]
+
+        return codes[:np.searchsorted(owners, n_unique, side='left')]
+
+    def subsample(self, fraction, seed=0):
+        """ A `PSMStore` of a random `fraction` of the PSMs, drawn once per (fraction, seed) and kept with the store,
+        e.g. for cheap low-fidelity evaluations of a combination. With the same seed, the subsamples of increasing
+        fractions are nested.
+        """
+        if (fraction, seed) not in self._subsamples:
+            rng = np.random.default_rng(seed)
+            rows = np.sort(rng.permutation(len(self.df))[:int(round(fraction * len(self.df)))])
+            self._subsamples[(fraction, seed)] = PSMStore(self.df.iloc[rows])
+
+        return self._subsamples[(fraction, seed)]
+
+    def _extend_kmers(self, kmer_size, n_unique):
+        codes, owners, covered = self._kmers.get(kmer_size, (np.empty(0, dtype=np.uint64),
+                                                             np.empty(0, dtype=np.int64), 0))
+        new_seqs = self.uniques[covered:n_unique]
+
+        encoded = dbg.get_kmers_encoded(new_seqs, kmer_size)
+        lengths = np.fromiter((len(seq) for seq in new_seqs), dtype=np.int64, count=len(new_seqs))
+        seq_ids = np.repeat(np.arange(covered, n_unique), np.clip(lengths - kmer_size + 1, 0, None))
+
+        new_codes, first = np.unique(encoded, return_index=True)
+        keep = ~np.isin(new_codes, codes)
+        new_codes, new_owners = new_codes[keep], seq_ids[first[keep]]
+        order = np.argsort(new_owners, kind='stable')
+
+        self._kmers[kmer_size] = (np.concatenate((codes, new_codes[order])),
+                                  np.concatenate((owners, new_owners[order])), n_unique)
+
+
+@lru_cache(maxsize=4)
+def get_psm_store(csv_path, proteases, run, contaminants_fasta, protein_norm):
+    """ Return the `PSMStore` of an input, built once per process so that all the grid-search combinations run by a
+    worker share it. `proteases` must be hashable (e.g. a tuple).
+    """
+    return PSMStore(load_clean_psms(csv_path, list(proteases), run, contaminants_fasta, protein_norm))
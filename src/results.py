@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+r""" SQLite warehouse of the assembly statistics of every pipeline run, with leaderboard and aggregate queries.
+ _____  _______  _    _
+|  __ \|__   __|| |  | |
+| |  | |  | |   | |  | |
+| |  | |  | |   | |  | |
+| |__| |  | |   | |__| |
+|_____/   |_|   |______|
+
+__authors__ = Marco Reverenna
+__copyright__ = Copyright 2025-2026
+__research-group__ = DTU Biosustain (Multi-omics Network Analytics) and DTU Bioengineering
+__date__ = 18 Oct 2026
+__maintainer__ = Marco Reverenna
+__email__ = marcor@dtu.dk
+__status__ = Dev
+"""
+
+# import libraries
+import os
+import glob
+import json
+import time
+import sqlite3
+import argparse
+import pandas as pd
+
+
+RESULTS = "../outputs/results.sqlite"  # next to the per-run output folders
+
+PARAMS = ('ass_method', 'conf', 'kmer_size', 'min_overlap', 'size_threshold', 'max_mismatches', 'min_identity')
+METRICS = ('coverage', 'mean_identity', 'median_identity', 'N50', 'N90', 'total_sequences', 'average_length',
+           'min_length', 'max_length', 'perfect_matches', 'total_mismatches')
+COLUMNS = ('run', 'chain', 'reference', 'sequence_type', 'output', 'seconds', 'recorded_at') + PARAMS + METRICS + (
+    'statistics',)
+
+
+def _where(sequence_type, run, ass_method, reference=None):
+    filters = {'sequence_type': sequence_type, 'run': run, 'ass_method': ass_method, 'reference': reference}
+    filters = {column: value for column, value in filters.items() if value is not None}
+    where = " WHERE " + " AND ".join(f"{column} = ?" for column in filters) if filters else ""
+
+    return where, list(filters.values())
+
+
+class ResultsStore:
+    """ One row per (run, chain, output folder, reference, sequence type): the parameters, the statistics returned
+    by `compute_assembly_statistics`, the timing and the output folder of a pipeline run. The reference is the name
+    of the panel record the statistics are computed on, or '' for a run mapped to a single protein.
+
+    The parameters and the main metrics are columns, so leaderboards and aggregates are plain indexed SQL queries;
+    the complete statistics (e.g. the scaffold budget counters) are kept as JSON. Recording a run again replaces its
+    rows. Every `record` is one transaction, so concurrent grid-search workers append safely and a killed worker
+    never leaves half a run behind.
+
+    Args:
+        path (str): Path of the SQLite database, created if missing.
+    """
+
+    def __init__(self, path=RESULTS):
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")  # readers do not block the workers appending
+        columns = ", ".join(f"{column} {'TEXT' if column == 'ass_method' else 'NUMERIC'}"
+                            for column in PARAMS + METRICS)
+        with self.connection:
+            existing = [row[1] for row in self.connection.execute("PRAGMA table_info(results)")]
+            if existing and 'reference' not in existing:  # written before the reference column: rebuild the key
+                self.connection.execute("ALTER TABLE results RENAME TO results_old")
+            self.connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS results (
+                    run TEXT NOT NULL,
+                    chain TEXT NOT NULL DEFAULT '',
+                    reference TEXT NOT NULL DEFAULT '',
+                    sequence_type TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    seconds REAL,
+                    recorded_at REAL,
+                    {columns},
+                    statistics TEXT,
+                    PRIMARY KEY (run, chain, output, reference, sequence_type)
+                )""")
+            if existing and 'reference' not in existing:
+                self.connection.execute(f"INSERT INTO results ({', '.join(existing)}) "
+                                        f"SELECT {', '.join(existing)} FROM results_old")
+                self.connection.execute("DROP TABLE results_old")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS results_by_type ON results (sequence_type, run)")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record(self, run, chain, output, statistics, seconds=None, **params):
+        """ Store the statistics of one pipeline run.
+
+        Args:
+            run (str): Sample of the run.
+            chain (str): Chain of the sample, '' if none.
+            output (str): Output folder of the run.
+            statistics (dict): Sequence type (e.g. 'contigs', 'scaffolds') -> statistics of that type. Statistics
+                of one reference of a panel (see `compute_assembly_statistics_per_reference`) carry its name as
+                'reference_name' and are labelled '<sequence type>_<reference name>', like their JSON files.
+            seconds (float): Duration of the run, if known.
+            params: Parameters of the run missing from the statistics.
+        """
+        now = time.time()
+        rows = []
+        for label, stats in statistics.items():
+            values = {**params, **stats}
+            reference = stats.get('reference_name', '')
+            sequence_type = label[:-len(reference) - 1] if reference and label.endswith(f"_{reference}") else label
+            rows.append((run, chain, reference, sequence_type, os.path.normpath(output), seconds, now)
+                        + tuple(values.get(column) for column in PARAMS + METRICS)
+                        + (json.dumps(values, default=str),))
+        with self.connection:
+            self.connection.executemany(f"INSERT OR REPLACE INTO results ({', '.join(COLUMNS)}) "
+                                        f"VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+
+    def import_folders(self, base_directory, run, chain=''):
+        """ Record the comb_* output folders of `base_directory` written before the store existed, from their
+        statistics/*_stats.json files. Returns the number of folders imported.
+        """
+        imported = 0
+        for folder in sorted(glob.glob(os.path.join(base_directory, "comb_*"))):
+            statistics = {}
+            for path in glob.glob(os.path.join(folder, "statistics", "*_stats.json")):
+                with open(path) as file:
+                    statistics[os.path.basename(path)[:-len("_stats.json")]] = json.load(file)
+            if statistics:
+                self.record(run, chain, folder, statistics)
+                imported += 1
+
+        return imported
+
+    def query(self, sequence_type=None, run=None, ass_method=None, reference=None):
+        """ The stored rows matching the filters, as a DataFrame. """
+        where, values = _where(sequence_type, run, ass_method, reference)
+
+        return pd.read_sql_query(f"SELECT * FROM results{where}", self.connection, params=values)
+
+    def leaderboard(self, by=('coverage', 'mean_identity', 'N50'), top=20, sequence_type='scaffolds', run=None,
+                    ass_method=None, reference=None):
+        """ The `top` rows ordered by the metrics `by`, best (highest) first. """
+        for column in by:
+            if column not in METRICS + PARAMS + ('seconds',):
+                raise ValueError(f"Unknown column '{column}'.")
+        where, values = _where(sequence_type, run, ass_method, reference)
+        sql = (f"SELECT run, chain, reference, sequence_type, {', '.join(PARAMS)}, {', '.join(METRICS)}, seconds, output "
+               f"FROM results{where} "
+               f"ORDER BY {', '.join(column + ' DESC' for column in by)} LIMIT ?")
+
+        return pd.read_sql_query(sql, self.connection, params=values + [top])
+
+    def aggregate(self, group_by, metric='coverage', sequence_type='scaffolds', run=None, ass_method=None,
+                  reference=None):
+        """ Count, mean and maximum of `metric` for every value of the parameters `group_by`. """
+        for column in tuple(group_by) + (metric,):
+            if column not in METRICS + PARAMS + ('run', 'chain', 'reference', 'seconds'):
+                raise ValueError(f"Unknown column '{column}'.")
+        where, values = _where(sequence_type, run, ass_method, reference)
+        groups = ', '.join(group_by)
+        sql = (f"SELECT {groups}, COUNT(*) AS runs, AVG({metric}) AS mean_{metric}, MAX({metric}) AS max_{metric} "
+               f"FROM results{where} GROUP BY {groups} ORDER BY max_{metric} DESC")
+
+        return pd.read_sql_query(sql, self.connection, params=values)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the assembly statistics of the pipeline runs.")
+    parser.add_argument("--db", default=RESULTS, help="Results database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--run", help="Only this sample.")
+    filters.add_argument("--method", help="Only this assembly method ('dbg' or 'greedy').")
+    filters.add_argument("--sequence-type", default="scaffolds", help="'contigs' or 'scaffolds'.")
+    filters.add_argument("--reference", help="Only this record of a reference panel.")
+
+    leaderboard = subparsers.add_parser("leaderboard", parents=[filters], help="Best runs by some metrics.")
+    leaderboard.add_argument("--by", default="coverage,mean_identity,N50", help="Comma-separated metrics.")
+    leaderboard.add_argument("--top", type=int, default=20)
+
+    aggregate = subparsers.add_parser("aggregate", parents=[filters], help="A metric per parameter value.")
+    aggregate.add_argument("--group-by", required=True, help="Comma-separated parameters.")
+    aggregate.add_argument("--metric", default="coverage")
+
+    export = subparsers.add_parser("export", parents=[filters], help="All the rows, as a TSV file.")
+    export.add_argument("output", help="Path of the TSV file.")
+
+    backfill = subparsers.add_parser("import", help="Record the comb_* folders of an output directory.")
+    backfill.add_argument("base_directory", help="Output directory of a sample, e.g. ../outputs/bsa.")
+    backfill.add_argument("--run", required=True)
+    backfill.add_argument("--chain", default="")
+
+    args = parser.parse_args()
+    with ResultsStore(args.db) as store:
+        if args.command == "leaderboard":
+            print(store.leaderboard(by=args.by.split(","), top=args.top, sequence_type=args.sequence_type,
+                                    run=args.run, ass_method=args.method,
+                                    reference=args.reference).to_string(index=False))
+        elif args.command == "aggregate":
+            print(store.aggregate(args.group_by.split(","), metric=args.metric, sequence_type=args.sequence_type,
+                                  run=args.run, ass_method=args.method,
+                                  reference=args.reference).to_string(index=False))
+        elif args.command == "export":
+            store.query(sequence_type=args.sequence_type, run=args.run, ass_method=args.method,
+                        reference=args.reference).to_csv(args.output, sep="\t", index=False)
+        else:
+            print(f"Imported {store.import_folders(args.base_directory, args.run, args.chain)} folders.")
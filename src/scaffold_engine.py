@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+
+r""" Incremental fixed-point scaffolding shared by the DBG and greedy methods.
+ _____  _______  _    _
+|  __ \|__   __|| |  | |
+| |  | |  | |   | |  | |
+| |  | |  | |   | |  | |
+| |__| |  | |   | |__| |
+|_____/   |_|   |______|
+
+__authors__ = Marco Reverenna
+__copyright__ = Copyright 2025-2026
+__research-group__ = DTU Biosustain (Multi-omics Network Analytics) and DTU Bioengineering
+__date__ = 18 Oct 2026
+__maintainer__ = Marco Reverenna
+__email__ = marcor@dtu.dk
+__status__ = Dev
+"""
+
+# import libraries
+import time
+from collections import Counter, defaultdict
+from tqdm import tqdm
+
+try:
+    from . import containment, overlap_index
+except ImportError:  # running the scripts from within src/
+    import containment
+    import overlap_index
+
+
+class MergeCache:
+    """ Suffix-prefix merges of a pool of sequences, maintained as the pool changes.
+
+    The pool is indexed once in an `AffixIndex` and the merge `a + b[overlap_len:]` of every overlapping ordered pair
+    is remembered together with the pair. When the pool is updated, only the sequences that entered it are looked up
+    against the index and only the pairs of the sequences that left it are dropped, so a scaffolding round that
+    changes a few sequences does not recompute the overlaps of the whole pool.
+
+    Sequences that entered together find all their pairs through the prefix index, so the suffixes are only needed
+    for sequences that stayed in the pool since an earlier update. They are indexed as the prefixes of the reversed
+    sequences, and only once a sequence has survived an update, since most merged sequences are dropped again by
+    the next containment check.
+    """
+
+    def __init__(self, min_overlap):
+        self.index = overlap_index.AffixIndex(min_overlap, suffixes=False)
+        self._reversed = overlap_index.AffixIndex(min_overlap, suffixes=False)
+        self._pairs = {}
+        self._pairs_of = defaultdict(set)
+        self._merged = Counter()
+
+    def __len__(self):
+        return len(self.index)
+
+    def update(self, pool):
+        """ Make the cache reflect the set of sequences `pool`. """
+        removed = [seq for seq in self.index.sequences if seq not in pool]
+        added = [seq for seq in pool if seq not in self.index]
+
+        for seq in removed:
+            for pair in self._pairs_of.pop(seq, ()):
+                if pair in self._pairs:
+                    self._forget(pair)
+            self.index.remove(seq)
+            if seq in self._reversed:
+                self._reversed.remove(seq)
+
+        if not added:
+            return
+
+        for seq in self.index.sequences:
+            if seq not in self._reversed:
+                self._reversed.add(seq, seq[::-1])
+
+        for seq in added:
+            self.index.add(seq, seq)
+        for seq in added:
+            for target, overlap_len in self.index.successors(seq):
+                if target != seq:
+                    self._remember((seq, target, overlap_len))
+            for source, overlap_len in self._reversed.successors(seq[::-1]):  # sequences ending with a prefix of seq
+                self._remember((source, seq, overlap_len))
+
+    def _remember(self, pair):
+        a, b, overlap_len = pair
+        self._pairs[pair] = a + b[overlap_len:]
+        self._merged[self._pairs[pair]] += 1
+        self._pairs_of[a].add(pair)
+        self._pairs_of[b].add(pair)
+
+    def _forget(self, pair):
+        merged = self._pairs.pop(pair)
+        self._merged[merged] -= 1
+        if not self._merged[merged]:
+            del self._merged[merged]
+        for seq in pair[:2]:
+            if seq in self._pairs_of:
+                self._pairs_of[seq].discard(pair)
+
+    def merges(self):
+        """ Return the set of merged sequences of all overlapping pairs of the pool. """
+        return set(self._merged)
+
+
+class ScaffoldBudget:
+    """ Limits for the bounded scaffolding mode, and counters of what was pruned under them.
+
+    A single budget can be shared by all the combine steps of a pipeline run: the clock starts at the first step
+    that uses it, and once the wall-clock or round budget is spent every further step only ranks and prunes its input.
+
+    Args:
+        max_candidates (int): Maximum number of sequences kept by each combine step, or None for no limit.
+        time_budget (float): Wall-clock seconds after which no more merges are attempted, or None for no limit.
+        max_rounds (int): Maximum number of combine steps, or None for no limit.
+    """
+
+    def __init__(self, max_candidates=None, time_budget=None, max_rounds=None):
+        self.max_candidates = max_candidates
+        self.time_budget = time_budget
+        self.max_rounds = max_rounds
+        self.started = None
+        self.rounds = 0
+        self.generated = 0
+        self.pruned = 0
+        self.timed_out = False
+
+    def start(self):
+        if self.started is None:
+            self.started = time.monotonic()
+
+    def expired(self):
+        """ Whether the wall-clock or round budget is spent. """
+        if self.max_rounds is not None and self.rounds >= self.max_rounds:
+            return True
+        if self.time_budget is not None and self.started is not None:
+            if time.monotonic() - self.started > self.time_budget:
+                self.timed_out = True
+        return self.timed_out
+
+    def summary(self):
+        """ Return the counters as a flat dictionary, e.g. to be stored with the assembly statistics. """
+        return {'max_candidates': self.max_candidates,
+                'time_budget': self.time_budget,
+                'scaffold_rounds': self.rounds,
+                'scaffold_candidates': self.generated,
+                'scaffold_pruned': self.pruned,
+                'scaffold_timed_out': self.timed_out,
+                }
+
+
+def self_merges(sequences, min_overlap):
+    """ Merge each sequence with itself for every suffix that is also a prefix, as the all-pairs `find_overlaps`
+    does for two equal entries of a list.
+    """
+    merged = set()
+    for seq in sequences:
+        for overlap_len in range(min_overlap, len(seq) + 1):
+            if seq.startswith(seq[-overlap_len:]):
+                merged.add(seq + seq[overlap_len:])
+
+    return merged
+
+
+def scaffold_fixed_point(contigs, min_overlap, size_threshold, combine_passes=1, disable_tqdm=False):
+    """ Iterate combine, containment removal and size filtering to a fixed point, reusing the work of earlier rounds.
+
+    This returns the same scaffolds as the `scaffold_iterative` loops, which rebuild all pairwise overlaps and
+    re-check all containments in every round even though most of the scaffolds did not change. Here every combine
+    step keeps a `MergeCache` alive across rounds, so a round only looks up the overlaps of the sequences that are
+    new to that step.
+
+    Containment is incremental too. After the first round the scaffolds contain no one another, and every sequence
+    produced by a round contains one of them; a sequence that was not produced by the previous round (the frontier)
+    can therefore only be contained in another frontier sequence, and a scaffold can only be newly contained in a
+    frontier sequence, while everything else that was produced again is still contained in a scaffold. A round
+    with an empty frontier leaves the scaffolds unchanged, which is the fixed point.
+
+    Args:
+        contigs (list of str): Input contigs.
+        min_overlap (int): Minimum suffix-prefix overlap for two sequences to be merged.
+        size_threshold (int): Sequences not longer than this are discarded after every combine step.
+        combine_passes (int): Number of combine steps per round before removing contained sequences: 1 mirrors
+            `dbg.scaffold_iterative`, 2 mirrors `greedy_method.scaffold_iterative_greedy`.
+        disable_tqdm (bool): Disable the progress bar.
+
+    Returns:
+        list of str: Scaffolds sorted by decreasing length.
+    """
+    caches = [MergeCache(min_overlap) for _ in range(combine_passes)]
+    counts = Counter(contigs)
+    duplicated = [seq for seq, count in counts.items() if count > 1]  # only the input list can hold duplicates
+
+    scaffolds = containment.ContainmentIndex()
+    current = set(counts)
+    produced = None
+    with tqdm(desc="Scaffolding rounds", disable=disable_tqdm) as pbar:
+        while True:
+            pool = current
+            for cache in caches:
+                cache.update(pool)
+                merged = cache.merges()
+                if duplicated:
+                    merged |= self_merges(duplicated, min_overlap)
+                    duplicated = []
+                pool = {seq for seq in pool | merged if len(seq) > size_threshold}
+
+            if produced is None:  # first round: the input may contain anything
+                current = pool - containment.find_contained(pool)
+                scaffolds.add(current)
+            else:
+                frontier = pool - produced
+                if not frontier:
+                    break
+                contained = scaffolds.contained_in(frontier)
+                added = frontier - containment.find_contained(frontier)
+                scaffolds.remove(contained)
+                scaffolds.add(added)
+                current = (current - contained) | added
+            produced = pool
+
+            pbar.set_postfix(scaffolds=len(current))
+            pbar.update(1)
+
+    return sorted(current, key=len, reverse=True)
+
+
+def bounded_combine(contigs, min_overlap, budget, disable_tqdm=True):
+    """ Combine overlapping contigs like `create_scaffolds`, keeping at most `budget.max_candidates` sequences.
+
+    Candidates (the merged sequences and the input contigs) are ranked by length and then by their overlap
+    support, the summed length of all the overlaps that produce them, and only the best ones are kept. To bound
+    memory as well as output size, the merged candidates are pruned to the best ones whenever they exceed twice the
+    limit, so the support of a candidate that was pruned early is not counted any further. If the budget runs out
+    during the scan, the candidates found so far are ranked and returned; if it is already spent, no merge is
+    attempted and the input contigs alone are ranked and pruned.
+
+    Args:
+        contigs (list of str): Input contigs.
+        min_overlap (int): Minimum suffix-prefix overlap for two contigs to be merged.
+        budget (ScaffoldBudget): Limits of the bounded mode; its counters are updated in place.
+        disable_tqdm (bool): Disable the progress bar.
+
+    Returns:
+        list of str: The kept candidates, best first.
+    """
+    budget.start()
+    limit = budget.max_candidates
+
+    def rank(item):
+        return len(item[0]), item[1]
+
+    support = Counter()
+    dropped = 0
+    if not budget.expired():
+        budget.rounds += 1
+        index = overlap_index.AffixIndex(min_overlap, suffixes=False)
+        for position, contig in enumerate(contigs):
+            index.add(position, contig)
+
+        for position_a, contig_a in enumerate(tqdm(contigs, desc="Merging overlaps", disable=disable_tqdm)):
+            if budget.expired():
+                break
+            for position_b, overlap_len in index.successors(contig_a):
+                if position_b != position_a:
+                    support[contig_a + contigs[position_b][overlap_len:]] += overlap_len
+
+            if limit is not None and len(support) > 2 * limit:
+                dropped += len(support) - limit
+                support = Counter(dict(sorted(support.items(), key=rank, reverse=True)[:limit]))
+
+    for contig in contigs:
+        support[contig] += 0  # input contigs compete with the merges, with the support they got as merges if any
+
+    candidates = [seq for seq, _ in sorted(support.items(), key=rank, reverse=True)]
+    kept = candidates if limit is None else candidates[:limit]
+
+    budget.generated += len(candidates) + dropped
+    budget.pruned += len(candidates) + dropped - len(kept)
+
+    return kept
@@ -18,10 +18,14 @@ __status__ = Dev
 """
 
 # import libraries
-from collections import defaultdict
 from tqdm import tqdm
 from itertools import combinations
 
+try:
+    from . import overlap_index
+except ImportError:  # running the scripts from within src/
+    import overlap_index
+
 
 def find_overlaps(contigs, min_overlap):
 
@@ -51,19 +55,7 @@ def find_overlaps(contigs, min_overlap):
     # Output: [('ATCG', 'CGTA', 2), ('CGTA', 'TACG', 3), ('GTAC', 'TACG', 3)]
     ```
     """
-    overlaps = []
-    total_pairs = sum(1 for _ in combinations(contigs, 2))  # Calculate total number of pairs
-
-    with tqdm(total=total_pairs, desc="Finding overlaps") as pbar:
-        for a, b in combinations(contigs, 2): # combinations() generates all pairs of contigs
-            for i in range(min_overlap, min(len(a), len(b)) + 1): # Check overlaps of different lengths
-                if a[-i:] == b[:i]:
-                    overlaps.append((a, b, i))
-                if b[-i:] == a[:i]:
-                    overlaps.append((b, a, i))
-            pbar.update(1)  # Update progress bar after each pair is processed
-    
-    return overlaps
+    return overlap_index.find_overlaps(contigs, min_overlap)
 
 
 # def filter_contained_sequences(sequences):
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+
+r""" Dependency graph of pipeline stages, memoized on the parameters each stage depends on and optionally
+checkpointed to an on-disk cache.
+ _____  _______  _    _
+|  __ \|__   __|| |  | |
+| |  | |  | |   | |  | |
+| |  | |  | |   | |  | |
+| |__| |  | |   | |__| |
+|_____/   |_|   |______|
+
+__authors__ = Marco Reverenna
+__copyright__ = Copyright 2025-2026
+__research-group__ = DTU Biosustain (Multi-omics Network Analytics) and DTU Bioengineering
+__date__ = 18 Oct 2026
+__maintainer__ = Marco Reverenna
+__email__ = marcor@dtu.dk
+__status__ = Dev
+"""
+
+# import libraries
+import os
+import json
+import time
+import pickle
+import hashlib
+import tempfile
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, wait
+from tqdm import tqdm
+
+
+class Stage:
+    """ One step of a pipeline.
+
+    Args:
+        name (str): Name of the stage.
+        func (callable): Called as `func(*upstream_results, **params)`, with the results of `deps` in order and the
+            values of `params` taken from the configuration. Must be a module-level function to run in a worker.
+        params (tuple of str): Configuration keys the stage reads directly.
+        deps (tuple of str): Names of the upstream stages whose results the stage takes.
+        inputs (tuple of str): Configuration keys holding paths of input files; passed like `params`, and keyed on
+            the content of the files by a `StageCache`. A None path stands for an optional file that is not given.
+        check (callable): `check(result)` tells whether a cached result is still usable, e.g. that the output
+            folder it names still exists.
+        elapsed (str): Keyword argument in which the stage receives the seconds its upstream instances took to
+            compute, e.g. to record the end-to-end duration of a configuration. Instances shared with other
+            configurations count in full for each of them, and those loaded from the cache count for nothing.
+    """
+
+    def __init__(self, name, func, params=(), deps=(), inputs=(), check=None, elapsed=None):
+        self.name = name
+        self.func = func
+        self.params = tuple(params)
+        self.deps = tuple(deps)
+        self.inputs = tuple(inputs)
+        self.check = check
+        self.elapsed = elapsed
+
+
+class StageCache:
+    """ On-disk cache of stage results, used by `StageGraph.run` to resume a pipeline.
+
+    A result is stored under a digest of everything it was computed from: the stage and its function, the values of
+    its parameters, the content of its input files and the digests of its upstream results. A changed input or parameter
+    therefore maps to a new entry and never serves a stale result, and a stage whose upstream changed is recomputed.
+    Results are pickled, and written atomically so that an interrupted run never leaves a partial entry.
+
+    Args:
+        folder (str): Folder of the cache, created if missing.
+    """
+
+    VERSION = 1  # bump when the stages change, so older entries are not reused
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def digest(self, stage, params, inputs, upstream):
+        """ Key of a result of `stage` from its parameters, its input files and the digests of its upstream results. """
+        try:
+            from .psm_cache import file_digest
+        except ImportError:  # running the scripts from within src/
+            from psm_cache import file_digest
+
+        func = f"{stage.func.__module__.rsplit('.', 1)[-1]}.{stage.func.__qualname__}"  # e.g. the assembly method
+        files = sorted((key, file_digest(path) if path is not None else None) for key, path in inputs.items())
+        parts = [self.VERSION, stage.name, func, sorted(params.items()), files, list(upstream)]
+
+        return hashlib.sha1(json.dumps(parts, default=repr).encode()).hexdigest()[:16]
+
+    def path(self, name, digest):
+        return os.path.join(self.folder, name, f"{digest}.pkl")
+
+    def load(self, name, digest):
+        """ Return (True, result) if the cache holds the result, (False, None) otherwise. """
+        try:
+            with open(self.path(name, digest), 'rb') as file:
+                return True, pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):  # missing or truncated entry
+            return False, None
+
+    def store(self, name, digest, result):
+        path = self.path(name, digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.pkl')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+class StageGraph:
+    """ Stages connected by their dependencies, run for many configurations at once.
+
+    A stage instance is identified by the stage name and the values of the parameters it depends on, directly or
+    through its upstream stages. Configurations that agree on those values share the instance, so for a grid of
+    configurations every stage runs once per distinct combination of its own parameters instead of once per
+    configuration.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, func, params=(), deps=(), inputs=(), check=None, elapsed=None):
+        """ Register a stage; its upstream stages must already be registered. """
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'.")
+        self.stages[name] = Stage(name, func, params, deps, inputs, check, elapsed)
+
+    def downstream(self, name):
+        """ Names of stage `name` and of every stage that depends on it, directly or not. """
+        names = {name}
+        for stage in self.stages.values():  # registered after their upstream stages
+            if names.intersection(stage.deps):
+                names.add(stage.name)
+
+        return names
+
+    def params_of(self, name):
+        """ All the configuration keys the result of stage `name` depends on, sorted. """
+        stage = self.stages[name]
+        params = set(stage.params + stage.inputs)
+        for dep in stage.deps:
+            params.update(self.params_of(dep))
+
+        return tuple(sorted(params))
+
+    def key(self, name, config):
+        """ Memoization key of stage `name` for `config`. """
+        return (name,) + tuple((param, config[param]) for param in self.params_of(name))
+
+    def plan(self, configs, target):
+        """ Return the distinct stage instances needed to compute `target` for every configuration.
+
+        Returns:
+            dict: Key -> (stage, config, upstream keys), in an order where upstream instances come first.
+        """
+        tasks = {}
+
+        def visit(name, config):
+            key = self.key(name, config)
+            if key not in tasks:
+                stage = self.stages[name]
+                tasks[key] = (stage, config, tuple(visit(dep, config) for dep in stage.deps))
+            return key
+
+        for config in configs:
+            visit(target, config)
+
+        return tasks
+
+    def run(self, configs, target, executor=None, disable_tqdm=False, on_target=None, cache=None, rerun=()):
+        """ Compute stage `target` for every configuration.
+
+        Each stage instance runs as soon as its upstream results are available, on `executor` (e.g. a
+        `ProcessPoolExecutor`) or in the calling process when it is None. Intermediate results are released once
+        every downstream instance has started. A failing instance only takes down the instances that depend on it.
+        `on_target(key, result, error)` is called in the calling process as soon as each instance of `target` is
+        computed or has failed, e.g. to record progress.
+
+        With a `cache` (a `StageCache`), every computed result is stored in it, and an instance whose result is
+        cached is not run, nor are the upstream instances only it needs; the stages named in `rerun` run anyway.
+
+        Returns:
+            tuple: (results, errors), one entry per configuration in the order of `configs`: the result of the
+            target stage (None if it failed) and the exception that made it fail (None on success).
+        """
+        configs = list(configs)
+        tasks = self.plan(configs, target)
+        target_keys = [self.key(target, config) for config in configs]
+        upstream_of = {key: upstream for key, (_, _, upstream) in tasks.items()}
+
+        results, failures = {}, {}
+        seconds = {}  # key -> seconds its instance took to compute, where it ran
+        digests = {}
+        if cache is not None:
+            for key, (stage, config, upstream) in tasks.items():  # upstream instances come first
+                digests[key] = cache.digest(stage, {param: config[param] for param in stage.params},
+                                            {name: config[name] for name in stage.inputs},
+                                            [digests[dep_key] for dep_key in upstream])
+            needed = set()
+
+            def visit(key):
+                if key in needed or key in results:
+                    return
+                stage, _, upstream = tasks[key]
+                if stage.name not in rerun:
+                    found, result = cache.load(stage.name, digests[key])
+                    if found and (stage.check is None or stage.check(result)):
+                        results[key] = result
+                        return
+                needed.add(key)
+                for dep_key in upstream:
+                    visit(dep_key)
+
+            for key in target_keys:
+                visit(key)
+            if on_target is not None:
+                for key in dict.fromkeys(target_keys):
+                    if key in results:
+                        on_target(key, results[key], None)
+            tasks = {key: task for key, task in tasks.items() if key in needed}
+
+        waiting = {key: {dep_key for dep_key in upstream if dep_key not in results}
+                   for key, (_, _, upstream) in tasks.items()}
+        dependents = defaultdict(list)
+        for key, (_, _, upstream) in tasks.items():
+            for dep_key in set(upstream):
+                dependents[dep_key].append(key)
+
+        ready = [key for key, deps in waiting.items() if not deps]
+        running = {}
+
+        def ancestors(key):
+            found = set(upstream_of[key])
+            for dep_key in upstream_of[key]:
+                found.update(ancestors(dep_key))
+            return found
+
+        def start(key):
+            stage, config, upstream = tasks[key]
+            args = [results[dep_key] for dep_key in upstream]
+            kwargs = {param: config[param] for param in stage.params + stage.inputs}
+            if stage.elapsed is not None:
+                kwargs[stage.elapsed] = sum(seconds.get(dep_key, 0.0) for dep_key in ancestors(key))
+            for dep_key in set(upstream):
+                if all(child in started for child in dependents[dep_key]):
+                    del results[dep_key]
+            if executor is None:
+                return _Done(_Timed(stage.func), args, kwargs)
+            return executor.submit(_Timed(stage.func), *args, **kwargs)
+
+        def fail(key, error):
+            failures[key] = error
+            if on_target is not None and key[0] == target:
+                on_target(key, None, error)
+            for child in dependents[key]:
+                if child not in failures:
+                    fail(child, error)
+
+        started = set()
+        with tqdm(total=len(tasks), desc="Running stages", disable=disable_tqdm) as pbar:
+            while ready or running:
+                for key in ready:
+                    started.add(key)
+                    running[start(key)] = key
+                ready = []
+
+                done = [future for future in running if future.done()]
+                if not done:
+                    done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    try:
+                        results[key], seconds[key] = future.result()
+                    except Exception as error:
+                        fail(key, error)
+                        pbar.update(1)
+                        continue
+                    if cache is not None:
+                        cache.store(key[0], digests[key], results[key])
+                    if on_target is not None and key[0] == target:
+                        on_target(key, results[key], None)
+                    for child in dependents[key]:
+                        waiting[child].discard(key)
+                        if not waiting[child] and child not in failures:
+                            ready.append(child)
+                    pbar.update(1)
+
+        return ([results.get(key) for key in target_keys],
+                [failures.get(key) for key in target_keys])
+
+
+class _Timed:
+    """ Stage function returning its result with the seconds it took, timed in the process that runs it. """
+
+    def __init__(self, func):
+        self.func = func
+        self.__name__ = func.__name__
+
+    def __call__(self, *args, **kwargs):
+        started = time.monotonic()
+        result = self.func(*args, **kwargs)
+        return result, time.monotonic() - started
+
+
+class _Done:
+    """ Already computed stand-in for a future, used when no executor is given. """
+
+    def __init__(self, func, args, kwargs):
+        self._result, self._error = None, None
+        try:
+            self._result = func(*args, **kwargs)
+        except Exception as error:
+            self._error = error
+
+    def done(self):
+        return True
+
+    def result(self):
+        if self._error is not None:
+            raise self._error
+        return self._result
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+r""" Executor that runs every task in its own supervised process, with wall-clock and memory limits.
+ _____  _______  _    _
+|  __ \|__   __|| |  | |
+| |  | |  | |   | |  | |
+| |  | |  | |   | |  | |
+| |__| |  | |   | |__| |
+|_____/   |_|   |______|
+
+__authors__ = Marco Reverenna
+__copyright__ = Copyright 2025-2026
+__research-group__ = DTU Biosustain (Multi-omics Network Analytics) and DTU Bioengineering
+__date__ = 18 Oct 2026
+__maintainer__ = Marco Reverenna
+__email__ = marcor@dtu.dk
+__status__ = Dev
+"""
+
+# import libraries
+import time
+import threading
+import multiprocessing
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+
+class ResourceLimitExceeded(Exception):
+    """ A task was killed for exceeding a limit of its `SupervisedExecutor`.
+
+    Args:
+        stage (str): Name of the function that was running.
+        status (str): 'timeout' for the wall-clock limit, 'memory' for the RSS limit.
+        limit (float): The limit that was exceeded, in seconds or bytes.
+    """
+
+    def __init__(self, stage, status, limit):
+        self.stage = stage
+        self.status = status
+        self.limit = limit
+        if status == 'timeout':
+            super().__init__(f"{stage} exceeded the {limit:g} s wall-clock limit")
+        else:
+            super().__init__(f"{stage} exceeded the {limit / 1024 ** 2:.0f} MiB RSS limit")
+
+
+def rss(pid):
+    """ Resident set size of process `pid` in bytes, or None where /proc is not available. """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _child(connection, initializer, initargs, func, args, kwargs):
+    if initializer is not None:
+        initializer(*initargs)
+    try:
+        outcome = (True, func(*args, **kwargs))
+    except Exception as error:
+        outcome = (False, error)
+    try:
+        connection.send(outcome)
+    except Exception as error:  # unpicklable result or exception
+        connection.send((False, RuntimeError(f"{func.__name__}: {error!r}")))
+    connection.close()
+
+
+class SupervisedExecutor:
+    """ A drop-in for `ProcessPoolExecutor` (`submit`, `shutdown`, context manager) that starts a fresh process per
+    task, so that a task can be killed on its own without breaking the pool.
+
+    At most `max_workers` tasks run at once: `submit` waits for a free slot and starts the process of its task in
+    the calling thread. A process is never forked from the supervisor thread, so the child does not inherit locks
+    held at that moment by the thread that runs the tasks (e.g. the lock of its progress bars). The supervisor
+    thread kills a task that runs longer than `timeout` seconds or whose resident memory exceeds `max_memory`
+    bytes, fails its future with `ResourceLimitExceeded` and frees its slot. The memory limit is read from /proc, so
+    it is only enforced on Linux. A task whose process dies without a result (e.g. killed by the kernel) fails with
+    a RuntimeError.
+
+    Args:
+        max_workers (int): Number of tasks that run at once.
+        timeout (float): Wall-clock limit of a task in seconds, or None.
+        max_memory (int): RSS limit of a task in bytes, or None.
+        mp_context: multiprocessing context used to start the processes; with 'fork' they inherit the data the
+            parent loaded.
+        initializer (callable): Called with `initargs` in every process before its task.
+        poll_interval (float): Seconds between two checks of the limits.
+    """
+
+    def __init__(self, max_workers, timeout=None, max_memory=None, mp_context=None, initializer=None, initargs=(),
+                 poll_interval=0.2):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_memory = max_memory
+        self.mp_context = mp_context or multiprocessing.get_context()
+        self.initializer = initializer
+        self.initargs = initargs
+        self.poll_interval = poll_interval
+
+        self._running = {}  # connection -> (future, process, stage, started)
+        self._waiting = 0  # submissions waiting for a slot
+        self._starting = 0  # slots taken by processes being started
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._cancelled = False
+        self._thread = threading.Thread(target=self._supervise, daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("cannot submit after shutdown")
+            self._waiting += 1  # keeps the supervisor alive until the task is running
+            self._slot_freed.wait_for(lambda: len(self._running) + self._starting < self.max_workers
+                                      or self._cancelled)
+            self._waiting -= 1
+            cancelled = self._cancelled
+            if not cancelled:
+                self._starting += 1
+        if cancelled:
+            self._wakeup.set()
+            future.cancel()
+            return future
+        future.set_running_or_notify_cancel()
+
+        try:
+            receiver, sender = self.mp_context.Pipe(duplex=False)
+            process = self.mp_context.Process(target=_child, daemon=True,
+                                              args=(sender, self.initializer, self.initargs, func, args, kwargs))
+            process.start()
+            sender.close()
+        except BaseException:
+            with self._lock:
+                self._starting -= 1
+                self._slot_freed.notify()
+            self._wakeup.set()
+            raise
+        with self._lock:
+            self._starting -= 1
+            self._running[receiver] = (future, process, func.__name__, time.monotonic())
+        self._wakeup.set()
+
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        with self._lock:
+            self._closed = True
+            if cancel_futures:
+                self._cancelled = True  # the submissions still waiting for a slot give up
+                self._slot_freed.notify_all()
+        self._wakeup.set()
+        if wait:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown(wait=True)
+
+    def _finish(self, connection, error=None):
+        with self._lock:
+            future, process, stage, _ = self._running[connection]
+        if error is None:
+            try:
+                succeeded, value = connection.recv()
+            except (EOFError, OSError):
+                process.join()
+                succeeded, value = False, RuntimeError(f"{stage} worker died with exit code {process.exitcode}")
+        else:
+            process.kill()
+            succeeded, value = False, error
+        process.join()
+        connection.close()
+        with self._lock:  # the slot is free once the process is gone
+            del self._running[connection]
+            self._slot_freed.notify()
+        if succeeded:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+    def _supervise(self):
+        while True:
+            with self._lock:
+                if self._closed and not (self._running or self._waiting or self._starting):
+                    return
+                running = dict(self._running)
+            if not running:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            for connection in wait(list(running), timeout=self.poll_interval):
+                self._finish(connection)
+                del running[connection]
+
+            now = time.monotonic()
+            for connection, (_, process, stage, started) in running.items():
+                if self.timeout is not None and now - started > self.timeout:
+                    self._finish(connection, ResourceLimitExceeded(stage, 'timeout', self.timeout))
+                elif self.max_memory is not None and (rss(process.pid) or 0) > self.max_memory:
+                    self._finish(connection, ResourceLimitExceeded(stage, 'memory', self.max_memory))
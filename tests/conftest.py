@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules are imported as the grid search imports them, e.g. `from src import mapping`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,24 @@
+""" Command line: the subcommands import none of the plotting and graph libraries at startup. """
+
+import pytest
+
+from src import cli, pipeline
+
+
+@pytest.mark.parametrize("command", sorted(cli.COMMAND_MODULES))
+def test_subcommands_import_no_lazy_module(command):
+    _, imported = cli.import_time(cli.COMMAND_MODULES[command], cli.COMMAND_DIRS.get(command, cli.HERE))
+
+    assert set(cli.COMMAND_MODULES[command]) <= set(imported)
+    assert not {name.split(".")[0] for name in imported} & set(cli.LAZY_MODULES)
+
+
+def test_parser_matches_the_pipeline():
+    assert cli.STAGES == pipeline.STAGES
+
+    args = cli.build_parser().parse_args(["assemble", "--method", "greedy", "--run", "bsa", "--protein", "ACDE",
+                                          "--from-stage", "mapping"])
+    assert (args.method, args.run, args.from_stage) == ("greedy", "bsa", "mapping")
+    with pytest.raises(SystemExit):
+        cli.build_parser().parse_args(["assemble", "--method", "greedy", "--run", "bsa", "--protein", "ACDE",
+                                       "--from-stage", "unknown"])
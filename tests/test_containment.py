@@ -0,0 +1,72 @@
+""" Aho-Corasick containment removal against the nested substring loops it replaced. """
+
+import random
+
+import pytest
+
+from src import containment, dbg, greedy_method
+
+
+def nested_merge(contigs):
+    """ The original dbg.merge_sequences and greedy_method.merge_contigs. """
+    contigs = sorted(contigs, key=len, reverse=True)
+    merged = set(contigs)
+    for c in contigs:
+        for c2 in contigs:
+            if c != c2 and c2 in c:
+                merged.discard(c2)
+    return list(merged)
+
+
+def nested_remove_contained(sequences):
+    """ The original dbg.remove_contained_sequences. """
+    unique_seqs = list(set(sequences))
+    to_remove = set()
+    for i, s1 in enumerate(unique_seqs):
+        for j, s2 in enumerate(unique_seqs):
+            if i != j and s1 in s2:
+                to_remove.add(s1)
+    return [s for s in unique_seqs if s not in to_remove]
+
+
+def sequences(seed, alphabet="ACD", count=60):
+    rng = random.Random(seed)
+    result = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 10))) for _ in range(count)]
+    return result + result[:5]
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_merge_functions_match_nested_loops(seed):
+    seqs = sequences(seed)
+    expected = sorted(nested_merge(seqs))
+
+    assert sorted(dbg.merge_sequences(seqs, disable_tqdm=True)) == expected
+    assert sorted(greedy_method.merge_contigs(seqs)) == expected
+    assert sorted(dbg.remove_contained_sequences(seqs)) == sorted(nested_remove_contained(seqs)) == expected
+    assert containment.remove_contained(seqs) == [seq for seq in dict.fromkeys(seqs) if seq in set(expected)]
+
+
+@pytest.mark.parametrize("seqs", [[], [""], ["", "A"], ["ACD", "ACD"], ["AAAA", "AA", "A", "AAA"],
+                                  ["ACDC", "DCA", "CDC"]])
+def test_find_contained_edge_cases(seqs):
+    expected = set(seqs) - set(nested_merge(seqs))
+
+    assert containment.find_contained(seqs) == expected
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_containment_index_follows_the_live_set(seed):
+    rng = random.Random(seed)
+    index = containment.ContainmentIndex()
+    live = set()
+    for _ in range(12):
+        added = sequences(rng.random(), count=8)
+        removed = rng.sample(sorted(live), k=min(len(live), 4))
+        index.add(added)
+        index.remove(removed)
+        live = (live | set(added)) - set(removed)
+
+        texts = sequences(rng.random(), count=5)
+        expected = {seq for seq in live for text in texts if seq != text and seq in text}
+        assert index.contained_in(texts) == expected
+        assert len(index) == len(live)
@@ -0,0 +1,108 @@
+""" Contaminant filter: the persisted suffix-array index against the substring scan of every contaminant. """
+
+import os
+import hashlib
+import random
+import shutil
+
+import numpy as np
+import pytest
+from Bio import SeqIO
+
+from src import contaminants, preprocessing
+
+
+CONTAMINANTS_FASTA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fasta",
+                                  "contaminants.fasta")
+
+
+def scan_filter(seqs, run, contaminants_fasta):
+    """ The original `preprocessing.filter_contaminants`. """
+    contam_records = []
+    for record in SeqIO.parse(contaminants_fasta, "fasta"):
+        if run == 'bsa' and "Bovine serum albumin precursor" in record.description:
+            continue
+        contam_records.append(str(record.seq))
+    return [seq for seq in seqs if not any(seq in contam_seq for contam_seq in contam_records)]
+
+
+def peptides(seed, records, count=300):
+    """ Substrings of the contaminants (some with a substitution), random peptides, and odd entries. """
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        record = rng.choice(records)
+        length = rng.randint(1, 20)
+        start = rng.randrange(max(1, len(record) - length + 1))
+        peptide = record[start:start + length]
+        if rng.random() < 0.3:
+            position = rng.randrange(len(peptide))
+            peptide = peptide[:position] + rng.choice("ACDEFGHIKLMNPQRSTVWY") + peptide[position + 1:]
+        result.append(peptide)
+    result += ["".join(rng.choice("ACDEFGHIKLMNPQRSTVWY") for _ in range(rng.randint(5, 12))) for _ in range(50)]
+    result += [records[0], records[0] + "K", records[0][-3:] + records[-1][:3], "", "\n", result[0]]
+    return result
+
+
+@pytest.fixture
+def contaminants_fasta(tmp_path):
+    """ A copy of the shipped contaminants, so the persisted index is written to the test folder. """
+    path = tmp_path / "contaminants.fasta"
+    shutil.copy(CONTAMINANTS_FASTA, path)
+    return str(path)
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("run", ["bsa", "ma3"])
+def test_filter_matches_substring_scan(contaminants_fasta, seed, run):
+    records = [str(record.seq) for record in SeqIO.parse(contaminants_fasta, "fasta")]
+    seqs = peptides(seed, records)
+
+    expected = scan_filter(seqs, run, contaminants_fasta)
+
+    assert preprocessing.filter_contaminants(seqs, run, contaminants_fasta) == expected
+    assert 0 < len(expected) < len(seqs)
+
+
+def test_bsa_run_keeps_bsa_peptides(contaminants_fasta):
+    bsa = [str(record.seq) for record in SeqIO.parse(contaminants_fasta, "fasta")
+           if contaminants.BSA_DESCRIPTION in record.description]
+    assert bsa
+    seqs = peptides(0, bsa, count=50)
+
+    kept = preprocessing.filter_contaminants(seqs, "bsa", contaminants_fasta)
+    assert kept == scan_filter(seqs, "bsa", contaminants_fasta)
+    assert len(preprocessing.filter_contaminants(seqs, "ma3", contaminants_fasta)) < len(kept)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("alphabet", ["AB", "ACDE\n"])
+def test_suffix_array_sorts_suffixes(seed, alphabet):
+    rng = random.Random(seed)
+    text = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 300)))
+
+    expected = sorted(range(len(text)), key=lambda start: text[start:])
+
+    assert contaminants.build_suffix_array(text).tolist() == expected
+    assert contaminants.build_suffix_array("").tolist() == []
+
+
+def test_index_is_persisted_and_rebuilt_when_the_fasta_changes(contaminants_fasta):
+    path = contaminants.index_path(contaminants_fasta)
+    index = contaminants.load_contaminant_index(contaminants_fasta)
+    assert os.path.exists(path)
+    assert contaminants.index_path(contaminants_fasta, (contaminants.BSA_DESCRIPTION,)) != path
+    probe = os.path.join(os.path.dirname(path), "probe")
+    open(probe, "w").close()
+    assert os.stat(path).st_mode & 0o777 == os.stat(probe).st_mode & 0o777  # the umask, not the 0600 of mkstemp
+
+    with open(contaminants_fasta, "rb") as file:
+        fasta_digest = hashlib.sha1(file.read()).hexdigest()
+    loaded = contaminants.ContaminantIndex.load(path, fasta_digest)
+    assert loaded.text == index.text and np.array_equal(loaded.suffix_array, index.suffix_array)
+    assert contaminants.ContaminantIndex.load(path, "another digest") is None
+
+    with open(contaminants_fasta, "a") as file:
+        file.write(">added contaminant\nWWWWYYYYWWWW\n")
+    assert "WWYYYYWW" not in index
+    assert "WWYYYYWW" in contaminants.load_contaminant_index(contaminants_fasta)
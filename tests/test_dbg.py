@@ -0,0 +1,79 @@
+""" De Bruijn graph assembly: the integer-encoded k-mer engine and the unitig traversal against the string
+implementations they replace. """
+
+import random
+
+import numpy as np
+import pytest
+
+from src import dbg
+
+
+def peptides(seed, alphabet="ACDEKL", protein_length=120, count=80, min_length=6, max_length=14):
+    """ Overlapping substrings of a random protein over a small alphabet, so the graph has repeats and branches. """
+    rng = random.Random(seed)
+    protein = "".join(rng.choice(alphabet) for _ in range(protein_length))
+    result = []
+    for _ in range(count):
+        length = rng.randint(min_length, max_length)
+        start = rng.randrange(len(protein) - length + 1)
+        result.append(protein[start:start + length])
+    return result
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("kmer_size", [1, 4, 7, 12])
+def test_encoded_kmers_match_get_kmers(seed, kmer_size):
+    seqs = peptides(seed) + ["", "ACD"]  # sequences shorter than k have no k-mer
+
+    encoded = dbg.get_kmers_encoded(seqs, kmer_size)
+
+    assert dbg.decode_kmers(encoded, kmer_size) == dbg.get_kmers(seqs, kmer_size)
+    unique, counts = dbg.get_kmer_counts_encoded(encoded)
+    assert dbg.kmer_counts_to_dict(unique, counts, kmer_size) == dbg.get_kmer_counts(dbg.get_kmers(seqs, kmer_size))
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("kmer_size", [3, 5, 7])
+def test_encoded_edges_match_string_edges(seed, kmer_size):
+    seqs = peptides(seed, alphabet="ACDEFGHIKLMNPQRSTVWY")
+
+    edges = dbg.get_debruijn_edges_from_encoded(dbg.get_kmers_encoded(seqs, kmer_size), kmer_size)
+
+    assert edges == dbg.get_debruijn_edges_from_kmers(dbg.get_kmers(seqs, kmer_size))
+
+
+def test_encoded_kmers_reject_what_cannot_be_packed():
+    assert len(dbg.get_kmers_encoded(["ACD"], 4)) == 0
+    with pytest.raises(ValueError):
+        dbg.get_kmers_encoded(["ACDE"], dbg.MAX_ENCODED_KMER_SIZE + 1)
+    with pytest.raises(ValueError):
+        dbg.get_kmers_encoded(["ACD*E"], 3)
+    with pytest.raises(ValueError):
+        dbg.get_kmers_encoded(["ACDÉ"], 3)
+    assert np.asarray(dbg.get_kmers_encoded([], 3)).dtype == np.uint64
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("kmer_size", [4, 6, 8])
+@pytest.mark.parametrize("alphabet", ["ACDEKL", "ACDEFGHIKLMN"])
+def test_compacted_traversal_matches_assemble_contigs(seed, kmer_size, alphabet):
+    edges = dbg.get_debruijn_edges_from_kmers(dbg.get_kmers(peptides(seed, alphabet), kmer_size))
+
+    assert sorted(dbg.assemble_contigs_compacted(edges)) == sorted(dbg.assemble_contigs(edges))
+
+
+def test_unitig_graph_collapses_chains():
+    # ABCD -> BCDE -> CDEF branches into DEFG and DEFH
+    edges = dbg.get_debruijn_edges_from_kmers(dbg.get_kmers(["ABCDEFG", "CDEFH"], 4))
+
+    unitigs, successors, start_ids, node_length = dbg.build_unitig_graph(edges)
+
+    assert node_length == 3
+    assert [unitigs[i] for i in start_ids] == ["ABCDEF"]
+    assert sorted(unitigs[i] for i in successors[start_ids[0]]) == ["EFG", "EFH"]
+    assert sorted(dbg.assemble_contigs_compacted(edges)) == ["ABCDEFG", "ABCDEFH"]
+
+
+def test_compacted_traversal_of_empty_graph():
+    assert dbg.assemble_contigs_compacted(set()) == dbg.assemble_contigs(set()) == []
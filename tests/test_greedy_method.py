@@ -0,0 +1,35 @@
+""" Greedy contig assembly: the heap-driven incremental assembler against the all-pairs rounds of
+`assemble_contigs`. """
+
+import random
+
+import pytest
+
+from src import greedy_method
+
+
+def peptides(seed, alphabet="ACDEKL", protein_length=100, count=40, min_length=5, max_length=12):
+    rng = random.Random(seed)
+    protein = "".join(rng.choice(alphabet) for _ in range(protein_length))
+    result = []
+    for _ in range(count):
+        length = rng.randint(min_length, max_length)
+        start = rng.randrange(len(protein) - length + 1)
+        result.append(protein[start:start + length])
+    return result
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("min_overlap", [2, 3, 5])
+def test_incremental_assembler_matches_assemble_contigs(seed, min_overlap):
+    seqs = peptides(seed)
+
+    expected = greedy_method.assemble_contigs(seqs, min_overlap)
+
+    assert greedy_method.assemble_contigs_incremental(seqs, min_overlap) == expected
+    assert len(expected) < len(seqs)
+
+
+@pytest.mark.parametrize("seqs", [[], ["ACDE"], ["ACDE", "ACDE"], ["ACDEF", "DEFGH", "FGHIK"], ["AAAA", "AAAA", "AAA"]])
+def test_incremental_assembler_edge_cases(seqs):
+    assert greedy_method.assemble_contigs_incremental(seqs, 2) == greedy_method.assemble_contigs(seqs, 2)
@@ -0,0 +1,126 @@
+""" Manifest of the grid search: resuming an interrupted sweep, and the claims, leases and re-claims of its work queue
+across processes. """
+
+import time
+import multiprocessing
+
+from src.opt.manifest import Manifest
+
+
+LEASE = 1.0
+COMBINATIONS = [{"task": task, "max_mismatches": mm} for task in range(6) for mm in (8, 14)]
+
+
+def task_of(params):
+    return {"task": params["task"]}
+
+
+def stub_task(params):
+    time.sleep(0.05)
+    return f"out/{params['task']}_{params['max_mismatches']}"
+
+
+def crashing_worker(path, claimed):
+    """ Claims a task and dies without recording it or renewing its lease. """
+    with Manifest(path, "dbg") as manifest:
+        claimed.extend(manifest.claim("crashed", LEASE, max_attempts=3))
+
+
+def worker(path, name, runs):
+    """ The loop of `gridsearch.grid_search_worker` with a stub task instead of the stage graph. """
+    with Manifest(path, "dbg") as manifest:
+        while True:
+            claimed = manifest.claim(name, LEASE, max_attempts=3)
+            if not claimed:
+                if not manifest.leased():
+                    break
+                time.sleep(LEASE / 4)
+                continue
+            for params in claimed:
+                runs.append((name, params["task"], params["max_mismatches"]))
+                manifest.record(params, output=stub_task(params), seconds=0.05)
+
+
+def test_claim_expire_reclaim(tmp_path):
+    path = str(tmp_path / "manifest.sqlite")
+    with Manifest(path, "dbg") as manifest:
+        manifest.register(COMBINATIONS, task_of=task_of)
+
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as shared:
+        claimed, runs = shared.list(), shared.list()
+
+        crash = context.Process(target=crashing_worker, args=(path, claimed))
+        crash.start()
+        crash.join()
+        lost = list(claimed)
+        assert [params["task"] for params in lost] == [0, 0]  # both thresholds of the first task
+
+        workers = [context.Process(target=worker, args=(path, f"worker{i}", runs)) for i in range(3)]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join(timeout=60)
+            assert process.exitcode == 0
+        runs = list(runs)
+
+    # every combination ran exactly once after the crash, the lost task once its lease expired
+    assert sorted((task, mm) for _, task, mm in runs) == sorted((p["task"], p["max_mismatches"]) for p in COMBINATIONS)
+    with Manifest(path, "dbg") as manifest:
+        assert manifest.summary() == {"done": len(COMBINATIONS)}
+        assert manifest.leased() == 0
+        for params in COMBINATIONS:
+            row = manifest.get(params)
+            assert row["output"] == stub_task(params)
+            assert row["attempts"] == (2 if params in lost else 1)
+
+
+def test_claim_several_tasks(tmp_path):
+    with Manifest(str(tmp_path / "manifest.sqlite"), "dbg") as manifest:
+        manifest.register(COMBINATIONS, task_of=task_of)
+        manifest.record(COMBINATIONS[3], output="out/1_14")  # done: its task is claimed without it
+
+        first = manifest.claim("a", LEASE, max_attempts=3, tasks=4)
+        second = manifest.claim("b", LEASE, max_attempts=3, tasks=4)
+
+        assert first == COMBINATIONS[:3] + COMBINATIONS[4:8]  # whole tasks, one after the other
+        assert second == COMBINATIONS[8:]
+        assert manifest.claim("c", LEASE, max_attempts=3, tasks=4) == []
+        assert manifest.leased() == len(COMBINATIONS) - 1
+
+
+def test_expired_lease_on_last_attempt_fails(tmp_path):
+    path = str(tmp_path / "manifest.sqlite")
+    with Manifest(path, "dbg") as manifest:
+        manifest.register(COMBINATIONS[:2], task_of=task_of)
+        assert len(manifest.claim("a", 0.0, max_attempts=1)) == 2
+        time.sleep(0.01)
+
+        assert manifest.claim("b", LEASE, max_attempts=1) == []
+        assert manifest.summary() == {"failed": 2}
+        assert manifest.get(COMBINATIONS[0])["error"] == "lease expired"
+
+
+def test_restarted_sweep_skips_finished_combinations(tmp_path):
+    path = str(tmp_path / "manifest.sqlite")
+    done, failed, killed, died, pending = COMBINATIONS[:5]
+    with Manifest(path, "dbg") as manifest:
+        manifest.register(COMBINATIONS)
+        manifest.start([done, failed, killed, died], "local")
+        manifest.record(done, output="out/done", seconds=1.0)
+        manifest.record(failed, error=ValueError("no contigs"))
+        manifest.record(killed, error="exceeded", status="timeout", stage="scaffolds")
+
+    with Manifest(path, "dbg") as manifest:  # the sweep died with `died` still running
+        manifest.register(COMBINATIONS)  # registering again keeps the recorded outcomes
+        assert manifest.to_run(COMBINATIONS, max_attempts=2) == [failed, died] + COMBINATIONS[4:]
+        assert manifest.to_run(COMBINATIONS, max_attempts=1) == COMBINATIONS[4:]
+        assert manifest.get(failed)["error"] == "no contigs"
+        assert manifest.get(dict(reversed(list(done.items()))))["output"] == "out/done"  # key order does not matter
+        assert manifest.summary() == {"done": 1, "failed": 1, "timeout": 1, "running": 1,
+                                      "pending": len(COMBINATIONS) - 4}
+        assert pending in manifest.to_run([pending], max_attempts=1)
+
+    with Manifest(path, "greedy") as manifest:  # the sweeps of the two methods share the file, not the rows
+        assert manifest.to_run(COMBINATIONS, max_attempts=1) == COMBINATIONS
+        assert manifest.summary() == {}
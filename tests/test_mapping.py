@@ -0,0 +1,173 @@
+""" Mismatch-tolerant mapping: the vectorized and seed-indexed mappers against the `map_to_protein` scan. """
+
+import random
+
+import pytest
+
+from src import compute_statistics, mapping
+
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+THRESHOLDS = [(0, 0.9), (2, 0.8), (5, 0.5), (14, 0.0)]
+
+
+def protein(seed, alphabet=AMINO_ACIDS, length=200):
+    rng = random.Random(seed)
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def reads(seed, target, alphabet=AMINO_ACIDS, count=60):
+    """ Substrings of `target` with a few substitutions, random sequences, and sequences longer than `target`. """
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        length = rng.randint(1, 25)
+        start = rng.randrange(len(target) - length + 1)
+        read = list(target[start:start + length])
+        for _ in range(rng.choice([0, 0, 1, 2, 4])):
+            read[rng.randrange(length)] = rng.choice(alphabet)
+        result.append("".join(read))
+    result += ["".join(rng.choice(alphabet) for _ in range(rng.randint(3, 12))) for _ in range(10)]
+    result += [target + "A", result[0]]  # longer than the protein, and a duplicate
+    return result
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("max_mismatches, min_identity", THRESHOLDS)
+@pytest.mark.parametrize("alphabet", [AMINO_ACIDS, "ACD"])  # a repetitive protein has many tied offsets
+def test_batch_mapper_matches_map_to_protein(seed, max_mismatches, min_identity, alphabet):
+    target = protein(seed, alphabet)
+    seqs = reads(seed, target, alphabet)
+    expected = [mapping.map_to_protein(seq, target, max_mismatches, min_identity) for seq in seqs]
+
+    assert mapping.map_to_protein_batch(seqs, target, max_mismatches, min_identity) == expected
+    # batches smaller than one group still give the same result
+    assert mapping.map_to_protein_batch(seqs, target, max_mismatches, min_identity, max_cells=64) == expected
+
+
+def test_batch_mapper_falls_back_on_non_ascii():
+    target = protein(0)[:50] + "É" + protein(1)[:50]
+    seqs = reads(2, target, alphabet="ACDÉ")
+
+    for max_mismatches, min_identity in THRESHOLDS:
+        expected = [mapping.map_to_protein(seq, target, max_mismatches, min_identity) for seq in seqs]
+        assert mapping.map_to_protein_batch(seqs, target, max_mismatches, min_identity) == expected
+        assert mapping.map_to_protein_batch(seqs, target.replace("É", "A"), max_mismatches, min_identity) == \
+            [mapping.map_to_protein(seq, target.replace("É", "A"), max_mismatches, min_identity) for seq in seqs]
+
+    assert mapping.map_to_protein_batch([], target, 2, 0.8) == []
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("max_mismatches, min_identity", THRESHOLDS)
+@pytest.mark.parametrize("alphabet", [AMINO_ACIDS, "ACD"])
+def test_reference_index_matches_map_to_protein(seed, max_mismatches, min_identity, alphabet):
+    target = protein(seed, alphabet)
+    seqs = reads(seed, target, alphabet)
+    expected = [mapping.map_to_protein(seq, target, max_mismatches, min_identity) for seq in seqs]
+    index = mapping.ReferenceIndex(target)
+
+    # the seed path for every sequence, the full scan for every sequence, and the default mix of both
+    for fraction in (1.0, 0.0, 0.25):
+        assert index.map_batch(seqs, max_mismatches, min_identity, max_candidate_fraction=fraction) == expected
+    assert [index.map(seq, max_mismatches, min_identity) for seq in seqs] == expected
+    assert mapping.process_protein_contigs_scaffold(seqs, target, max_mismatches, min_identity) == \
+        [(seq, hit) for seq, hit in zip(seqs, expected) if hit]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_candidate_offsets_cover_every_alignment(seed):
+    target = protein(seed, "ACDE")
+    index = mapping.ReferenceIndex(target)
+    for seq in reads(seed, target, "ACDE"):
+        if len(seq) > len(target):
+            continue
+        for max_errors in range(min(4, len(seq))):
+            within = [offset for offset in range(len(target) - len(seq) + 1)
+                      if sum(a != b for a, b in zip(seq, target[offset:])) <= max_errors]
+            assert set(within) <= set(index.candidate_offsets(seq, max_errors))
+
+
+def test_mismatch_budget():
+    assert mapping.mismatch_budget(10, 3, 0.8) == 2
+    assert mapping.mismatch_budget(10, 1, 0.5) == 1
+    assert mapping.mismatch_budget(2, 5, 0.0) == 1  # at least one residue must match
+    assert mapping.mismatch_budget(4, 0, 1.1) == -1
+
+
+def best_hit_per_reference(seq, references, max_mismatches, min_identity):
+    """ `map_to_protein` against each reference in turn, keeping the first one with the fewest mismatches. """
+    best = None
+    for name, reference in references.items():
+        hit = mapping.map_to_protein(seq, reference, max_mismatches, min_identity)
+        if hit is not None and (best is None or len(hit[2]) < len(best[1][2])):
+            best = (name, hit)
+    return best
+
+
+def panel(seed, alphabet=AMINO_ACIDS):
+    """ Three references, the last one sharing a stretch with the first so some reads hit both. """
+    first, second = protein(seed, alphabet, 150), protein(seed + 50, alphabet, 80)
+    return {"heavy": first, "light": second, "variant": second[:30] + first[40:100]}
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("max_mismatches, min_identity", THRESHOLDS)
+@pytest.mark.parametrize("alphabet", [AMINO_ACIDS, "ACD"])
+def test_multi_reference_matches_best_single_hit(seed, max_mismatches, min_identity, alphabet):
+    references = panel(seed, alphabet)
+    seqs = reads(seed, "".join(references.values()), alphabet)
+    expected = [best_hit_per_reference(seq, references, max_mismatches, min_identity) for seq in seqs]
+    index = mapping.MultiReferenceIndex(references)
+
+    for fraction in (1.0, 0.0, 0.25):
+        assert index.map_batch(seqs, max_mismatches, min_identity, max_candidate_fraction=fraction) == expected
+    mapped = mapping.process_protein_contigs_multi(seqs, references, max_mismatches, min_identity)
+    assert mapped == [(seq, *hit) for seq, hit in zip(seqs, expected) if hit]
+
+    # a panel of one reference is the single-reference mapping
+    for name, reference in references.items():
+        hits = mapping.MultiReferenceIndex({name: reference}).map_batch(seqs, max_mismatches, min_identity)
+        single = mapping.map_to_protein_batch(seqs, reference, max_mismatches, min_identity)
+        assert hits == [hit and (name, hit) for hit in single]
+
+
+def test_statistics_per_reference(tmp_path):
+    references = panel(0)
+    seqs = reads(0, "".join(references.values()))
+    mapped = mapping.process_protein_contigs_multi(seqs, references, 2, 0.8)
+
+    by_reference = mapping.split_mapped_by_reference(mapped)
+    assert sorted(by_reference) == sorted({name for _, name, _ in mapped})
+    assert sum(map(len, by_reference.values())) == len(mapped)
+
+    frames = {name: mapping.create_dataframe_from_mapped_sequences(group) for name, group in by_reference.items()}
+    statistics = compute_statistics.compute_assembly_statistics_per_reference(
+        frames, "contigs", str(tmp_path), references, run="test")
+
+    for name, group in by_reference.items():
+        expected = compute_statistics.compute_assembly_statistics(
+            mapping.create_dataframe_from_mapped_sequences(group), f"contigs_{name}", str(tmp_path), references[name],
+            reference_name=name, run="test")
+        assert statistics[name] == expected
+        assert (tmp_path / f"contigs_{name}_stats.json").exists()
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("alphabet", [AMINO_ACIDS, "ACD"])
+def test_thresholds_match_one_mapping_per_pair(seed, alphabet):
+    target = protein(seed, alphabet)
+    seqs = reads(seed, target, alphabet)
+    thresholds = THRESHOLDS + [(14, 0.9), (0, 0.0), (2, 0.8)]  # pairs looser on one side only, and a duplicate
+
+    mapped = mapping.process_protein_contigs_thresholds(seqs, target, thresholds)
+
+    assert list(mapped) == list(dict.fromkeys(thresholds))
+    for max_mismatches, min_identity in thresholds:
+        assert mapped[(max_mismatches, min_identity)] == \
+            mapping.process_protein_contigs_scaffold(seqs, target, max_mismatches, min_identity)
+
+
+def test_thresholds_without_pairs_or_contigs():
+    assert mapping.process_protein_contigs_thresholds(reads(0, protein(0)), protein(0), []) == {}
+    assert mapping.process_protein_contigs_thresholds([], protein(0), THRESHOLDS) == {pair: [] for pair in THRESHOLDS}
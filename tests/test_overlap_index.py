@@ -0,0 +1,59 @@
+""" Suffix-prefix overlap index against the all-pairs loops it replaced in dbg, greedy_method and scaffolding. """
+
+import random
+from itertools import combinations
+
+import pytest
+
+from src import dbg, greedy_method, overlap_index, scaffolding
+
+
+def all_pairs_overlaps(contigs, min_overlap):
+    """ The original `find_overlaps` of dbg, greedy_method and scaffolding. """
+    overlaps = []
+    for a, b in combinations(contigs, 2):
+        for i in range(min_overlap, min(len(a), len(b)) + 1):
+            if a[-i:] == b[:i]:
+                overlaps.append((a, b, i))
+            if b[-i:] == a[:i]:
+                overlaps.append((b, a, i))
+    return overlaps
+
+
+def contigs(seed, alphabet="ACDE", count=40):
+    rng = random.Random(seed)
+    result = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12))) for _ in range(count)]
+    return result + result[:3]  # duplicated entries overlap with each other too
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("min_overlap", [1, 2, 4])
+def test_find_overlaps_matches_all_pairs(seed, min_overlap):
+    seqs = contigs(seed)
+    expected = all_pairs_overlaps(seqs, min_overlap)
+
+    assert overlap_index.find_overlaps(seqs, min_overlap, disable_tqdm=True) == expected
+    assert dbg.find_overlaps(seqs, min_overlap, disable_tqdm=True) == expected
+    assert greedy_method.find_overlaps(seqs, min_overlap) == expected
+    assert scaffolding.find_overlaps(seqs, min_overlap) == expected
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_affix_index_lookups_after_removals(seed):
+    seqs = contigs(seed, count=30)
+    index = overlap_index.AffixIndex(2)
+    for key, seq in enumerate(seqs):
+        index.add(key, seq)
+    for key in range(0, len(seqs), 3):
+        index.remove(key)
+    assert len(index) == len(seqs) - len(range(0, len(seqs), 3))
+
+    for query in contigs(seed + 100, count=10):
+        live = index.sequences.items()
+        successors = sorted((key, n) for key, seq in live for n in range(2, min(len(query), len(seq)) + 1)
+                            if query[-n:] == seq[:n])
+        predecessors = sorted((key, n) for key, seq in live for n in range(2, min(len(query), len(seq)) + 1)
+                              if seq[-n:] == query[:n])
+        assert sorted(index.successors(query)) == successors
+        assert sorted(index.predecessors(query)) == predecessors
+        assert [n for _, n in index.successors(query)] == sorted((n for _, n in successors), reverse=True)
@@ -0,0 +1,174 @@
+""" PSM ingest: the vectorized cleaning and the chunked reader against the row-by-row pandas steps of the original
+scripts. """
+
+import os
+import re
+import random
+import shutil
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+from Bio import SeqIO
+
+from src import preprocessing
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROTEASES = ["Trypsin", "GluC", "ProtK", "Elastase"]
+EXPERIMENTS = ["20250207_FJ_DDA_100ng_Trypsin_C17", "20250207_FJ_DDA_100ng_GluC_C17", "20250207_FJ_DDA_ProtK_C18",
+               "20250207_FJ_DDA_100ng_Unknown_C17", "Elastase_20250208_FJ_rerun"]
+
+
+def remove_modifications(psm_column):
+    """ The original row-wise `preprocessing.remove_modifications`. """
+    if pd.notnull(psm_column):
+        return re.sub(r'\(.*?\)', '', psm_column)
+    return None
+
+
+def clean_dataframe(df):
+    """ The original `preprocessing.clean_dataframe`. """
+    df = df.copy()
+    df['log_probs'] = df['log_probs'].replace(-1, -10)
+    df = df.dropna(subset=['preds'])
+    df.loc[:, 'conf'] = np.exp(df['log_probs'])
+    return df.sort_values('conf', ascending=False)
+
+
+def row_wise_clean(df, proteases):
+    """ The ingest steps of the original scripts. """
+    df = df.copy()
+    df['protease'] = df['experiment_name'].apply(lambda name: preprocessing.extract_protease(name, proteases))
+    df = clean_dataframe(df)
+    df['cleaned_preds'] = df['preds'].apply(remove_modifications)
+    return df
+
+
+def raw_psms(seed, contaminants, rows=2000):
+    """ A raw InstaNovo export: repeated predictions with modifications, missing predictions, the -1 log
+    probability, tied confidences and contaminant peptides. """
+    rng = random.Random(seed)
+    peptides = ["".join(rng.choice("ACDEFGHIKLMNPQRSTVWY") for _ in range(rng.randint(5, 15))) for _ in range(150)]
+    peptides += [record[start:start + 9] for record in rng.sample(contaminants, 20) for start in (0, 30)]
+    modified = ["M(+15.99)" + peptide for peptide in peptides[:20]] + [peptide[:3] + "C(+57.02)" + peptide[3:]
+                                                                      for peptide in peptides[20:40]]
+    log_probs = [-1.0, -0.5, -2.0] + [rng.uniform(-6, 0) for _ in range(200)]
+
+    return pd.DataFrame({
+        "experiment_name": [rng.choice(EXPERIMENTS) for _ in range(rows)],
+        "scan_number": range(rows),
+        "preds": [np.nan if rng.random() < 0.05 else rng.choice(peptides + modified) for _ in range(rows)],
+        "log_probs": [float(np.float32(rng.choice(log_probs))) for _ in range(rows)],
+    })
+
+
+@pytest.fixture
+def contaminants_fasta(tmp_path):
+    path = tmp_path / "contaminants.fasta"
+    shutil.copy(os.path.join(ROOT, "fasta", "contaminants.fasta"), path)
+    return str(path)
+
+
+@pytest.fixture
+def contaminants(contaminants_fasta):
+    return [str(record.seq) for record in SeqIO.parse(contaminants_fasta, "fasta")]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_clean_psm_dataframe_matches_row_wise_steps(seed, contaminants):
+    df = raw_psms(seed, contaminants)
+
+    pd.testing.assert_frame_equal(preprocessing.clean_psm_dataframe(df, PROTEASES), row_wise_clean(df, PROTEASES))
+
+    unsorted = preprocessing.clean_psm_dataframe(df, PROTEASES, sort=False)
+    pd.testing.assert_frame_equal(unsorted.sort_values('conf', ascending=False), row_wise_clean(df, PROTEASES))
+
+    normalized = preprocessing.clean_psm_dataframe(df, PROTEASES, normalize_il=True)
+    assert normalized['cleaned_preds'].tolist() == [preprocessing.normalize_sequence(seq) for seq in
+                                                    row_wise_clean(df, PROTEASES)['cleaned_preds']]
+
+
+def test_clean_psm_dataframe_matches_row_wise_steps_on_bind17():
+    df = pd.read_csv(os.path.join(ROOT, "inputs", "BIND17.csv"))
+    proteases = ["Chymotrypsin", "Legumain", "Krakatoa", "Elastase", "Trypsin", "Papain", "Thermo", "ProtK", "GluC",
+                 "LysC"]
+
+    pd.testing.assert_frame_equal(preprocessing.clean_psm_dataframe(df, proteases), row_wise_clean(df, proteases))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_flag_mapped_matches_row_wise_flag(seed, contaminants):
+    df = row_wise_clean(raw_psms(seed, contaminants), PROTEASES)
+    protein = "".join(df['cleaned_preds'].iloc[::7])
+
+    expected = df['cleaned_preds'].apply(lambda seq: "True" if seq in protein else "False")
+
+    pd.testing.assert_series_equal(preprocessing.flag_mapped(df['cleaned_preds'], protein), expected,
+                                   check_names=False)
+
+
+def in_memory_psms(csv_path, proteases, run, contaminants_fasta, min_conf):
+    """ The whole CSV read at once, cleaned row by row and filtered like `read_psms_chunked` filters each chunk. """
+    df = row_wise_clean(pd.read_csv(csv_path), proteases)
+    df = df[df['conf'] > min_conf]
+    clean_seqs = preprocessing.filter_contaminants(df['cleaned_preds'].unique().tolist(), run, contaminants_fasta)
+    df = df[df['cleaned_preds'].isin(clean_seqs)]
+    return df
+
+
+def folded(psms):
+    """ {(sequence, protease or None): (psm_count, conf)} of a folded PSM table. """
+    rows = psms[['cleaned_preds', 'protease', 'psm_count', 'conf']].itertuples(index=False)
+    return {(seq, None if pd.isna(protease) else protease): (count, conf) for seq, protease, count, conf in rows}
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("chunksize", [97, 500, 10_000])
+def test_chunked_reader_matches_in_memory_read(tmp_path, contaminants_fasta, contaminants, seed, chunksize):
+    csv_path = str(tmp_path / "run.csv")
+    raw_psms(seed, contaminants).to_csv(csv_path, index=False)
+    df = in_memory_psms(csv_path, PROTEASES, "ma3", contaminants_fasta, min_conf=0.3)
+
+    psms = preprocessing.read_psms_chunked(csv_path, PROTEASES, "ma3", contaminants_fasta, min_conf=0.3,
+                                           chunksize=chunksize)
+
+    expected = df.groupby(['cleaned_preds', 'protease'], dropna=False).agg(psm_count=('conf', 'size'),
+                                                                          conf=('conf', 'max'))
+    assert list(psms.columns) == ['cleaned_preds', 'protease', 'psm_count', 'conf']
+    assert psms['conf'].is_monotonic_decreasing
+    retained, expected = folded(psms), folded(expected.reset_index())
+    assert retained.keys() == expected.keys()
+    for key, (count, conf) in expected.items():
+        assert retained[key][0] == count
+        assert retained[key][1] == pytest.approx(conf, rel=1e-6)  # float32 confidences
+
+    # the flat list the assemblers take holds the same PSMs as the filtered in-memory frame
+    assert Counter(preprocessing.expand_psms(psms)) == Counter(df['cleaned_preds'])
+
+
+@pytest.mark.parametrize("chunksize", [97, 10_000])
+def test_chunked_reader_can_keep_every_confidence(tmp_path, contaminants_fasta, contaminants, chunksize):
+    csv_path = str(tmp_path / "run.csv")
+    raw_psms(0, contaminants).to_csv(csv_path, index=False)
+    df = in_memory_psms(csv_path, PROTEASES, "ma3", contaminants_fasta, min_conf=0.3)
+
+    psms = preprocessing.read_psms_chunked(csv_path, PROTEASES, "ma3", contaminants_fasta, min_conf=0.3,
+                                           chunksize=chunksize, keep_conf=True)
+    expanded = preprocessing.expand_psms(psms, columns=['cleaned_preds', 'protease', 'conf'])
+
+    # one row per PSM, with the float64 confidence of the in-memory path
+    assert expanded['conf'].tolist() == sorted(df['conf'], reverse=True)
+    rows = Counter(expanded.fillna({'protease': ''}).itertuples(index=False))
+    assert rows == Counter(df[['cleaned_preds', 'protease', 'conf']].fillna({'protease': ''}).itertuples(index=False))
+
+
+def test_chunked_reader_without_retained_psms(tmp_path, contaminants_fasta, contaminants):
+    csv_path = str(tmp_path / "run.csv")
+    raw_psms(0, contaminants, rows=50).to_csv(csv_path, index=False)
+
+    psms = preprocessing.read_psms_chunked(csv_path, PROTEASES, "ma3", contaminants_fasta, min_conf=1.0)
+
+    assert psms.empty and list(psms.columns) == ['cleaned_preds', 'protease', 'psm_count', 'conf']
+    assert preprocessing.expand_psms(psms) == []
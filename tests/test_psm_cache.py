@@ -0,0 +1,154 @@
+""" Cleaned PSM tables: the Parquet cache against the cleaning steps of the original scripts, and the confidence
+index against the filters it replaces. """
+
+import json
+import os
+import shutil
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+from src import dbg, preprocessing, psm_cache
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN = "BIND17"
+
+
+def script_psms(csv_path, proteases, run, contaminants_fasta, protein_norm):
+    """ The ingest steps of the original `script_dbg.py`, before the confidence threshold. """
+    df = pd.read_csv(csv_path)
+    df['protease'] = df['experiment_name'].apply(lambda name: preprocessing.extract_protease(name, proteases))
+    df = preprocessing.clean_dataframe(df)
+    df['cleaned_preds'] = df['preds'].apply(preprocessing.remove_modifications)
+    filtered_psms = preprocessing.filter_contaminants(df['cleaned_preds'].tolist(), run, contaminants_fasta)
+    df = df[df['cleaned_preds'].isin(filtered_psms)]
+    df["mapped"] = df["cleaned_preds"].apply(lambda x: "True" if x in protein_norm else "False")
+    return df.reset_index(drop=True)
+
+
+def same_psms(df, expected):
+    """ Compare two PSM tables sorted by confidence, in any order among the PSMs of equal confidence. Rows without a
+    confidence, which the cached tables drop, are ignored.
+    """
+    expected = expected[psm_cache.COLUMNS].dropna(subset=["conf"])
+    assert list(df.columns) == psm_cache.COLUMNS
+    assert df["conf"].tolist() == expected["conf"].tolist()
+    pd.testing.assert_frame_equal(df.sort_values(psm_cache.COLUMNS, ignore_index=True),
+                                  expected.sort_values(psm_cache.COLUMNS, ignore_index=True))
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """ Copies of the BIND17 PSMs and of the contaminants, and the metadata of the run. """
+    shutil.copy(os.path.join(ROOT, "inputs", f"{RUN}.csv"), tmp_path / f"{RUN}.csv")
+    shutil.copy(os.path.join(ROOT, "fasta", "contaminants.fasta"), tmp_path / "contaminants.fasta")
+    with open(os.path.join(ROOT, "json", "sample_metadata.json")) as file:
+        metadata = json.load(file)[RUN][0]
+
+    return {"csv_path": str(tmp_path / f"{RUN}.csv"), "proteases": metadata["proteases"], "run": RUN,
+            "contaminants_fasta": str(tmp_path / "contaminants.fasta"),
+            "protein_norm": preprocessing.normalize_sequence(metadata["protein"])}
+
+
+def test_build_matches_script_steps(dataset):
+    expected = script_psms(**dataset)
+
+    df = psm_cache.build_clean_psms(**dataset)
+
+    same_psms(df, expected)
+
+
+@pytest.mark.skipif(psm_cache.pq is None, reason="pyarrow is not installed")
+def test_cache_hit_returns_the_built_table(dataset, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    built = psm_cache.load_clean_psms(**dataset, cache_dir=cache_dir)
+    pd.testing.assert_frame_equal(built, psm_cache.build_clean_psms(**dataset))
+    assert len(os.listdir(cache_dir)) == 1
+    path = psm_cache.cache_path(dataset["csv_path"], psm_cache.cache_key(**dataset), cache_dir)
+    probe = tmp_path / "probe"
+    probe.touch()
+    assert os.stat(path).st_mode & 0o777 == probe.stat().st_mode & 0o777  # the umask, not the 0600 of mkstemp
+
+    def rebuild(*args, **kwargs):
+        raise AssertionError("the table should come from the cache")
+
+    monkeypatch.setattr(psm_cache, "build_clean_psms", rebuild)
+    pd.testing.assert_frame_equal(psm_cache.load_clean_psms(**dataset, cache_dir=cache_dir), built)
+
+
+@pytest.mark.skipif(psm_cache.pq is None, reason="pyarrow is not installed")
+def test_changed_inputs_are_not_served_a_stale_table(dataset, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    key = psm_cache.cache_key(**dataset)
+    psm_cache.load_clean_psms(**dataset, cache_dir=cache_dir)
+
+    changed = [dict(dataset, proteases=dataset["proteases"][:-1]), dict(dataset, run="bsa"),
+               dict(dataset, protein_norm=dataset["protein_norm"][:-1])]
+    assert len({key, *(psm_cache.cache_key(**inputs) for inputs in changed)}) == 1 + len(changed)
+    assert psm_cache.cache_key(**dict(dataset, proteases=dataset["proteases"][::-1])) == key
+
+    with open(dataset["contaminants_fasta"], "a") as file:
+        file.write(">added contaminant\nWWWWYYYYWWWW\n")
+    assert psm_cache.cache_key(**dataset) != key
+
+    df = pd.read_csv(dataset["csv_path"])
+    df.iloc[::2].to_csv(dataset["csv_path"], index=False)
+    cached = psm_cache.load_clean_psms(**dataset, cache_dir=cache_dir)
+    same_psms(cached, script_psms(**dataset))
+    assert len(os.listdir(cache_dir)) == 2
+
+
+@pytest.mark.skipif(psm_cache.pq is None, reason="pyarrow is not installed")
+def test_truncated_cache_file_is_rebuilt(dataset, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    built = psm_cache.load_clean_psms(**dataset, cache_dir=cache_dir)
+    path = psm_cache.cache_path(dataset["csv_path"], psm_cache.cache_key(**dataset), cache_dir)
+    with open(path, "r+b") as file:
+        file.truncate(100)
+
+    pd.testing.assert_frame_equal(psm_cache.load_clean_psms(**dataset, cache_dir=cache_dir), built)
+    assert os.path.getsize(path) > 100
+
+
+THRESHOLDS = [0.0, 0.3, 0.5, 0.8, 0.9, 0.99, 1.0]
+
+
+def pairs(df):
+    return zip(df['cleaned_preds'], df['protease'].fillna(""))
+
+
+@pytest.fixture
+def store(dataset):
+    return psm_cache.PSMStore(psm_cache.build_clean_psms(**dataset))
+
+
+def test_store_slices_match_confidence_filters(store):
+    df = store.df
+    for threshold in THRESHOLDS + df['conf'].iloc[[0, 10, 500, 5000]].tolist():  # equal to a confidence
+        filtered = df[df['conf'] > threshold]
+        pd.testing.assert_frame_equal(store.frame(threshold), filtered)
+        assert store.psms(threshold).tolist() == filtered['cleaned_preds'].tolist()
+        assert store.unique_psms(threshold).tolist() == filtered['cleaned_preds'].unique().tolist()
+
+
+@pytest.mark.parametrize("kmer_size", [4, 7])
+@pytest.mark.parametrize("order", [1, -1])  # loosest threshold first, or strictest first
+def test_store_kmers_match_get_kmers(store, kmer_size, order):
+    for threshold in THRESHOLDS[::order]:
+        expected = dbg.get_kmers_encoded(store.frame(threshold)['cleaned_preds'].tolist(), kmer_size)
+        kmers = store.kmers(threshold, kmer_size)
+        assert len(kmers) == len(set(kmers.tolist()))
+        assert set(kmers.tolist()) == set(expected.tolist())
+
+
+def test_store_subsamples_are_nested(store):
+    half, quarter = store.subsample(0.5), store.subsample(0.25)
+
+    assert store.subsample(0.5) is half
+    assert (len(half), len(quarter)) == (round(0.5 * len(store)), round(0.25 * len(store)))
+    assert Counter(pairs(quarter.df)) <= Counter(pairs(half.df)) <= Counter(pairs(store.df))
+    assert half.df['conf'].dropna().is_monotonic_decreasing
+    for threshold in THRESHOLDS:
+        assert half.psms(threshold).tolist() == half.df.loc[half.df['conf'] > threshold, 'cleaned_preds'].tolist()
@@ -0,0 +1,103 @@
+""" Results store: recording, querying and importing the statistics of pipeline runs. """
+
+import json
+import random
+import sqlite3
+
+import pytest
+
+from src import results
+from src.results import ResultsStore
+
+
+def statistics(seed, reference_name=None):
+    rng = random.Random(seed)
+    stats = {metric: rng.randint(1, 50) if metric in ("N50", "N90", "total_sequences") else rng.random()
+             for metric in results.METRICS}
+    stats.update(ass_method=rng.choice(["dbg", "greedy"]), conf=rng.choice([0.8, 0.9]), kmer_size=7, min_overlap=3,
+                 size_threshold=10, max_mismatches=rng.choice([8, 14]), min_identity=0.8)
+    if reference_name is not None:
+        stats["reference_name"] = reference_name
+    return stats
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ResultsStore(str(tmp_path / "results.sqlite")) as store:
+        for i in range(12):
+            store.record("bsa", "", f"outputs/bsa/comb_{i}", {"contigs": statistics(2 * i),
+                                                                "scaffolds": statistics(2 * i + 1)}, seconds=i)
+        yield store
+
+
+def test_leaderboard_and_aggregate_match_pandas(store):
+    rows = store.query(sequence_type="scaffolds")
+    assert len(rows) == 12 and set(rows["reference"]) == {""}
+
+    expected = rows.sort_values(["coverage", "N50"], ascending=False).head(5)
+    assert store.leaderboard(by=("coverage", "N50"), top=5)["output"].tolist() == expected["output"].tolist()
+
+    grouped = rows.groupby(["ass_method", "max_mismatches"])["coverage"].agg(["size", "mean", "max"])
+    aggregated = store.aggregate(["ass_method", "max_mismatches"]).set_index(["ass_method", "max_mismatches"])
+    assert aggregated["runs"].to_dict() == grouped["size"].to_dict()
+    assert aggregated["max_coverage"].to_dict() == pytest.approx(grouped["max"].to_dict())
+    assert aggregated["mean_coverage"].to_dict() == pytest.approx(grouped["mean"].to_dict())
+
+    with pytest.raises(ValueError):
+        store.leaderboard(by=("coverage; DROP TABLE results",))
+
+
+def test_recording_again_replaces_the_rows(store):
+    store.record("bsa", "", "outputs/bsa/comb_0/", {"scaffolds": dict(statistics(1), coverage=2.0)}, seconds=1)
+
+    rows = store.query(sequence_type="scaffolds", run="bsa")
+    assert len(rows) == 12
+    assert rows.set_index("output").loc["outputs/bsa/comb_0", "coverage"] == 2.0
+    assert json.loads(rows.set_index("output").loc["outputs/bsa/comb_0", "statistics"])["coverage"] == 2.0
+
+
+def test_panel_statistics_are_recorded_per_reference(store):
+    store.record("ma3", "", "outputs/ma3/comb_0", {"scaffolds_heavy": statistics(0, "heavy"),
+                                                   "scaffolds_light": statistics(1, "light")})
+
+    rows = store.query(run="ma3")
+    assert sorted(zip(rows["sequence_type"], rows["reference"])) == [("scaffolds", "heavy"), ("scaffolds", "light")]
+    assert store.leaderboard(run="ma3", reference="light")["reference"].tolist() == ["light"]
+    assert sorted(store.aggregate(["reference"], run="ma3")["reference"]) == ["heavy", "light"]
+
+
+def test_import_folders(tmp_path):
+    for i in range(3):
+        folder = tmp_path / "bsa" / f"comb_dbg_c0.{i}" / "statistics"
+        folder.mkdir(parents=True)
+        (folder / "contigs_stats.json").write_text(json.dumps(statistics(i)))
+        (folder / "scaffolds_heavy_stats.json").write_text(json.dumps(statistics(i, "heavy")))
+    (tmp_path / "bsa" / "comb_empty").mkdir()
+
+    with ResultsStore(str(tmp_path / "results.sqlite")) as store:
+        assert store.import_folders(str(tmp_path / "bsa"), "bsa") == 3
+        rows = store.query()
+
+    assert len(rows) == 6
+    assert sorted(set(zip(rows["sequence_type"], rows["reference"]))) == [("contigs", ""), ("scaffolds", "heavy")]
+
+
+def test_database_without_reference_column_is_migrated(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    old_columns = [column for column in results.COLUMNS if column != "reference"]
+    with sqlite3.connect(path) as connection:
+        connection.execute(f"CREATE TABLE results ({', '.join(old_columns)}, "
+                           f"PRIMARY KEY (run, chain, output, sequence_type))")
+        connection.execute("INSERT INTO results (run, chain, sequence_type, output, coverage) "
+                           "VALUES ('bsa', '', 'scaffolds', 'outputs/bsa/comb_0', 0.5)")
+    connection.close()
+
+    with ResultsStore(path) as store:
+        rows = store.query()
+        store.record("bsa", "", "outputs/bsa/comb_0", {"scaffolds_heavy": statistics(0, "heavy")})
+        recorded = store.query()
+
+    assert list(rows.columns) == list(results.COLUMNS)
+    assert (rows.loc[0, "reference"], rows.loc[0, "coverage"]) == ("", 0.5)
+    # the reference is part of the new key, so the panel row does not replace the migrated one
+    assert sorted(recorded["reference"]) == ["", "heavy"]
@@ -0,0 +1,69 @@
+""" Scaffolding engine: the incremental fixed point against the iterative loops, and the bounded mode. """
+
+import random
+
+import pytest
+
+from src import dbg, greedy_method, scaffold_engine
+
+
+def peptides(seed, alphabet="ACDEFGHIKLMNPQRSTVWY", protein_length=80, count=25, min_length=6, max_length=14):
+    rng = random.Random(seed)
+    protein = "".join(rng.choice(alphabet) for _ in range(protein_length))
+    result = []
+    for _ in range(count):
+        length = rng.randint(min_length, max_length)
+        start = rng.randrange(len(protein) - length + 1)
+        result.append(protein[start:start + length])
+    return result
+
+
+# inputs on which the original loops terminate: with repeats they can grow periodic scaffolds forever
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("scaffold_iterative", [dbg.scaffold_iterative, greedy_method.scaffold_iterative_greedy])
+def test_fixed_point_matches_iterative_loops(seed, scaffold_iterative):
+    seqs = peptides(seed)
+    seqs += seqs[:2]  # duplicated contigs merge with themselves in the all-pairs loops
+
+    expected = scaffold_iterative(seqs, 4, 5, disable_tqdm=True)
+    incremental = scaffold_iterative(seqs, 4, 5, disable_tqdm=True, incremental=True)
+
+    assert sorted(incremental) == sorted(expected)
+    assert [len(seq) for seq in incremental] == [len(seq) for seq in expected]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_merge_cache_follows_the_pool(seed):
+    rng = random.Random(seed)
+    cache = scaffold_engine.MergeCache(3)
+    pool = set()
+    for _ in range(6):
+        pool = set(rng.sample(sorted(pool), k=len(pool) // 2)) | set(peptides(rng.random(), alphabet="ACDE", count=8))
+        cache.update(pool)
+
+        expected = {a + b[overlap_len:] for a, b, overlap_len in dbg.find_overlaps(sorted(pool), 3, disable_tqdm=True)}
+        assert cache.merges() == expected
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_bounded_combine_without_limits_keeps_every_merge(seed):
+    seqs = peptides(seed)
+    budget = scaffold_engine.ScaffoldBudget()
+
+    kept = scaffold_engine.bounded_combine(seqs, 4, budget)
+
+    assert sorted(kept) == sorted(set(dbg.create_scaffolds(seqs, 4, disable_tqdm=True)))
+    assert [len(seq) for seq in kept] == sorted(map(len, kept), reverse=True)
+    assert budget.pruned == 0 and budget.rounds == 1
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_bounded_combine_prunes_once_the_budget_is_spent(seed):
+    seqs = peptides(seed)
+    budget = scaffold_engine.ScaffoldBudget(max_candidates=5, max_rounds=0)
+
+    kept = scaffold_engine.bounded_combine(seqs, 4, budget)
+
+    assert kept == sorted(dict.fromkeys(seqs), key=len, reverse=True)[:5]  # no merge, input ranked and pruned
+    assert budget.rounds == 0
+    assert budget.pruned == len(set(seqs)) - 5
@@ -0,0 +1,77 @@
+""" Successive halving over the grid against the exhaustive search it replaces. """
+
+import json
+import random
+
+import pytest
+
+from src.opt import search
+
+
+def grid(seed, size=27):
+    rng = random.Random(seed)
+    return [{"combination": i, "quality": rng.random()} for i in range(size)]
+
+
+def evaluator(failing=()):
+    """ Scores of the candidates at any fidelity, and a record of every evaluation. """
+    calls = []
+
+    def evaluate(candidates, fidelity):
+        calls.append((fidelity, [candidate["combination"] for candidate in candidates]))
+        return [None if candidate["combination"] in failing else candidate["quality"] for candidate in candidates]
+
+    return evaluate, calls
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_halving_finds_the_exhaustive_best_with_fewer_runs(seed):
+    candidates = grid(seed)
+    evaluate, calls = evaluator()
+
+    best, history = search.successive_halving(candidates, evaluate)
+
+    assert best == max(candidates, key=lambda candidate: candidate["quality"])
+    assert [(fidelity, len(evaluated)) for fidelity, evaluated in calls] == [(1 / 9, 27), (1 / 3, 9), (1.0, 3)]
+    assert len(history) == 27 + 9 + 3
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_halving_promotes_the_top_third_and_ties(seed):
+    candidates = grid(seed, size=10)
+    for candidate in candidates[:5]:
+        candidate["quality"] = 2.0  # tied at every fidelity
+    evaluate, calls = evaluator()
+
+    best, _ = search.successive_halving(candidates, evaluate, fidelities=(0.5, 1.0), eta=3)
+
+    assert sorted(calls[1][1]) == [0, 1, 2, 3, 4]  # ceil(10 / 3) = 4 promoted, and the fifth tied with them
+    assert best["quality"] == 2.0
+
+
+def test_halving_skips_failed_candidates():
+    candidates = grid(0, size=9)
+    best_index = max(range(9), key=lambda i: candidates[i]["quality"])
+    evaluate, calls = evaluator(failing={best_index})
+
+    best, history = search.successive_halving(candidates, evaluate)
+
+    assert best == max((c for c in candidates if c["combination"] != best_index), key=lambda c: c["quality"])
+    assert best_index not in calls[1][1]
+    assert (1 / 9, candidates[best_index], None) in history
+
+    evaluate, _ = evaluator(failing=set(range(9)))
+    assert search.successive_halving(candidates, evaluate)[0] is None
+
+
+def test_score_outcome_reads_the_statistics(tmp_path):
+    statistics = {"coverage": 0.5, "mean_identity": 0.9, "N50": 40}
+    (tmp_path / "statistics").mkdir()
+    (tmp_path / "statistics" / "scaffolds_stats.json").write_text(json.dumps(statistics))
+
+    assert search.score_outcome({"output": str(tmp_path), "error": None}) == (0.45, 40)
+    assert search.score_outcome({"output": str(tmp_path), "error": "failed"}) is None
+    assert search.score_outcome({"output": str(tmp_path), "error": None}, sequence_type="contigs") is None
+    assert search.score_outcome(None) is None
+    assert search.score({"coverage": 1.0, "mean_identity": 0.5, "N50": 3}) > \
+        search.score({"coverage": 0.5, "mean_identity": 1.0, "N50": 2})
@@ -0,0 +1,74 @@
+""" Grid-search workers forked after `preload` use the data loaded by the parent instead of loading it again. """
+
+import json
+import os
+import shutil
+import multiprocessing
+
+import pytest
+
+from src import mapping, preprocessing, psm_cache
+from src.opt import complete_dbg, complete_greedy
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN = "BIND17"
+
+
+def loads_in_worker(pipeline, config, queue):
+    """ Number of PSM tables and reference indices the worker had to load itself to run its stages. """
+    psm_misses = psm_cache.get_psm_store.cache_info().misses
+    index_misses = mapping.get_reference_index.cache_info().misses
+    pipeline.psm_store(config["run"], config["protein_norm"], config["proteases"])
+    mapping.get_reference_index(config["protein_norm"])
+    queue.put((psm_cache.get_psm_store.cache_info().misses - psm_misses,
+               mapping.get_reference_index.cache_info().misses - index_misses))
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """ The layout the grid search runs in: the working directory is opt/, next to inputs/ and fasta/. """
+    (tmp_path / "opt").mkdir()
+    (tmp_path / "inputs").mkdir()
+    (tmp_path / "fasta").mkdir()
+    shutil.copy(os.path.join(ROOT, "inputs", f"{RUN}.csv"), tmp_path / "inputs")
+    shutil.copy(os.path.join(ROOT, "fasta", "contaminants.fasta"), tmp_path / "fasta")
+    monkeypatch.chdir(tmp_path / "opt")
+    with open(os.path.join(ROOT, "json", "sample_metadata.json")) as file:
+        metadata = json.load(file)[RUN][0]
+
+    psm_cache.get_psm_store.cache_clear()
+    mapping.get_reference_index.cache_clear()
+    yield {"run": RUN, "protein_norm": preprocessing.normalize_sequence(metadata["protein"]),
+           "proteases": tuple(metadata["proteases"])}
+    psm_cache.get_psm_store.cache_clear()
+    mapping.get_reference_index.cache_clear()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="workers are only forked on Linux")
+@pytest.mark.parametrize("pipeline", [complete_dbg, complete_greedy])
+def test_forked_workers_inherit_the_preloaded_data(config, pipeline):
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+
+    pipeline.preload(config)
+    worker = context.Process(target=loads_in_worker, args=(pipeline, config, queue))
+    worker.start()
+    loads = queue.get(timeout=60)
+    worker.join()
+
+    assert loads == (0, 0)
+    if psm_cache.pq is not None:  # the parent also wrote the Parquet cache, for the next sweeps
+        assert [name for name in os.listdir("../inputs") if name.endswith(".psms.parquet")] != []
+
+
+def test_workers_without_preload_load_the_data(config):
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    queue = context.Queue()
+
+    worker = context.Process(target=loads_in_worker, args=(complete_dbg, config, queue))
+    worker.start()
+    loads = queue.get(timeout=60)
+    worker.join()
+
+    assert loads == (1, 1)
@@ -0,0 +1,218 @@
+""" Stage graph: memoization of shared stage instances across configurations, and resuming from the on-disk stage
+cache. """
+
+import os
+import time
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import pipeline
+from src.stages import StageCache, StageGraph
+
+
+CALLS = []
+
+
+def ingest(x):
+    CALLS.append(("ingest", x))
+    return [x]
+
+
+def assemble(ingested, y):
+    CALLS.append(("assemble", ingested[0], y))
+    if y == "fail" and ingested[0] == 1:
+        raise ValueError("assembly failed")
+    return ingested + [y]
+
+
+def report(assembled, z):
+    CALLS.append(("report", *assembled, z))
+    return assembled + [z]
+
+
+def direct(config):
+    """ The three stages called one after the other, without the graph. """
+    return report(assemble(ingest(config["x"]), config["y"]), config["z"])
+
+
+@pytest.fixture
+def graph():
+    CALLS.clear()
+    graph = StageGraph()
+    graph.add("ingest", ingest, params=("x",))
+    graph.add("assemble", assemble, params=("y",), deps=("ingest",))
+    graph.add("report", report, params=("z",), deps=("assemble",))
+    return graph
+
+
+def grid(xs=(0, 1), ys=("a", "b", "c"), zs=(8, 14)):
+    return [{"x": x, "y": y, "z": z, "unused": i} for i, (x, y, z) in enumerate(itertools.product(xs, ys, zs))]
+
+
+@pytest.mark.parametrize("threads", [0, 4])
+def test_each_stage_runs_once_per_distinct_parameters(graph, threads):
+    configs = grid()
+    expected = [direct(config) for config in configs]
+    CALLS.clear()
+
+    with ThreadPoolExecutor(threads or 1) as executor:
+        results, errors = graph.run(configs, "report", executor=executor if threads else None, disable_tqdm=True)
+
+    assert results == expected and errors == [None] * len(configs)
+    stages = [call[0] for call in CALLS]
+    assert (stages.count("ingest"), stages.count("assemble"), stages.count("report")) == (2, 6, 12)
+    assert len(set(CALLS)) == len(CALLS)
+
+
+def test_failure_only_takes_down_its_dependents(graph):
+    configs = grid(ys=("a", "fail"))
+    reported = []
+
+    results, errors = graph.run(configs, "report", disable_tqdm=True,
+                                on_target=lambda key, result, error: reported.append((key, error is None)))
+
+    for config, result, error in zip(configs, results, errors):
+        if config["x"] == 1 and config["y"] == "fail":
+            assert result is None and isinstance(error, ValueError)
+        else:
+            assert result == direct(config) and error is None
+    assert len(reported) == len(configs)
+    assert sum(ok for _, ok in reported) == len(configs) - 2
+
+
+def test_graph_structure(graph):
+    assert graph.params_of("report") == ("x", "y", "z")
+    assert graph.params_of("assemble") == ("x", "y")
+    assert graph.downstream("assemble") == {"assemble", "report"}
+    assert graph.key("assemble", {"x": 1, "y": "a", "z": 8}) == ("assemble", ("x", 1), ("y", "a"))
+    assert len(graph.plan(grid(), "assemble")) == 2 + 6
+    with pytest.raises(ValueError):
+        graph.add("cluster", report, deps=("mapping",))
+
+
+def pause(first):
+    time.sleep(first)
+    return first
+
+
+def pause_again(paused, second):
+    time.sleep(second)
+    return paused + second
+
+
+def total(paused, upstream_seconds):
+    return paused, upstream_seconds
+
+
+@pytest.mark.parametrize("threads", [0, 2])
+def test_stage_receives_the_seconds_of_its_upstream_instances(threads, tmp_path):
+    graph = StageGraph()
+    graph.add("first", pause, params=("first",))
+    graph.add("second", pause_again, params=("second",), deps=("first",))
+    graph.add("total", total, deps=("second",), elapsed="upstream_seconds")
+    configs = [{"first": 0.2, "second": second} for second in (0.0, 0.1)]
+    cache = StageCache(str(tmp_path / "cache"))
+
+    with ThreadPoolExecutor(threads or 1) as executor:
+        results, _ = graph.run(configs, "total", executor=executor if threads else None, cache=cache,
+                               disable_tqdm=True)
+    for paused, seconds in results:  # the shared first instance counts for both configurations
+        assert paused <= seconds < paused + 0.1
+
+    results, _ = graph.run(configs, "total", cache=cache, rerun=("total",), disable_tqdm=True)
+    assert [seconds for _, seconds in results] == [0.0, 0.0]  # the upstream instances were loaded from the cache
+
+
+def count(name):
+    return sum(call[0] == name for call in CALLS)
+
+
+def load(references, x):
+    """ A stage reading an optional input file. """
+    CALLS.append(("load", x))
+    if references is None:
+        return [x]
+    with open(references) as file:
+        return [x, file.read()]
+
+
+def test_cache_resumes_and_reruns_changed_stages(graph, tmp_path):
+    cache = StageCache(str(tmp_path / "cache"))
+    config = {"x": 0, "y": "a", "z": 8}
+    expected = direct(config)
+    CALLS.clear()
+
+    assert graph.run([config], "report", cache=cache, disable_tqdm=True)[0] == [expected]
+    assert (count("ingest"), count("assemble"), count("report")) == (1, 1, 1)
+
+    CALLS.clear()
+    assert graph.run([config], "report", cache=cache, disable_tqdm=True)[0] == [expected]
+    assert CALLS == []
+
+    graph.run([dict(config, z=14)], "report", cache=cache, disable_tqdm=True)  # only the last stage depends on z
+    assert CALLS == [("report", 0, "a", 14)]
+
+    CALLS.clear()
+    graph.run([config], "report", cache=cache, disable_tqdm=True, rerun=graph.downstream("assemble"))
+    assert (count("ingest"), count("assemble"), count("report")) == (0, 1, 1)
+
+
+def test_cache_reruns_invalid_and_truncated_entries(graph, tmp_path):
+    cache = StageCache(str(tmp_path / "cache"))
+    config = {"x": 0, "y": "a", "z": 8}
+    graph.run([config], "report", cache=cache, disable_tqdm=True)
+
+    graph.stages["report"].check = lambda result: False  # e.g. its output folder was removed
+    CALLS.clear()
+    assert graph.run([config], "report", cache=cache, disable_tqdm=True)[0] == [[0, "a", 8]]
+    assert CALLS == [("report", 0, "a", 8)]
+
+    graph.stages["assemble"].check = lambda result: False  # checked when a downstream stage needs it
+    CALLS.clear()
+    graph.run([config], "report", cache=cache, disable_tqdm=True)
+    assert (count("ingest"), count("assemble"), count("report")) == (0, 1, 1)
+
+    graph.stages["assemble"].check = graph.stages["report"].check = None
+    for name in os.listdir(tmp_path / "cache" / "report"):
+        with open(tmp_path / "cache" / "report" / name, "r+b") as file:
+            file.truncate(3)
+    CALLS.clear()
+    assert graph.run([config], "report", cache=cache, disable_tqdm=True)[0] == [[0, "a", 8]]
+    assert CALLS == [("report", 0, "a", 8)]
+
+
+def test_cache_is_keyed_on_input_files(tmp_path):
+    graph = StageGraph()
+    graph.add("load", load, params=("x",), inputs=("references",))
+    graph.add("report", report, params=("z",), deps=("load",))
+    cache = StageCache(str(tmp_path / "cache"))
+    references = tmp_path / "panel.fasta"
+    references.write_text(">heavy\nACDE\n")
+    config = {"x": 0, "z": 8, "references": str(references)}
+    CALLS.clear()
+
+    graph.run([config], "report", cache=cache, disable_tqdm=True)
+    graph.run([config], "report", cache=cache, disable_tqdm=True)
+    assert count("load") == 1
+
+    references.write_text(">heavy\nACDEF\n")
+    assert graph.run([config], "report", cache=cache, disable_tqdm=True)[0] == [[0, ">heavy\nACDEF\n", 8]]
+    assert count("load") == 2 and count("report") == 2
+
+    assert graph.run([dict(config, references=None)], "report", cache=cache, disable_tqdm=True)[0] == [[0, 8]]
+
+
+def test_run_stages_resume_and_from_stage(graph, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    config = {"x": 0, "y": "a", "z": 8}
+
+    for options, runs in [({}, (1, 1, 1)), ({}, (1, 1, 1)), ({"resume": True}, (0, 0, 0)),
+                          ({"from_stage": "assemble"}, (0, 1, 1)), ({"from_stage": "report"}, (0, 0, 1))]:
+        CALLS.clear()
+        assert pipeline.run_stages(graph, config, target="report", cache_dir=cache_dir, **options) == [0, "a", 8]
+        assert (count("ingest"), count("assemble"), count("report")) == runs
+
+    with pytest.raises(ValueError):
+        pipeline.run_stages(graph, {"x": 1, "y": "fail", "z": 8}, target="report", cache_dir=cache_dir)
@@ -0,0 +1,170 @@
+""" Supervised executor: per-task wall-clock and memory limits, and failures that do not take down the other tasks. """
+
+import os
+import time
+import threading
+import multiprocessing
+
+import pytest
+
+from src.opt.manifest import Manifest
+from src.stages import StageGraph
+from src.supervisor import ResourceLimitExceeded, SupervisedExecutor, rss
+
+
+def square(x):
+    return x * x
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def allocate(megabytes):
+    block = b"\x01" * (megabytes * 1024 ** 2)  # touched, so it is resident
+    time.sleep(10)
+    return len(block)
+
+
+def crash(code):
+    os._exit(code)
+
+
+def fail(message):
+    raise KeyError(message)
+
+
+def unpicklable():
+    return lambda: None
+
+
+def test_results_and_errors_come_back():
+    with SupervisedExecutor(max_workers=2, poll_interval=0.05) as executor:
+        futures = [executor.submit(square, x) for x in range(6)]
+        failed = executor.submit(fail, "missing")
+        assert [future.result(timeout=30) for future in futures] == [x * x for x in range(6)]
+        with pytest.raises(KeyError):
+            failed.result(timeout=30)
+
+
+def test_timeout_kills_only_the_slow_task():
+    start = time.monotonic()
+    with SupervisedExecutor(max_workers=2, timeout=0.5, poll_interval=0.05) as executor:
+        slow = executor.submit(sleep, 30)
+        fast = [executor.submit(sleep, 0.01) for _ in range(4)]
+
+        with pytest.raises(ResourceLimitExceeded) as error:
+            slow.result(timeout=30)
+        assert [future.result(timeout=30) for future in fast] == [0.01] * 4
+
+    assert (error.value.stage, error.value.status, error.value.limit) == ("sleep", "timeout", 0.5)
+    assert time.monotonic() - start < 10
+
+
+@pytest.mark.skipif(rss(os.getpid()) is None, reason="memory limits are read from /proc")
+def test_memory_limit_kills_the_task():
+    with SupervisedExecutor(max_workers=1, max_memory=200 * 1024 ** 2, poll_interval=0.05) as executor:
+        hungry = executor.submit(allocate, 400)
+        after = executor.submit(square, 3)
+
+        with pytest.raises(ResourceLimitExceeded) as error:
+            hungry.result(timeout=30)
+        assert after.result(timeout=30) == 9
+
+    assert error.value.status == "memory" and "MiB" in str(error.value)
+
+
+def test_dead_worker_and_unpicklable_result_fail_their_future():
+    with SupervisedExecutor(max_workers=2, poll_interval=0.05) as executor:
+        dead, bad = executor.submit(crash, 3), executor.submit(unpicklable)
+
+        with pytest.raises(RuntimeError, match="exit code 3"):
+            dead.result(timeout=30)
+        with pytest.raises(RuntimeError, match="unpicklable"):
+            bad.result(timeout=30)
+
+
+def test_shutdown_cancels_pending_tasks():
+    executor = SupervisedExecutor(max_workers=1, poll_interval=0.05)
+    running = executor.submit(sleep, 0.5)
+    pending = []
+    submitter = threading.Thread(target=lambda: pending.append(executor.submit(square, 2)))
+    submitter.start()
+    time.sleep(0.2)  # the submission waits for the slot of `running`
+
+    executor.shutdown(wait=True, cancel_futures=True)
+    submitter.join()
+
+    assert running.result() == 0.5
+    assert len(pending) == 1 and pending[0].cancelled()
+    with pytest.raises(RuntimeError):
+        executor.submit(square, 1)
+
+
+class RecordingContext:
+    """ A multiprocessing context that records the thread starting each of its processes. """
+
+    def __init__(self, context):
+        self.context = context
+        self.threads = []
+
+    def Pipe(self, duplex):
+        return self.context.Pipe(duplex)
+
+    def Process(self, *args, **kwargs):
+        process = self.context.Process(*args, **kwargs)
+        start = process.start
+
+        def recorded_start():
+            self.threads.append(threading.current_thread())
+            start()
+
+        process.start = recorded_start
+        return process
+
+
+def heartbeat(path, stopped):
+    """ The loop of `gridsearch.Heartbeat`, renewing the leases as often as it can. """
+    with Manifest(path, "dbg") as manifest:
+        while not stopped.is_set():
+            manifest.heartbeat("worker", 60)
+
+
+def test_processes_start_in_the_submitting_thread_while_a_heartbeat_runs(tmp_path):
+    path = str(tmp_path / "manifest.sqlite")
+    with Manifest(path, "dbg") as manifest:
+        manifest.register([{"x": x} for x in range(8)], task_of=lambda params: {})
+        assert len(manifest.claim("worker", 60, max_attempts=1)) == 8
+    stopped = threading.Event()
+    beating = threading.Thread(target=heartbeat, args=(path, stopped), daemon=True)
+    beating.start()
+
+    methods = multiprocessing.get_all_start_methods()
+    context = RecordingContext(multiprocessing.get_context("fork" if "fork" in methods else "spawn"))
+    graph = StageGraph()
+    graph.add("sleep", sleep, params=("seconds",))
+    graph.add("square", square, deps=("sleep",))
+    try:
+        with SupervisedExecutor(max_workers=2, timeout=20, poll_interval=0.05, mp_context=context) as executor:
+            results, errors = graph.run([{"seconds": x / 100} for x in range(8)], "square", executor=executor)
+    finally:
+        stopped.set()
+        beating.join()
+
+    assert results == [(x / 100) ** 2 for x in range(8)] and errors == [None] * 8
+    assert len(context.threads) == 16 and set(context.threads) == {threading.current_thread()}
+
+
+def test_stage_graph_keeps_going_after_a_timeout():
+    graph = StageGraph()
+    graph.add("sleep", sleep, params=("seconds",))
+    graph.add("square", square, deps=("sleep",))
+    configs = [{"seconds": seconds} for seconds in (0.01, 30, 0.02)]
+
+    with SupervisedExecutor(max_workers=3, timeout=1.0, poll_interval=0.05) as executor:
+        results, errors = graph.run(configs, "square", executor=executor, disable_tqdm=True)
+
+    assert results == [0.01 ** 2, None, 0.02 ** 2]
+    assert errors[0] is None and errors[2] is None
+    assert isinstance(errors[1], ResourceLimitExceeded) and errors[1].status == "timeout"